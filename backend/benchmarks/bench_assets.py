@@ -0,0 +1,73 @@
+"""Per-request cost of loading the compliance indexes and instruction files.
+
+Compares re-opening and re-parsing every asset on each request (the old
+behaviour) with reading them through the process-wide AssetStore.
+
+    python backend/benchmarks/bench_assets.py [iterations]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen.assets import (  # noqa: E402
+    ASSETS_DIR,
+    AssetStore,
+    COMPLIANCE_INDEX,
+    COMPLIANCE_REVERSE_INDEX,
+    COMPLIANCE_TAGS_INSTRUCTION,
+    COMPLIANCE_TEST_CASES_INSTRUCTION,
+    SYSTEM_INSTRUCTION,
+)
+
+TAGS = ["audit-logging", "access-control", "data-integrity", "encryption"]
+
+
+def _read(name):
+    with open(os.path.join(ASSETS_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _read_json(name):
+    with open(os.path.join(ASSETS_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def per_request_reload():
+    _read(SYSTEM_INSTRUCTION)
+    _read(COMPLIANCE_TAGS_INSTRUCTION)
+    _read(COMPLIANCE_TEST_CASES_INSTRUCTION)
+    reverse_index = _read_json(COMPLIANCE_REVERSE_INDEX)
+    clause_ids = list({clause_id for tag in TAGS for clause_id in reverse_index[tag]})
+    compliance_index = _read_json(COMPLIANCE_INDEX)
+    return [compliance_index[clause_id] for clause_id in clause_ids]
+
+
+def asset_store(store):
+    store.text(SYSTEM_INSTRUCTION)
+    store.text(COMPLIANCE_TAGS_INSTRUCTION)
+    store.text(COMPLIANCE_TEST_CASES_INSTRUCTION)
+    return store.clauses_for_tags(TAGS)
+
+
+def main(iterations: int = 2000):
+    store = AssetStore()
+    stat_every_call = AssetStore(check_interval=0)
+    assert {c["clause_id"] for c in per_request_reload()} == {c["clause_id"] for c in asset_store(store)}
+
+    results = {
+        "per_request_reload": timeit.timeit(per_request_reload, number=iterations),
+        "asset_store": timeit.timeit(lambda: asset_store(store), number=iterations),
+        "asset_store_stat_every_call": timeit.timeit(lambda: asset_store(stat_every_call), number=iterations),
+    }
+
+    print(f"{'variant':<30}{'us/request':>12}")
+    for name, total in results.items():
+        print(f"{name:<30}{total / iterations * 1e6:>12.1f}")
+    print(f"speedup: {results['per_request_reload'] / results['asset_store']:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
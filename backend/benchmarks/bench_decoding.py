@@ -0,0 +1,91 @@
+"""Decode, validate and re-encode cost for large model responses, per JSON codec.
+
+Builds a synthetic functional response of N test cases (the default is
+roughly a maximum-length 64K-token response) and times, for each installed
+codec: decoding the response, validating every test case, and encoding
+every description for the database.
+
+    python backend/benchmarks/bench_decoding.py [test_cases] [iterations]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen import decoding  # noqa: E402
+
+WORDS = "verify user session audit record access control encrypted export report retention latency under load".split()
+
+
+def sentence(words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_response(count: int) -> str:
+    data = []
+    for i in range(count):
+        if i % 3:
+            description = {
+                "type": "functional",
+                "purpose": sentence(20),
+                "preconditions": sentence(15),
+                "testing_procedure": [sentence(12) for _ in range(6)],
+                "expected_result": sentence(20),
+                "requirement_coverage": sentence(15),
+            }
+        else:
+            description = {
+                "type": "non_functional",
+                "test_category": "Performance",
+                "preconditions": sentence(15),
+                "testing_procedure": [sentence(12) for _ in range(6)],
+                "expected_result": sentence(20),
+                "acceptance_criteria": sentence(15),
+            }
+        data.append({"summary": sentence(8), "description": description})
+    return json.dumps({"success": True, "issue": "", "data": data}, indent=2)
+
+
+def bench(codec: decoding.Codec, text: str, iterations: int) -> dict[str, float]:
+    decoding.codec = codec
+    timings = {"decode": 0.0, "validate": 0.0, "encode": 0.0}
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = decoding.loads(text)
+        decoded = time.perf_counter()
+        test_cases = decoding.validate_test_cases(response["data"], decoding.FNF_TYPES)
+        validated = time.perf_counter()
+        for test_case in test_cases:
+            decoding.dumps(test_case["description"])
+        encoded = time.perf_counter()
+
+        timings["decode"] += decoded - start
+        timings["validate"] += validated - decoded
+        timings["encode"] += encoded - validated
+    return {stage: total / iterations * 1000 for stage, total in timings.items()}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    random.seed(0)
+    text = synthetic_response(count)
+    print(f"{count} test cases, {len(text) / 1024:.0f} KiB response, {iterations} iterations\n")
+    print(f"{'codec':>8}{'decode':>10}{'validate':>10}{'encode':>10}{'total':>10}  (ms)")
+
+    for name in decoding.CODECS:
+        try:
+            codec = decoding.get_codec(name)
+        except ImportError:
+            print(f"{name:>8}  not installed")
+            continue
+        timings = bench(codec, text, iterations)
+        print(f"{name:>8}{timings['decode']:>10.2f}{timings['validate']:>10.2f}{timings['encode']:>10.2f}{sum(timings.values()):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Publish throughput of the event dispatcher, sequential vs batched.
+
+By default this runs against an in-process stub publisher that batches like
+the real PublisherClient and charges a fixed round trip per batch. Set
+PUBSUB_EMULATOR_HOST (e.g. localhost:8085) to publish to a local Pub/Sub
+emulator instead.
+
+    python backend/benchmarks/bench_event_dispatcher.py [issues] [rtt_ms]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent import futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from event_dispatcher.main import PUBLISH_BATCH_MAX_LATENCY, PUBLISH_BATCH_MAX_MESSAGES, batch_settings, publish_issue_events  # noqa: E402
+
+
+class StubPublisher:
+    """Collects messages into batches and resolves each batch after one simulated round trip."""
+
+    def __init__(self, rtt: float, max_messages: int, max_latency: float):
+        self._rtt = rtt
+        self._max_messages = max_messages
+        self._max_latency = max_latency
+        self._batch: list[futures.Future] = []
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self.round_trips = 0
+
+    def _flush(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if batch:
+            threading.Thread(target=self._send, args=(batch,)).start()
+
+    def _send(self, batch):
+        time.sleep(self._rtt)
+        self.round_trips += 1
+        for i, future in enumerate(batch):
+            future.set_result(str(i))
+
+    def publish(self, topic_path: str, data: bytes) -> futures.Future:
+        future = futures.Future()
+        with self._lock:
+            self._batch.append(future)
+            full = len(self._batch) >= self._max_messages
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self._max_latency, self._flush)
+                self._timer.start()
+        if full:
+            self._flush()
+        return future
+
+
+def publish_sequentially(publisher, topic_path, issue_ids, source):
+    """The previous dispatcher behaviour: block on every publish."""
+    for issue_id in issue_ids:
+        publisher.publish(topic_path, json.dumps({"issueId": issue_id, "source": source}).encode("utf-8")).result()
+
+
+def _emulator_publisher():
+    from google.cloud import pubsub_v1
+
+    publisher = pubsub_v1.PublisherClient(batch_settings=batch_settings())
+    topic_path = publisher.topic_path("bench-project", "bench-topic")
+    try:
+        publisher.create_topic(name=topic_path)
+    except Exception:
+        pass
+    return publisher, topic_path
+
+
+def main(issue_count: int = 500, rtt_ms: float = 20):
+    issue_ids = [f"issue-{i}" for i in range(issue_count)]
+
+    def make_publisher():
+        if os.environ.get("PUBSUB_EMULATOR_HOST"):
+            return _emulator_publisher()
+        return StubPublisher(rtt_ms / 1000, PUBLISH_BATCH_MAX_MESSAGES, PUBLISH_BATCH_MAX_LATENCY), "projects/bench/topics/bench"
+
+    print(f"{'mode':<12}{'messages':>10}{'seconds':>10}{'msg/s':>12}")
+    for mode, publish in (("sequential", publish_sequentially), ("batched", publish_issue_events)):
+        publisher, topic_path = make_publisher()
+        start = time.perf_counter()
+        result = publish(publisher, topic_path, issue_ids, "jira")
+        elapsed = time.perf_counter() - start
+        assert not result, result
+        print(f"{mode:<12}{issue_count:>10}{elapsed:>10.2f}{issue_count / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
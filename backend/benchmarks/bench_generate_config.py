@@ -0,0 +1,86 @@
+"""Per-call cost of building the generation config, schema and cache key.
+
+"rebuilt" constructs everything the way each call used to: four
+SafetySettings, a validated GenerateContentConfig, a fresh schema tree and its
+JSON dump for the response cache key. "shared" copies the prebuilt base
+config with per-call overrides and reuses the cached schema and fingerprint.
+Needs google-genai installed.
+
+    python backend/benchmarks/bench_generate_config.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from google.genai import types  # noqa: E402
+
+from test_case_gen.assets import assets, SYSTEM_INSTRUCTION  # noqa: E402
+from test_case_gen.google_gen_ai import GoogleGenAI  # noqa: E402
+from test_case_gen.profiles import profiles, FNF  # noqa: E402
+from test_case_gen.schema import FNFTestCaseGenResponseSchema, ComplianceTestCaseResponseSchema, schema_fingerprint  # noqa: E402
+
+
+def rebuilt_config(system_instruction: str, schema: types.Schema) -> types.GenerateContentConfig:
+    safety_settings = [
+        types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
+        types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
+        types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
+        types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
+    ]
+    content_config = types.GenerateContentConfig(
+        temperature=1,
+        top_p=1,
+        max_output_tokens=65535,
+        safety_settings=safety_settings,
+        response_mime_type="application/json",
+        system_instruction=[types.Part.from_text(text=system_instruction)],
+        thinking_config=types.ThinkingConfig(thinking_budget=-1)
+    )
+    content_config.tools = None
+    content_config.response_schema = schema
+    return content_config
+
+
+def rebuilt(system_instruction: str):
+    # The undecorated builders, as every call ran them before they were cached.
+    schema = FNFTestCaseGenResponseSchema.get_schema.__wrapped__()
+    ComplianceTestCaseResponseSchema.get_compliance_schema.__wrapped__()
+    key = schema.model_dump_json(exclude_none=True)
+    return rebuilt_config(system_instruction, schema), key
+
+
+def shared(gen_ai: GoogleGenAI, system_instruction: str):
+    schema = FNFTestCaseGenResponseSchema.get_schema()
+    ComplianceTestCaseResponseSchema.get_compliance_schema()
+    key = schema_fingerprint(schema)
+    return gen_ai._build_config(system_instruction, schema), key
+
+
+def bench(name: str, fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{name:>8}: {per_call:9.1f} µs per call")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    system_instruction = assets.text(SYSTEM_INSTRUCTION)
+    gen_ai = GoogleGenAI("unused", profiles[FNF])
+
+    before, after = rebuilt(system_instruction), shared(gen_ai, system_instruction)
+    assert before[0].model_dump(exclude_none=True) == after[0].model_dump(exclude_none=True), "configs differ"
+    assert before[1] == after[1], "cache keys differ"
+
+    slow = bench("rebuilt", lambda: rebuilt(system_instruction), iterations)
+    fast = bench("shared", lambda: shared(gen_ai, system_instruction), iterations)
+    print(f"{slow / fast:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Recall and prompt size of ranked clause selection.
+
+Without ranking, the compliance prompt carries the tag union: every clause
+under every tag of the requirement. For each top-k / token budget setting this
+reports the clauses and tokens left after selection and, for samples whose
+clauses are labelled, the recall: the share of labelled clauses in the union
+that selection keeps. "random R" is the recall a random selection of the same
+size would have (the share of the union kept), so ranking only helps where
+recall beats it. Recall is what COMPLIANCE_CLAUSE_TOP_K should be set by.
+
+Samples are the {"text", "tags"} lines of eval_tag_matcher.py, optionally with
+"clauses": the "source clause_id" keys of the clauses a reviewer judged
+relevant to the requirement. The shipped samples carry no labels, so only the
+size columns are measured on them. Needs numpy.
+
+    python backend/benchmarks/eval_clause_ranking.py [samples.jsonl]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen.assets import assets  # noqa: E402
+from test_case_gen.compliance_gen_ai import estimate_tokens, get_clause_ranker, select_clauses  # noqa: E402
+from test_case_gen.text_index import clause_key  # noqa: E402
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tag_samples.jsonl")
+SETTINGS = ((0, 0), (12, 0), (8, 0), (5, 0), (12, 2000), (12, 1200), (12, 800))
+
+
+def tokens(clauses: list[dict]) -> int:
+    return sum(estimate_tokens(json.dumps(clause)) for clause in clauses)
+
+
+def ratio(part: int, whole: int) -> str:
+    return f"{part / whole:.0%}" if whole else "-"
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SAMPLES
+    with open(path, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    if get_clause_ranker() is None:
+        sys.exit("numpy or compliance_clause_vectors.npz is missing; run compliance_index_script.py")
+
+    unions = [assets.clauses_for_tags(sample["tags"]) for sample in samples]
+    labelled = [set(sample["clauses"]) if "clauses" in sample else None for sample in samples]
+    baseline_tokens = sum(tokens(union) for union in unions) / len(samples)
+    print(f"{len(samples)} samples ({sum(labels is not None for labels in labelled)} labelled), "
+          f"tag union {sum(map(len, unions)) / len(samples):.1f} clauses, {baseline_tokens:.0f} tokens on average\n")
+
+    print(f"{'top_k':>6}{'budget':>8}{'clauses':>9}{'tokens':>8}{'saved':>7}{'recall':>8}{'random R':>10}{'ms':>7}")
+    for top_k, budget in SETTINGS:
+        selected_clauses = selected_tokens = 0
+        relevant_kept = relevant_total = labelled_selected = labelled_union = 0
+        start = time.perf_counter()
+        for sample, union, labels in zip(samples, unions, labelled):
+            selected = select_clauses(sample["text"], union, top_k=top_k, token_budget=budget)
+            selected_clauses += len(selected)
+            selected_tokens += tokens(selected)
+            if labels is None:
+                continue
+            relevant_kept += len(labels & {clause_key(clause) for clause in selected})
+            relevant_total += len(labels & {clause_key(clause) for clause in union})
+            labelled_selected += len(selected)
+            labelled_union += len(union)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(samples)
+
+        average_tokens = selected_tokens / len(samples)
+        print(f"{top_k or '-':>6}{budget or '-':>8}{selected_clauses / len(samples):>9.1f}{average_tokens:>8.0f}"
+              f"{1 - average_tokens / baseline_tokens:>7.0%}{ratio(relevant_kept, relevant_total):>8}"
+              f"{ratio(labelled_selected, labelled_union):>10}{elapsed_ms:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
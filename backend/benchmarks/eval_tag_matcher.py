@@ -0,0 +1,97 @@
+"""Offline evaluation of the keyword tag candidates against model tags.
+
+With COMPLIANCE_TAG_MATCHER=prefilter the tag call may only pick from the
+best ranked keyword candidates; this reports, per candidate count, how many of
+the model's tags (and of the clauses they select) the candidates hold, which
+is the most that mode can return.
+
+Each line of the sample file is {"text": ..., "tags": [...]}, where `tags`
+are the tags the model assigned to `text`. data/tag_samples.jsonl ships the
+few-shot examples from compliance_tags_instruction.md, which the model sees
+in its instruction, so the numbers on it are a smoke test, not a measurement.
+Record a held-out sample from real requirements with --record (needs
+GOOGLE_CLOUD_API_KEY):
+
+    python backend/benchmarks/eval_tag_matcher.py [samples.jsonl]
+    python backend/benchmarks/eval_tag_matcher.py requirements.jsonl --record out.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen.assets import AssetStore, COMPLIANCE_TAG_INDEX  # noqa: E402
+from test_case_gen.text_index import TagMatcher  # noqa: E402
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tag_samples.jsonl")
+CANDIDATE_COUNTS = (5, 10, 20, 40)
+
+
+def load_samples(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def record(samples: list[dict], output: str):
+    from test_case_gen.compliance_gen_ai import ComplianceTestCaseGeneration
+
+    generation = ComplianceTestCaseGeneration(os.environ["GOOGLE_CLOUD_API_KEY"])
+    with open(output, "w", encoding="utf-8") as f:
+        for sample in samples:
+            tags = await generation.classify_tags(sample["text"], mode="llm")
+            f.write(json.dumps({"text": sample["text"], "tags": tags}) + "\n")
+    print(f"recorded {len(samples)} samples to {output}")
+
+
+def evaluate(samples: list[dict]):
+    store = AssetStore()
+    matcher = TagMatcher(store.json(COMPLIANCE_TAG_INDEX))
+
+    start = time.perf_counter()
+    rankings = [matcher.candidates(sample["text"], max(CANDIDATE_COUNTS)) for sample in samples]
+    elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(samples), 1)
+
+    print(f"{len(samples)} samples, {elapsed_ms:.2f} ms per ranking\n")
+    print(f"{'candidates':>10}{'tag R':>8}{'all tags':>10}{'clause R':>10}")
+
+    for count in CANDIDATE_COUNTS:
+        tags_hit = tags_expected = complete = 0
+        clauses_hit = clauses_expected = 0
+
+        for sample, ranking in zip(samples, rankings):
+            candidates = set(ranking[:count])
+            hit = len(candidates & set(sample["tags"]))
+            tags_hit += hit
+            tags_expected += len(sample["tags"])
+            complete += hit == len(set(sample["tags"]))
+
+            expected_clauses = {c["clause_id"] + c["source"] for c in store.clauses_for_tags(sample["tags"])}
+            candidate_clauses = {c["clause_id"] + c["source"] for c in store.clauses_for_tags(ranking[:count])}
+            clauses_hit += len(expected_clauses & candidate_clauses)
+            clauses_expected += len(expected_clauses)
+
+        recall = tags_hit / tags_expected if tags_expected else 0.0
+        clause_recall = clauses_hit / clauses_expected if clauses_expected else 0.0
+        all_tags = complete / len(samples) if samples else 0.0
+        print(f"{count:>10}{recall:>8.2f}{all_tags:>10.0%}{clause_recall:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples", nargs="?", default=DEFAULT_SAMPLES)
+    parser.add_argument("--record", metavar="OUTPUT", help="label the samples with the model and write them to OUTPUT")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if args.record:
+        asyncio.run(record(samples, args.record))
+    else:
+        evaluate(samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Offline end-to-end throughput of one test_case_gen instance.
+
+Everything external is replaced, nothing inside the functions is:
+
+- the database is a local libsql file built from the migrations (local_db.py)
+  and seeded with Jira issues and manually uploaded requirements;
+- event_dispatcher.handler publishes them through a fake PublisherClient that
+  records each message, which is then pushed to test_case_gen.handler as a
+  base64 Pub/Sub envelope, the way a push subscription delivers it;
+- the google-genai client behind GoogleGenAI is a fake that answers after a
+  configurable latency per call kind, so the profiles, rate limiter, decoding
+  and checkpoints all run as deployed.
+
+For each concurrency level (simultaneous push deliveries, as the Cloud Run
+instance would accept them) fresh issues are seeded and processed. The report
+has throughput, per-message latency percentiles and database round trips
+(execute, executemany, commit, rollback and sync calls) per issue.
+
+    python backend/benchmarks/load_test.py --issues 40 --concurrency 1,4,16
+    python backend/benchmarks/load_test.py --latency fnf=2,tags=0.5,compliance=3 --jitter 0.3
+
+Settings read at import (GENAI_RATE_PER_SECOND, STREAM_GENERATION,
+BATCH_CONCURRENCY, ...) can be set in the environment as usual; the response
+cache is off unless LLM_CACHE_BACKEND is set, since every seeded issue has the
+same requirement text.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from local_db import create_database, seed_jira_issues, seed_standalone_requirements  # noqa: E402
+
+
+def parse_latency(value: str) -> dict[str, float]:
+    latency = {"fnf": 0.8, "tags": 0.3, "compliance": 1.2}
+    for part in filter(None, value.split(",")):
+        kind, seconds = part.split("=")
+        latency[kind.strip()] = float(seconds)
+    return latency
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--issues", type=int, default=20, help="issues per source and concurrency level")
+    parser.add_argument("--sources", default="jira,standalone")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrent push deliveries")
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency(""), help="seconds per call kind, e.g. fnf=0.8,tags=0.3")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency varies uniformly by this fraction")
+    parser.add_argument("--issues-per-message", type=int, default=1, help="the dispatcher's ISSUES_PER_MESSAGE")
+    parser.add_argument("--db", default=None, help="database file (default: a temporary one)")
+    return parser.parse_args()
+
+
+class CountingConnection:
+    """Forwards to a libsql connection and counts the calls that reach the database."""
+
+    CALLS = ("execute", "executemany", "commit", "rollback", "sync")
+
+    def __init__(self, conn, counter: dict):
+        self._conn = conn
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name not in self.CALLS:
+            return attr
+
+        def counted(*args, **kwargs):
+            with self._counter["lock"]:
+                self._counter["calls"] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        # Commits or rolls back the transaction.
+        with self._counter["lock"]:
+            self._counter["calls"] += 1
+        return self._conn.__exit__(*exc_info)
+
+
+class StageTotals:
+    """Trace exporter that sums each stage's time over the traces of a level."""
+
+    def __init__(self):
+        self.traces = 0
+        self.stages: dict[str, float] = {}
+
+    def export(self, trace):
+        self.traces += 1
+        for stage, totals in trace.summary()["stages"].items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + totals["total_ms"]
+
+    def take(self) -> dict[str, float]:
+        stages, self.stages, self.traces = self.stages, {}, 0
+        return stages
+
+
+class FakeStream:
+
+    def __init__(self, text: str):
+        self._chunks = [text[i:i + 256] for i in range(0, len(text), 256)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._chunks:
+            raise StopAsyncIteration
+        return SimpleNamespace(text=self._chunks.pop(0), usage_metadata=None)
+
+
+class FakeModels:
+
+    def __init__(self, latency: dict[str, float], jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+
+    async def _respond(self, config) -> str:
+        from simulate_deadline import RESPONSES, call_kind
+
+        kind = call_kind(config)
+        await asyncio.sleep(self.latency[kind] * random.uniform(1 - self.jitter, 1 + self.jitter))
+        return json.dumps(RESPONSES[kind])
+
+    async def generate_content(self, model, contents, config):
+        return SimpleNamespace(text=await self._respond(config), usage_metadata=None)
+
+    async def generate_content_stream(self, model, contents, config):
+        return FakeStream(await self._respond(config))
+
+
+class FakeGenAIClient:
+
+    def __init__(self, latency: dict[str, float], jitter: float):
+        self.aio = SimpleNamespace(models=FakeModels(latency, jitter), aclose=self.aclose)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePublisher:
+    """Resolves every publish at once and keeps the message for delivery."""
+
+    def __init__(self):
+        self.messages: list[bytes] = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic_path: str, data: bytes) -> futures.Future:
+        with self._lock:
+            self.messages.append(data)
+        future = futures.Future()
+        future.set_result(str(len(self.messages)))
+        return future
+
+    def take(self) -> list[bytes]:
+        with self._lock:
+            messages, self.messages = self.messages, []
+        return messages
+
+
+def push_envelope(data: bytes, message_id: int) -> dict:
+    return {
+        "message": {"data": base64.b64encode(data).decode(), "messageId": str(message_id), "attributes": {}},
+        "subscription": "projects/bench/subscriptions/test-case-gen",
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def run_level(conn, test_case_gen, event_dispatcher, publisher: FakePublisher, counter: dict, stage_totals: StageTotals,
+              sources: list[str], issues: int, concurrency: int) -> dict:
+    from test_case_gen.rate_limiter import genai_limiter
+    from flask import Request
+
+    seeded = {}
+    for source in sources:
+        seed = seed_jira_issues if source == "jira" else seed_standalone_requirements
+        seeded[source] = seed(conn, issues, prefix=f"c{concurrency}-{source}")
+
+    started = time.perf_counter()
+    for source, issue_ids in seeded.items():
+        response, status = event_dispatcher.handler(Request.from_values(method="POST", json={"issueIds": issue_ids, "source": source}))
+        assert status == 200 and not response["errors"], response
+
+    def deliver(message_id: int, data: bytes) -> tuple[float, int]:
+        delivered = time.perf_counter()
+        _, status = test_case_gen.handler(Request.from_values(method="POST", json=push_envelope(data, message_id)))
+        return (time.perf_counter() - delivered) * 1000, status
+
+    messages = publisher.take()
+    counter["calls"] = 0
+    stage_totals.take()
+    queue_wait_ms = genai_limiter.stats()["queue_wait_ms_total"]
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(deliver, range(len(messages)), messages))
+    elapsed = time.perf_counter() - started
+    db_calls = counter["calls"]
+    queue_wait_ms = genai_limiter.stats()["queue_wait_ms_total"] - queue_wait_ms
+
+    outcome = {"completed": 0, "failed": 0, "other": 0}
+    tables = {"jira": "scheduled_job_issue", "standalone": "standalone_scheduled_job_requirement"}
+    for source, issue_ids in seeded.items():
+        placeholders = ",".join("?" * len(issue_ids))
+        for (status,) in conn.execute(f"SELECT status FROM {tables[source]} WHERE id IN ({placeholders})", issue_ids).fetchall():
+            outcome[status if status in outcome else "other"] += 1
+
+    total = sum(len(issue_ids) for issue_ids in seeded.values())
+    latencies = [ms for ms, _ in results]
+    return {
+        "issues": total,
+        "messages": len(messages),
+        **outcome,
+        "nacked": sum(1 for _, status in results if status >= 300),
+        "elapsed": elapsed,
+        "per_minute": total / elapsed * 60,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "db_calls_per_issue": db_calls / total,
+        "queue_wait_per_issue": queue_wait_ms / total,
+        "stages_per_issue": {stage: ms / total for stage, ms in stage_totals.take().items()},
+    }
+
+
+def main():
+    args = parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="load-test-"), "load_test.db")
+    conn = create_database(db_path)
+
+    os.environ.update(TURSO_DATABASE_URL=db_path, TURSO_AUTH_TOKEN="", GOOGLE_CLOUD_API_KEY="bench",
+                      ISSUES_PER_MESSAGE=str(args.issues_per_message), WARM_UP="request")
+    os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from event_dispatcher import main as event_dispatcher
+    from test_case_gen import database, google_gen_ai, main as test_case_gen
+    from test_case_gen.rate_limiter import genai_limiter
+    from test_case_gen.tracing import tracer
+
+    publisher = FakePublisher()
+    event_dispatcher._publisher = (publisher, "projects/bench/topics/test-case-gen")
+    google_gen_ai.clients = google_gen_ai.ClientRegistry(lambda api_key: FakeGenAIClient(args.latency, args.jitter))
+    counter = {"calls": 0, "lock": threading.Lock()}
+    connect = database.connections._connect
+    database.connections._connect = lambda *a, **kw: CountingConnection(connect(*a, **kw), counter)
+    stage_totals = StageTotals()
+    tracer.exporters = [stage_totals]
+    test_case_gen.warm_up()
+
+    sources = args.sources.split(",")
+    latency = ", ".join(f"{kind} {seconds:g}s" for kind, seconds in args.latency.items())
+    print(f"{args.issues} issues per source ({', '.join(sources)}), model latency {latency} ±{args.jitter:.0%}, "
+          f"{args.issues_per_message} issue(s) per message, stream={test_case_gen.STREAM_GENERATION}\n")
+    print(f"{'concurrency':>11}{'issues':>8}{'done':>6}{'failed':>8}{'nacked':>8}{'seconds':>9}{'issues/min':>12}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/issue':>10}{'wait ms':>9}")
+
+    rows = {}
+    for concurrency in (int(level) for level in args.concurrency.split(",")):
+        row = rows[concurrency] = run_level(conn, test_case_gen, event_dispatcher, publisher, counter, stage_totals, sources,
+                                            args.issues, concurrency)
+        print(f"{concurrency:>11}{row['issues']:>8}{row['completed']:>6}{row['failed']:>8}{row['nacked']:>8}{row['elapsed']:>9.2f}"
+              f"{row['per_minute']:>12.0f}{row['p50']:>9.0f}{row['p95']:>9.0f}{row['p99']:>9.0f}{row['db_calls_per_issue']:>10.1f}"
+              f"{row['queue_wait_per_issue']:>9.0f}")
+
+    print("\nwait ms: time per issue spent queued in the genai rate limiter. Stage time per issue (ms):")
+    for concurrency, row in rows.items():
+        slowest = sorted(row["stages_per_issue"].items(), key=lambda item: item[1], reverse=True)[:6]
+        print(f"{concurrency:>11}  " + ", ".join(f"{stage} {ms:.0f}" for stage, ms in slowest))
+
+    print(f"\nrate limiter: {genai_limiter.stats()}")
+    print(f"db connections: {database.connections.stats()}")
+
+
+if __name__ == "__main__":
+    main()
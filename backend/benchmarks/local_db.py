@@ -0,0 +1,69 @@
+"""Local SQLite database with the app's schema, for benchmarks that go through the repositories.
+
+The schema is built by applying the drizzle migrations in /migrations in
+order, so it matches what the functions run against in Turso. libsql applies
+them (they use its ALTER COLUMN extension), which needs the libsql package the
+test_case_gen function depends on. The file can be opened by the functions
+through TURSO_DATABASE_URL, with TURSO_AUTH_TOKEN set to an empty string.
+"""
+import glob
+import os
+
+import libsql
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+
+PROJECT_ID = "bench-project"
+JOB_ID = "bench-job"
+STANDALONE_PROJECT_ID = "bench-standalone-project"
+STANDALONE_JOB_ID = "bench-standalone-job"
+FRAMEWORKS = '["HIPPA"]'
+DESCRIPTION = "Every change to a patient record is logged with the user and a timestamp."
+
+
+def create_database(path: str):
+    """Creates `path` (replacing any existing file) with every migration applied."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = libsql.connect(database=path, auth_token="")
+    for migration in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        with open(migration, "r", encoding="utf-8") as f:
+            for statement in f.read().split("--> statement-breakpoint"):
+                if statement.strip():
+                    conn.execute(statement)
+    conn.execute("INSERT INTO scheduled_job (id, cloud_id, project_id, name) VALUES (?, 'bench-cloud', ?, 'bench')", (JOB_ID, PROJECT_ID))
+    conn.execute("INSERT INTO jira_project_compliance (project_id, frameworks) VALUES (?, ?)", (PROJECT_ID, FRAMEWORKS))
+    conn.execute("INSERT INTO standalone_scheduled_job (id, project_id, name) VALUES (?, ?, 'bench')", (STANDALONE_JOB_ID, STANDALONE_PROJECT_ID))
+    conn.execute("INSERT INTO standalone_project_compliance (project_id, frameworks) VALUES (?, ?)", (STANDALONE_PROJECT_ID, FRAMEWORKS))
+    for project_id, project_type in ((PROJECT_ID, "jira"), (STANDALONE_PROJECT_ID, "standalone")):
+        conn.execute(
+            "INSERT INTO project_custom_rule (id, project_id, project_type, title, description, severity, created_by) "
+            "VALUES (?, ?, ?, 'Session timeout', 'Sessions expire after 15 minutes of inactivity.', 'high', 'bench')",
+            (f"{project_id}-rule", project_id, project_type),
+        )
+    conn.commit()
+    return conn
+
+
+def seed_jira_issues(conn, count: int, status: str = "pending", prefix: str = "issue") -> list[str]:
+    """Inserts `count` Jira issues of the bench job and returns their ids."""
+    issue_ids = [f"{prefix}-{i}" for i in range(count)]
+    conn.executemany(
+        "INSERT INTO scheduled_job_issue (id, job_id, issue_id, issue_key, summary, description, status, issue_type_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'story')",
+        [(issue_id, JOB_ID, issue_id, f"BENCH-{i}", f"Audit trail {i}", DESCRIPTION, status) for i, issue_id in enumerate(issue_ids)],
+    )
+    conn.commit()
+    return issue_ids
+
+
+def seed_standalone_requirements(conn, count: int, status: str = "pending", prefix: str = "requirement") -> list[str]:
+    """Inserts `count` manually uploaded requirements of the bench job and returns their ids."""
+    requirement_ids = [f"{prefix}-{i}" for i in range(count)]
+    conn.executemany(
+        "INSERT INTO standalone_scheduled_job_requirement (id, job_id, name, content, status) VALUES (?, ?, ?, ?, ?)",
+        [(requirement_id, STANDALONE_JOB_ID, f"Audit trail {i}", DESCRIPTION, status) for i, requirement_id in enumerate(requirement_ids)],
+    )
+    conn.commit()
+    return requirement_ids
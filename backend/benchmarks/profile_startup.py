@@ -0,0 +1,136 @@
+"""Cold start of both functions: import time, warm-up cost and time to first response.
+
+Every measurement runs in a fresh interpreter. The import profile comes from
+`python -X importtime` (median of the runs, plus the slowest modules of one
+run). Each function is then started cold and warmed up:
+
+- test_case_gen: a redelivered message for an already completed issue (the
+  cheapest request, one claim against a local SQLite database built from the
+  migrations), then a first and second generation against an instant fake
+  model client, so the numbers are the function's own overhead.
+- event_dispatcher: creating the publisher, which the first request pays
+  unless the warm-up already did. PUBSUB_EMULATOR_HOST is set so no
+  credentials are looked up.
+
+    python backend/benchmarks/profile_startup.py [runs]
+"""
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+MODULES = ("test_case_gen.main", "event_dispatcher.main")
+LATENCY = {"fnf": 0, "tags": 0, "compliance": 0}
+
+
+def ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def import_profile(module: str, env: dict) -> tuple[float, list[tuple[float, str]]]:
+    """Returns the module's import time in ms and every imported module's cumulative time, slowest first."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1000, name.strip()))
+    total = next(ms for ms, name in modules if name == module)
+    return total, sorted(modules, reverse=True)
+
+
+def test_case_gen_child(warm: bool) -> dict:
+    started = time.perf_counter()
+    from test_case_gen import google_gen_ai, main
+    timings = {"import": ms_since(started)}
+
+    if warm:
+        timings["warm-up"] = main.warm_up()["total"]
+
+    from flask import Request
+    from simulate_deadline import SlowClient
+
+    message = base64.b64encode(json.dumps({"issueId": "completed-0", "source": "jira"}).encode()).decode()
+    started = time.perf_counter()
+    response, status = main.handler(Request.from_values(method="POST", json={"message": {"data": message}}))
+    assert status == 200, response
+    timings["skipped message"] = ms_since(started)
+
+    google_gen_ai.clients = google_gen_ai.ClientRegistry(lambda api_key: SlowClient(LATENCY))
+    for name in ("first generation", "second generation"):
+        started = time.perf_counter()
+        main.background_loop.run(main.generate_test_cases('["HIPPA"]', "[]", "Audit trail", "Every change is logged."))
+        timings[name] = ms_since(started)
+    return timings
+
+
+def event_dispatcher_child(warm: bool) -> dict:
+    started = time.perf_counter()
+    from event_dispatcher import main
+    timings = {"import": ms_since(started)}
+
+    if warm:
+        started = time.perf_counter()
+        main.get_publisher()
+        timings["warm-up"] = ms_since(started)
+
+    started = time.perf_counter()
+    main.get_publisher()
+    timings["publisher on first request"] = ms_since(started)
+    return timings
+
+
+def run_child(module: str, mode: str, env: dict) -> dict:
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", module, mode],
+                            cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main_():
+    if sys.argv[1:2] == ["--child"]:
+        child = test_case_gen_child if sys.argv[2] == "test_case_gen.main" else event_dispatcher_child
+        print(json.dumps(child(sys.argv[3] == "warm")))
+        return
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    from local_db import create_database, seed_jira_issues
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "startup.db")
+        conn = create_database(path)
+        seed_jira_issues(conn, 1, status="completed", prefix="completed")
+        conn.close()
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, BENCH_DIR]), TURSO_DATABASE_URL=path, TURSO_AUTH_TOKEN="",
+                   GOOGLE_CLOUD_API_KEY="bench", LLM_CACHE_BACKEND="off", PUBSUB_EMULATOR_HOST="localhost:8085",
+                   LOG_LEVEL="WARNING")
+
+        for module in MODULES:
+            totals = []
+            for _ in range(runs):
+                total, modules = import_profile(module, env)
+                totals.append(total)
+            print(f"{module}: import {statistics.median(totals):.0f} ms (median of {runs})")
+            for ms, name in [entry for entry in modules if entry[1] != module][:8]:
+                print(f"  {ms:>8.1f} ms  {name}")
+
+            for mode in ("cold", "warm"):
+                samples = [run_child(module, mode, env) for _ in range(runs)]
+                medians = {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+                print(f"  {mode:<5} " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in medians.items()))
+            print()
+
+
+if __name__ == "__main__":
+    main_()
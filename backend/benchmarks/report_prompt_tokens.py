@@ -0,0 +1,66 @@
+"""Compliance prompt size, previous json.dumps format vs the compact builder.
+
+Runs every tag's clause set from constants/compliance_reverse_index.json, and
+each source's full clause list, through both formats. It prints the
+estimated tokens of the clause message (about four characters per token).
+
+    python backend/benchmarks/report_prompt_tokens.py [ceiling]
+"""
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, os.path.join(ROOT, "backend", "src"))
+
+from test_case_gen.prompt_builder import build_compliance_messages, estimate_tokens  # noqa: E402
+
+PROMPT = "**Requirement Title**\n- Audit trail for record changes\n\n**Requirement Description**\n - Every change to a patient record is logged with user and timestamp."
+CUSTOM_RULES = [{"title": "Session timeout", "description": "Sessions expire after 15 minutes of inactivity."}]
+
+
+def clause_tokens(clauses: list[dict], prompt_format: str, ceiling: int = 0) -> tuple[int, int]:
+    built = build_compliance_messages(PROMPT, clauses, ["FDA", "HIPPA"], CUSTOM_RULES, ceiling=ceiling, prompt_format=prompt_format)
+    return estimate_tokens(built.messages[1][1]), built.clauses_with_text
+
+
+def main():
+    ceiling = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+
+    with open(os.path.join(ROOT, "constants", "compliance_index.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    with open(os.path.join(ROOT, "constants", "compliance_reverse_index.json"), "r", encoding="utf-8") as f:
+        reverse_index = json.load(f)
+
+    rows = []
+    for tag, clause_ids in reverse_index.items():
+        clauses = [index[clause_id] for clause_id in clause_ids]
+        legacy, _ = clause_tokens(clauses, "json")
+        compact, _ = clause_tokens(clauses, "compact")
+        capped, with_text = clause_tokens(clauses, "compact", ceiling)
+        rows.append((tag, len(clauses), legacy, compact, capped, with_text))
+
+    print(f"{len(index)} clauses, {len(reverse_index)} tags, ceiling {ceiling} tokens\n")
+    print(f"{'clause set':<44}{'clauses':>8}{'json':>8}{'compact':>9}{'capped':>8}{'saved':>7}")
+
+    sources: dict[str, list[dict]] = {}
+    for clause in index.values():
+        sources.setdefault(clause["source"], []).append(clause)
+    for source, clauses in [("all clauses", list(index.values())), *sources.items()]:
+        legacy, _ = clause_tokens(clauses, "json")
+        compact, _ = clause_tokens(clauses, "compact")
+        capped, _ = clause_tokens(clauses, "compact", ceiling)
+        print(f"{source[:43]:<44}{len(clauses):>8}{legacy:>8}{compact:>9}{capped:>8}{1 - capped / legacy:>7.0%}")
+
+    for tag, count, legacy, compact, capped, _ in sorted(rows, key=lambda row: row[2], reverse=True)[:5]:
+        print(f"{'tag ' + tag:<44}{count:>8}{legacy:>8}{compact:>9}{capped:>8}{1 - capped / legacy:>7.0%}")
+
+    legacy_total = sum(row[2] for row in rows)
+    compact_total = sum(row[3] for row in rows)
+    print(f"\nper tag: json {statistics.mean(row[2] for row in rows):.0f} tokens, compact {statistics.mean(row[3] for row in rows):.0f} "
+          f"({1 - compact_total / legacy_total:.0%} saved with full text kept)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Request deadline and stage cancellation against a slow fake model client.
+
+The google-genai client is replaced with a fake whose latency is set per call
+kind (functional, tags, compliance), and generate_test_cases runs under a
+short request deadline. Each scenario prints what the issue would be written
+with and how long it took; the deadline counters (stage timeouts and
+cancelled model calls) are printed at the end.
+
+    python backend/benchmarks/simulate_deadline.py [deadline_seconds]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen import deadline, google_gen_ai, main  # noqa: E402
+
+STEPS = ["Open the record", "Change a field", "Save"]
+RESPONSES = {
+    "fnf": {"success": True, "issue": "", "data": [{"summary": "Change is logged", "description": {
+        "type": "functional", "purpose": "Verify audit logging", "preconditions": "", "testing_procedure": STEPS,
+        "expected_result": "An audit entry is written", "requirement_coverage": "Audit trail"}}]},
+    "tags": {"tags": ["audit-logging"]},
+    "compliance": {"success": True, "issue": "", "data": [{"summary": "Audit trail retained", "description": {
+        "type": "compliance", "compliance_rule": "HIPAA 164.312(b)", "preconditions": "", "testing_procedure": STEPS,
+        "expected_result": "Entries are retained", "compliance_impact": "Audit controls"}}]},
+}
+
+# Latency in seconds per call kind.
+SCENARIOS = {
+    "fast": {"fnf": 0.05, "tags": 0.02, "compliance": 0.05},
+    "slow compliance": {"fnf": 0.05, "tags": 0.02, "compliance": 30},
+    "slow functional": {"fnf": 30, "tags": 0.02, "compliance": 0.05},
+    "slow tags": {"fnf": 0.05, "tags": 30, "compliance": 0.05},
+}
+
+
+def call_kind(config) -> str:
+    instruction = config.system_instruction[0].text
+    if "Tag Analyzer" in instruction:
+        return "tags"
+    return "compliance" if "compliance-focused" in instruction else "fnf"
+
+
+class SlowModels:
+
+    def __init__(self, latency: dict[str, float]):
+        self.latency = latency
+
+    async def generate_content(self, model, contents, config):
+        kind = call_kind(config)
+        await asyncio.sleep(self.latency[kind])
+        return SimpleNamespace(text=json.dumps(RESPONSES[kind]), usage_metadata=None)
+
+
+class SlowClient:
+
+    def __init__(self, latency: dict[str, float]):
+        self.aio = SimpleNamespace(models=SlowModels(latency), aclose=self.aclose)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def run(latency: dict[str, float], seconds: float):
+    google_gen_ai.clients = google_gen_ai.ClientRegistry(lambda api_key: SlowClient(latency))
+    with deadline.deadline(seconds):
+        try:
+            success, reason, test_cases = await main.generate_test_cases('["HIPPA"]', "[]", "Audit trail", "Every change is logged.")
+        except deadline.DeadlineExceeded as e:
+            return "failed", str(e), 0
+    return ("completed" if success else "failed"), reason, len(test_cases)
+
+
+def main_():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    print(f"request deadline {seconds:.1f}s\n")
+    print(f"{'scenario':<18}{'status':<11}{'cases':>6}{'elapsed':>9}  reason")
+
+    for name, latency in SCENARIOS.items():
+        started = time.perf_counter()
+        status, reason, count = asyncio.run(run(latency, seconds))
+        print(f"{name:<18}{status:<11}{count:>6}{time.perf_counter() - started:>8.2f}s  {reason or ''}")
+
+    print(f"\n{deadline.stats()}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,100 @@
+"""Simulated quota errors against the Gemini rate limiter.
+
+A fake model endpoint serves at most `capacity` calls per second (excess calls
+get a 429) and additionally fails `error_rate` of calls with a random 429 or
+503. A burst of calls, like the one a large dispatcher fan-out produces, is
+sent through three clients:
+
+    direct     no limiter and no retry (the previous behaviour)
+    retry      jittered retries only
+    adaptive   AIMD token bucket, concurrency cap and retries
+
+    python backend/benchmarks/simulate_rate_limiter.py [calls] [capacity] [error_rate]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from test_case_gen.rate_limiter import AdaptiveRateLimiter, RetryPolicy  # noqa: E402
+
+LATENCY = 0.05
+RETRY_POLICY = RetryPolicy(max_attempts=6, base_delay=0.1, max_delay=2.0)
+
+
+class APIError(Exception):
+
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+class FakeEndpoint:
+    """Admits `capacity` calls per second with a one-second token bucket."""
+
+    def __init__(self, capacity: float, error_rate: float):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._tokens = capacity
+        self._refilled_at = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+
+    async def generate(self):
+        self.requests += 1
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._refilled_at) * self._capacity)
+        self._refilled_at = now
+
+        await asyncio.sleep(LATENCY)
+        if self._tokens < 1:
+            self.rejected += 1
+            raise APIError(429)
+        self._tokens -= 1
+        if random.random() < self._error_rate:
+            self.rejected += 1
+            raise APIError(random.choice((429, 503)))
+        return "ok"
+
+
+async def run(name: str, calls: int, capacity: float, error_rate: float):
+    endpoint = FakeEndpoint(capacity, error_rate)
+    if name == "direct":
+        limiter = None
+    elif name == "retry":
+        limiter = AdaptiveRateLimiter(max_concurrency=calls, rate=1e6, min_rate=1e6, max_rate=1e6, retry_policy=RETRY_POLICY)
+    else:
+        limiter = AdaptiveRateLimiter(max_concurrency=8, rate=capacity / 2, max_rate=capacity * 2, retry_policy=RETRY_POLICY)
+
+    async def call():
+        if limiter is None:
+            return await endpoint.generate()
+        return await limiter.call(endpoint.generate)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(calls)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    failed = sum(isinstance(result, Exception) for result in results)
+    stats = limiter.stats() if limiter else {}
+    print(f"{name:>9}{calls - failed:>10}{failed:>8}{endpoint.requests:>10}{endpoint.rejected:>10}"
+          f"{stats.get('retries', 0):>9}{elapsed:>9.2f}s{stats.get('queue_wait_ms_max', 0) / 1000:>10.2f}s")
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    capacity = float(sys.argv[2]) if len(sys.argv) > 2 else 40
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+    random.seed(0)
+    print(f"{calls} calls, capacity {capacity:g}/s, {error_rate:.0%} injected errors, {LATENCY * 1000:.0f} ms latency\n")
+    print(f"{'client':>9}{'succeeded':>10}{'failed':>8}{'requests':>10}{'rejected':>10}{'retries':>9}{'wall':>10}{'max wait':>11}")
+    for name in ("direct", "retry", "adaptive"):
+        asyncio.run(run(name, calls, capacity, error_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,110 @@
 """Event Dispatcher: Cloud Run Function to publish messages to Pub/Sub."""
 import os
 import json
+import threading
+import time
+from concurrent import futures
 from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Tuple
 
 from functions_framework import http
 from flask import Request
-from google.cloud import pubsub_v1
-from google.api_core.exceptions import GoogleAPICallError, RetryError, NotFound, Forbidden
 
-publisher: pubsub_v1.PublisherClient = pubsub_v1.PublisherClient()
+# google.cloud.pubsub_v1 and google.api_core are imported, and the publisher created,
+# on first use: they are most of the module's import time, and functions-framework
+# imports this module in the gunicorn master before forking the worker, where a gRPC
+# channel created before the fork cannot be used.
+if TYPE_CHECKING:
+    from google.cloud import pubsub_v1
+
+PUBLISH_TIMEOUT_SECONDS: float = float(os.environ.get("PUBLISH_TIMEOUT_SECONDS", "45"))
+ISSUES_PER_MESSAGE: int = max(1, int(os.environ.get("ISSUES_PER_MESSAGE", "1")))
+PUBLISH_BATCH_MAX_MESSAGES: int = int(os.environ.get("PUBLISH_BATCH_MAX_MESSAGES", "500"))
+PUBLISH_BATCH_MAX_BYTES: int = int(os.environ.get("PUBLISH_BATCH_MAX_BYTES", str(1024 * 1024)))
+PUBLISH_BATCH_MAX_LATENCY: float = float(os.environ.get("PUBLISH_BATCH_MAX_LATENCY", "0.05"))
+# "background" creates the publisher on a thread as soon as the worker starts; "request" leaves it to the first request.
+WARM_UP: str = os.environ.get("WARM_UP", "background").lower()
+
 topic_name: str = os.environ.get("TOPIC_NAME", "")
 project_id: str = os.environ.get("PROJECT_ID", "")
-topic_path: str = publisher.topic_path(project_id, topic_name)
+
+_publisher_lock = threading.Lock()
+_publisher: "tuple[pubsub_v1.PublisherClient, str] | None" = None
+
+
+def batch_settings() -> "pubsub_v1.types.BatchSettings":
+    from google.cloud import pubsub_v1
+
+    return pubsub_v1.types.BatchSettings(
+        max_messages=PUBLISH_BATCH_MAX_MESSAGES,
+        max_bytes=PUBLISH_BATCH_MAX_BYTES,
+        max_latency=PUBLISH_BATCH_MAX_LATENCY,
+    )
+
+
+def get_publisher() -> "tuple[pubsub_v1.PublisherClient, str]":
+    """Returns the process-wide batching publisher and the topic path, creating them on first use."""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                from google.cloud import pubsub_v1
+
+                publisher = pubsub_v1.PublisherClient(batch_settings=batch_settings())
+                _publisher = (publisher, publisher.topic_path(project_id, topic_name))
+    return _publisher
+
+
+def _warm_up_in_background():
+    if WARM_UP == "background":
+        threading.Thread(target=get_publisher, name="event-dispatcher-warmup", daemon=True).start()
+
+
+# Threads do not survive the fork into the worker, so the warm-up starts in the child.
+os.register_at_fork(after_in_child=_warm_up_in_background)
+
+
+def publish_issue_events(publisher, topic_path: str, issue_ids: list[str], source: str, timeout: float = PUBLISH_TIMEOUT_SECONDS, issues_per_message: int = ISSUES_PER_MESSAGE) -> list[list[str]]:
+    """Publishes the issue events through the batching publisher and waits on all of them together.
+
+    With issues_per_message > 1, issues are grouped into multi-issue ("issueIds") messages.
+    Returns [issue_id, error] pairs for every issue whose message was not published.
+    """
+    from google.api_core.exceptions import GoogleAPICallError, RetryError, NotFound, Forbidden
+
+    unprocessed_issues: list[list[str]] = []
+    pending: list[tuple[list[str], futures.Future]] = []
+
+    for start in range(0, len(issue_ids), issues_per_message):
+        chunk: list[str] = issue_ids[start:start + issues_per_message]
+        try:
+            if len(chunk) == 1:
+                event = {
+                    "issueId": chunk[0],
+                    "source": source
+                }
+            else:
+                event = {
+                    "issueIds": chunk,
+                    "source": source
+                }
+            message_bytes: bytes = json.dumps(event).encode("utf-8")
+            pending.append((chunk, publisher.publish(topic_path, message_bytes)))
+        except (GoogleAPICallError, RetryError, NotFound, Forbidden, ValueError) as e:
+            unprocessed_issues.extend([issue_id, str(e)] for issue_id in chunk)
+
+    futures.wait([future for _, future in pending], timeout=timeout)
+
+    for chunk, future in pending:
+        if not future.done():
+            unprocessed_issues.extend([issue_id, f"Publish timed out after {timeout}s"] for issue_id in chunk)
+            continue
+        try:
+            future.result()
+        except (GoogleAPICallError, RetryError, NotFound, Forbidden) as e:
+            unprocessed_issues.extend([issue_id, str(e)] for issue_id in chunk)
+
+    return unprocessed_issues
 
 
 @http
@@ -20,24 +112,19 @@ def handler(request: Request) -> Tuple[Dict[str, Any], int]:
     try:
         data: Dict[str, Any] | None = request.get_json(silent=True)
 
+        if request.args.get("warmup") or (data or {}).get("warmup"):
+            started = time.perf_counter()
+            get_publisher()
+            return {"success": True, "warmup": {"publisher": round((time.perf_counter() - started) * 1000, 1)}}, 200
+
         if not data:
             return {"success": False, "error": "Missing JSON body"}, 400
 
         issue_ids: list[str] = data.get("issueIds")
         source: str = data.get("source")
 
-        unprocessed_issues: list[str] = []
-
-        for issue_id in issue_ids:
-            try:
-                event = {
-                    "issueId": issue_id,
-                    "source": source
-                }
-                message_bytes: bytes = json.dumps(event).encode("utf-8")
-                publisher.publish(topic_path, message_bytes).result()
-            except (GoogleAPICallError, RetryError, NotFound, Forbidden) as e:
-                unprocessed_issues.append([issue_id, str(e)])
+        publisher, topic_path = get_publisher()
+        unprocessed_issues: list[list[str]] = publish_issue_events(publisher, topic_path, issue_ids, source)
 
         response_data: Dict[str, Any] = {
             "success": True,
@@ -0,0 +1,103 @@
+"""Process-wide store for the static files bundled with the function."""
+import json
+import os
+import threading
+import time
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SYSTEM_INSTRUCTION = "system_instruction.md"
+COMPLIANCE_TAGS_INSTRUCTION = "compliance_tags_instruction.md"
+COMPLIANCE_TEST_CASES_INSTRUCTION = "compliance_test_cases_instruction.md"
+COMPLIANCE_INDEX = "compliance_index.json"
+COMPLIANCE_REVERSE_INDEX = "compliance_reverse_index.json"
+COMPLIANCE_TAG_INDEX = "compliance_tag_index.json"
+COMPLIANCE_CLAUSE_VECTORS = "compliance_clause_vectors.npz"
+COMPLIANCE_CLAUSE_VECTORS_META = "compliance_clause_vectors.json"
+
+
+class AssetStore:
+    """Loads each asset once and keeps it for the lifetime of the instance.
+
+    Files are re-read only when their mtime changes, so edits made during
+    local development are still picked up. Returned objects are shared
+    between requests and must be treated as read-only.
+    """
+
+    def __init__(self, base_dir: str = ASSETS_DIR, check_interval: float = 1.0):
+        self._base_dir = base_dir
+        self._check_interval = check_interval
+        self._entries: dict[tuple[str, str], tuple[int, object]] = {}
+        self._checked_at: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def _mtime(self, name: str) -> int:
+        now = time.monotonic()
+        checked = self._checked_at.get(name)
+        if checked and now - checked[0] < self._check_interval:
+            return checked[1]
+        mtime = os.stat(os.path.join(self._base_dir, name)).st_mtime_ns
+        self._checked_at[name] = (now, mtime)
+        return mtime
+
+    def _load(self, name: str, kind: str):
+        key = (name, kind)
+        mtime = self._mtime(name)
+        entry = self._entries.get(key)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == mtime:
+                return entry[1]
+            if kind == "arrays":
+                import numpy as np
+                with np.load(os.path.join(self._base_dir, name)) as archive:
+                    value = {array_name: archive[array_name] for array_name in archive.files}
+            else:
+                with open(os.path.join(self._base_dir, name), "r", encoding="utf-8") as f:
+                    value = json.load(f) if kind == "json" else f.read()
+            self._entries[key] = (mtime, value)
+            return value
+
+    def text(self, name: str) -> str:
+        return self._load(name, "text")
+
+    def json(self, name: str):
+        return self._load(name, "json")
+
+    def arrays(self, name: str) -> dict:
+        """Loads every array of a .npz file, by name; needs numpy."""
+        return self._load(name, "arrays")
+
+    def tag_clause_lookup(self) -> dict[str, tuple[dict, ...]]:
+        """Maps every compliance tag straight to its clause dicts."""
+        version = (self._mtime(COMPLIANCE_INDEX), self._mtime(COMPLIANCE_REVERSE_INDEX))
+        entry = self._entries.get(("tag_clause_lookup", "derived"))
+        if entry and entry[0] == version:
+            return entry[1]
+
+        compliance_index = self.json(COMPLIANCE_INDEX)
+        reverse_index = self.json(COMPLIANCE_REVERSE_INDEX)
+        lookup = {
+            tag: tuple(compliance_index[clause_id] for clause_id in clause_ids)
+            for tag, clause_ids in reverse_index.items()
+        }
+        self._entries[("tag_clause_lookup", "derived")] = (version, lookup)
+        return lookup
+
+    def clauses_for_tags(self, tags: list) -> list[dict]:
+        """Returns the de-duplicated clauses for the given tags, in tag order."""
+        lookup = self.tag_clause_lookup()
+        seen = set()
+        clauses = []
+        for tag in tags:
+            for clause in lookup.get(tag, ()):
+                if id(clause) not in seen:
+                    seen.add(id(clause))
+                    clauses.append(clause)
+        return clauses
+
+
+assets = AssetStore()
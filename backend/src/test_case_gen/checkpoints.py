@@ -0,0 +1,92 @@
+"""Per-issue checkpoints of completed generation stages.
+
+Each stage's output (functional test cases, compliance tags, compliance test
+cases) is written to issue_generation_checkpoint as soon as the stage
+finishes, keyed by issue id and a hash of the issue's generation inputs. When
+an invocation dies mid-issue and Pub/Sub redelivers the message, the next
+attempt reuses the completed stages instead of paying for their model calls
+again. An edited requirement or project context changes the hash, so stale
+checkpoints are ignored. STAGE_CHECKPOINTS=false turns this off.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable
+
+from .database import run_db
+from .decoding import dumps, loads
+from .tracing import current_span
+
+STAGE_CHECKPOINTS = os.getenv("STAGE_CHECKPOINTS", "true").lower() in ("1", "true")
+
+FNF = "fnf"
+COMPLIANCE_TAGS = "compliance_tags"
+COMPLIANCE = "compliance"
+
+logger = logging.getLogger(__name__)
+
+_stats = {"resumed": 0, "saved": 0, "errors": 0}
+
+def prompt_hash(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+
+def stats() -> dict:
+    return dict(_stats)
+
+class StageCheckpoints:
+    """Completed stages of one issue; without a repository every stage just runs."""
+
+    def __init__(self, repo=None, issue_id: str = None, prompt_hash: str = None, saved: dict[str, Any] = None):
+        self._repo = repo
+        self._issue_id = issue_id
+        self._prompt_hash = prompt_hash
+        self._saved = saved or {}
+        self.resumed: list[str] = []
+
+    async def run(self, stage: str, generate: Callable[[], Awaitable[Any]], keep_if: Callable[[Any], bool] = lambda value: True):
+        """Returns the checkpointed output of `stage`, or awaits generate() and checkpoints its result."""
+        if stage in self._saved:
+            _stats["resumed"] += 1
+            self.resumed.append(stage)
+            logger.info("Resuming issue %s from its %s checkpoint", self._issue_id, stage)
+            span = current_span()
+            if span is not None:
+                span.set(checkpoint="resumed")
+            return self._saved[stage]
+
+        value = await generate()
+
+        if self._repo is not None and keep_if(value):
+            try:
+                await run_db(self._repo.save_checkpoint, self._issue_id, stage, self._prompt_hash, dumps(value))
+                _stats["saved"] += 1
+            except Exception:
+                logger.exception("Saving the %s checkpoint of issue %s failed", stage, self._issue_id)
+                _stats["errors"] += 1
+        return value
+
+NO_CHECKPOINTS = StageCheckpoints()
+
+async def load_stage_checkpoints(repo, prompt_hashes: dict[str, str]) -> dict[str, StageCheckpoints]:
+    """Loads the checkpoints of many issues in one query; `prompt_hashes` maps issue id to prompt hash."""
+    if not STAGE_CHECKPOINTS:
+        return {issue_id: NO_CHECKPOINTS for issue_id in prompt_hashes}
+
+    saved: dict[str, dict[str, Any]] = {issue_id: {} for issue_id in prompt_hashes}
+    try:
+        rows = await run_db(repo.load_checkpoints, list(prompt_hashes)) if prompt_hashes else []
+    except Exception:
+        logger.exception("Loading stage checkpoints failed, generating from scratch")
+        _stats["errors"] += 1
+        rows = []
+
+    for issue_id, stage, checkpoint_hash, value in rows:
+        if checkpoint_hash != prompt_hashes.get(issue_id):
+            continue
+        try:
+            saved[issue_id][stage] = loads(value)
+        except ValueError:
+            logger.warning("Ignoring unreadable %s checkpoint of issue %s", stage, issue_id)
+
+    return {issue_id: StageCheckpoints(repo, issue_id, issue_hash, saved[issue_id]) for issue_id, issue_hash in prompt_hashes.items()}
@@ -1,80 +1,277 @@
 from .google_gen_ai import GoogleGenAI
+import asyncio
 import json
+import logging
+import os
+import re
 
-from .schema import ComplianceTestCaseResponseSchema
+from .assets import (
+    assets, COMPLIANCE_TAGS_INSTRUCTION, COMPLIANCE_TEST_CASES_INSTRUCTION, COMPLIANCE_TAG_INDEX,
+    COMPLIANCE_CLAUSE_VECTORS, COMPLIANCE_CLAUSE_VECTORS_META
+)
+from .checkpoints import COMPLIANCE_TAGS as TAGS_STAGE, NO_CHECKPOINTS, StageCheckpoints
+from .decoding import COMPLIANCE_TYPES, decode_response, decode_tags
+from .planner import FRAMEWORK_SOURCES
+from .profiles import COMPLIANCE, TAGS, profiles
+from .prompt_builder import build_compliance_messages, estimate_tokens
+from .response_cache import response_cache
+from .schema import ComplianceTestCaseResponseSchema, schema_fingerprint
+from .text_index import ClauseRanker, TagMatcher
+from .tracing import current_span, tracer
+
+# "llm" lets the model pick from the full tag list. "prefilter" narrows that list, in the
+# instruction and in the answer, to the COMPLIANCE_TAG_CANDIDATES tags the keyword index
+# ranks best, which shortens the tag call. It stays off until its recall is measured on
+# real requirements (benchmarks/eval_tag_matcher.py): on the shipped samples the top 20
+# keyword candidates hold only about two thirds of the model's tags.
+TAG_MATCHER_MODE = os.getenv("COMPLIANCE_TAG_MATCHER", "llm")
+TAG_CANDIDATES = int(os.getenv("COMPLIANCE_TAG_CANDIDATES", "20"))
+# Clause groups generated concurrently: "source", "chunk" (COMPLIANCE_CHUNK_SIZE clauses each) or "none".
+COMPLIANCE_PARTITION = os.getenv("COMPLIANCE_PARTITION", "source")
+COMPLIANCE_CHUNK_SIZE = int(os.getenv("COMPLIANCE_CHUNK_SIZE", "20"))
+COMPLIANCE_CONCURRENCY = int(os.getenv("COMPLIANCE_CONCURRENCY", "3"))
+# Matched clauses are ranked against the requirement and capped; 0 disables either limit.
+# The cap is off until its recall is measured against clauses labelled relevant
+# (benchmarks/eval_clause_ranking.py); a clause cut here gets no test case.
+COMPLIANCE_CLAUSE_TOP_K = int(os.getenv("COMPLIANCE_CLAUSE_TOP_K", "0"))
+# The compact prompt builder enforces the input ceiling, so this pre-cut is off by default.
+COMPLIANCE_CLAUSE_TOKEN_BUDGET = int(os.getenv("COMPLIANCE_CLAUSE_TOKEN_BUDGET", "0"))
+
+logger = logging.getLogger(__name__)
+
+_tag_matcher: tuple[dict, TagMatcher] | None = None
+
+def get_tag_matcher() -> TagMatcher:
+    global _tag_matcher
+    index = assets.json(COMPLIANCE_TAG_INDEX)
+    if _tag_matcher is None or _tag_matcher[0] is not index:
+        _tag_matcher = (index, TagMatcher(index))
+    return _tag_matcher[1]
+
+_ALLOWED_TAG_LIST = re.compile(r"(### ALLOWED TAG LIST \(Strict Enum\)\n)\[.*?\]", re.DOTALL)
+
+def tags_instruction(candidates: list[str] = None) -> str:
+    """The tag instruction, with its allowed tag list narrowed to `candidates` when given."""
+    instruction = assets.text(COMPLIANCE_TAGS_INSTRUCTION)
+    if not candidates:
+        return instruction
+    return _ALLOWED_TAG_LIST.sub(lambda match: match.group(1) + json.dumps(candidates), instruction, count=1)
+
+_clause_ranker: tuple[object, ClauseRanker | None] | None = None
+
+def get_clause_ranker() -> ClauseRanker | None:
+    """Returns the ranker, or None when numpy or the clause vectors are unavailable."""
+    global _clause_ranker
+    try:
+        vectors = assets.arrays(COMPLIANCE_CLAUSE_VECTORS)
+    except (ImportError, OSError) as e:
+        if _clause_ranker is None:
+            logger.warning("Clause ranking unavailable, keeping tag order: %r", e)
+            _clause_ranker = (None, None)
+        return None
+    if _clause_ranker is None or _clause_ranker[0] is not vectors:
+        _clause_ranker = (vectors, ClauseRanker(vectors, assets.json(COMPLIANCE_CLAUSE_VECTORS_META)))
+    return _clause_ranker[1]
+
+def select_clauses(prompt: str, clauses: list[dict], top_k: int = None, token_budget: int = None) -> list[dict]:
+    """Keeps the clauses most similar to the prompt, at most `top_k` and within `token_budget`.
+
+    Without a ranker the tag order is kept. The best clause is always kept.
+    """
+    top_k = COMPLIANCE_CLAUSE_TOP_K if top_k is None else top_k
+    token_budget = COMPLIANCE_CLAUSE_TOKEN_BUDGET if token_budget is None else token_budget
+    if len(clauses) <= 1:
+        return clauses
+
+    ranker = get_clause_ranker()
+    if ranker is not None:
+        scores = ranker.scores(prompt, clauses)
+        clauses = [clause for _, clause in sorted(zip(scores, clauses), key=lambda pair: pair[0], reverse=True)]
+
+    selected = []
+    used = 0
+    for clause in clauses[:top_k or None]:
+        tokens = estimate_tokens(json.dumps(clause))
+        if selected and token_budget and used + tokens > token_budget:
+            break
+        selected.append(clause)
+        used += tokens
+    return selected
 
 class ComplianceTestCaseGeneration:
 
     def __init__(self, api_key: str, db_client=None):
         self.api_key = api_key
-        self.gen_ai = GoogleGenAI(self.api_key)
+        self.tags_gen_ai = GoogleGenAI(self.api_key, profiles[TAGS])
+        self.gen_ai = GoogleGenAI(self.api_key, profiles[COMPLIANCE])
         self.db = db_client
 
-    def __get_compliance_tags_instruction(self) -> str:
+    async def classify_tags(self, prompt: str, mode: str = None) -> list[str]:
+        mode = mode or TAG_MATCHER_MODE
 
-        with open("./compliance_tags_instruction.md", "r", encoding='utf-8') as f:
-            instruction = f.read()
-        return instruction
+        with tracer.span("compliance.tags", mode=mode) as span:
+            candidates = get_tag_matcher().candidates(prompt, TAG_CANDIDATES) if mode == "prefilter" else []
 
-    def __get_compliance_test_cases_instruction(self) -> str:
+            async def generate() -> list[str]:
+                response = await self.tags_gen_ai.generate(
+                    messages=[("user", prompt)],
+                    system_instruction=tags_instruction(candidates),
+                    schema=ComplianceTestCaseResponseSchema.get_compliance_tags_schema()
+                )
+                with tracer.span("json.parse", stage="compliance_tags"):
+                    tags = decode_tags(response.text)
+                # The few-shot examples name tags outside the candidates; keep to the narrowed list.
+                return [tag for tag in tags if tag in candidates] if candidates else tags
 
-        with open("./compliance_test_cases_instruction.md", "r", encoding='utf-8') as f:
-            instruction = f.read()
-        return instruction
-    
-    def __get_compliance_index(self) -> dict:
-        with open("./compliance_index.json", "r", encoding='utf-8') as f:
-            compliance_index = json.load(f)
-        return compliance_index
-    
-    def __get_compliance_reverse_index(self) -> dict:
-        with open("./compliance_reverse_index.json", "r", encoding='utf-8') as f:
-            compliance_reverse_index = json.load(f)
-        return compliance_reverse_index
-
-    def __get_compliance_clause_ids(self, tags: list) -> list:
-        reverse_index = self.__get_compliance_reverse_index()
-        clause_ids = []
-        for tag in tags:
-            clause_ids.extend(reverse_index[tag])
-        return list(set(clause_ids))
-
-    def __get_compliance_clauses(self, clause_ids: list) -> list:
-        compliance_index = self.__get_compliance_index()
-        clauses = []
-        for clause_id in clause_ids:
-            clauses.append(compliance_index[clause_id])
-        return clauses
+            # Tags depend only on the requirement text, the tag profile and any candidates.
+            key = (self.tags_gen_ai.profile, prompt, candidates) if candidates else (self.tags_gen_ai.profile, prompt)
+            tags = await response_cache.get_or_generate("compliance_tags", key, generate)
+            if span:
+                span.set(tag_count=len(tags))
+                if candidates:
+                    span.set(candidate_count=len(candidates))
+            return tags
 
-    async def generate(self, prompt: str, project_compliance: list=None, project_custom_rules: list=None) -> dict:
+    async def generate(self, prompt: str, project_compliance: list=None, project_custom_rules: list=None, clause_sources: frozenset=None,
+                       checkpoints: StageCheckpoints = NO_CHECKPOINTS) -> dict:
+        """Generates compliance test cases.
 
-        messages = [("user", prompt)]
+        When `clause_sources` is given, only clauses from those sources are sent to
+        the model; the second call is skipped if nothing remains to test against.
+        The tags are taken from, and saved to, `checkpoints`.
+        """
 
-        response = await self.gen_ai.generate(
-            messages=messages,
-            system_instruction=self.__get_compliance_tags_instruction(),
-            schema=ComplianceTestCaseResponseSchema.get_compliance_tags_schema()
-        )
+        with tracer.span("compliance.generate") as span:
+            response = await self._generate(prompt, project_compliance, project_custom_rules, clause_sources, checkpoints)
+            if span:
+                span.set(success=response.get("success"), test_case_count=len(response.get("data", [])))
+            return response
 
-        tags = json.loads(response.text).get("tags", [])
+    async def _generate(self, prompt: str, project_compliance: list, project_custom_rules: list, clause_sources: frozenset,
+                        checkpoints: StageCheckpoints) -> dict:
+        tags = await checkpoints.run(TAGS_STAGE, lambda: self.classify_tags(prompt))
 
-        if tags:
-            compliance_clause_ids = self.__get_compliance_clause_ids(tags)
-            compliance_clauses = self.__get_compliance_clauses(compliance_clause_ids)
-            messages.append(("user", "The relevant compliance clauses are: " + json.dumps(compliance_clauses)))
-            messages.append(("user", "Project compliance standards to consider: " + json.dumps(project_compliance) if project_compliance else "No specific project compliance requirements provided."))
-            messages.append(("user", "Project custom rules to ensure: " + json.dumps(project_custom_rules) if project_custom_rules else "No specific project custom rules provided."))
-        else:
+        if not tags:
             return {
                 "success": False,
                 "issue": "No compliance tags found.",
                 "data": []
             }
 
-        final_msg = await self.gen_ai.generate(
-            messages=messages,
-            system_instruction=self.__get_compliance_test_cases_instruction(),
-            schema=ComplianceTestCaseResponseSchema.get_compliance_schema()
+        compliance_clauses = assets.clauses_for_tags(tags)
+        if clause_sources is not None:
+            compliance_clauses = [clause for clause in compliance_clauses if clause["source"] in clause_sources]
+            uncovered_frameworks = [f for f in project_compliance or [] if f not in FRAMEWORK_SOURCES]
+            if not compliance_clauses and not uncovered_frameworks and not project_custom_rules:
+                return {
+                    "success": False,
+                    "issue": "No compliance clauses apply to the project frameworks.",
+                    "data": []
+                }
+
+        if compliance_clauses:
+            matched = len(compliance_clauses)
+            compliance_clauses = select_clauses(prompt, compliance_clauses)
+            span = current_span()
+            if span is not None:
+                span.set(matched_clauses=matched, selected_clauses=len(compliance_clauses))
+
+        chunks = partition_clauses(compliance_clauses)
+        if len(chunks) == 1:
+            return await self._generate_chunk(prompt, chunks[0], project_compliance, project_custom_rules)
+
+        semaphore = asyncio.Semaphore(COMPLIANCE_CONCURRENCY)
+
+        async def generate_chunk(index: int, clauses: list[dict]) -> dict:
+            async with semaphore:
+                with tracer.span("compliance.chunk", index=index, clause_count=len(clauses), sources=sorted({c["source"] for c in clauses})):
+                    # Custom rules go with the first chunk only, so they are not tested once per chunk.
+                    return await self._generate_chunk(prompt, clauses, project_compliance, project_custom_rules if index == 0 else None)
+
+        responses = await asyncio.gather(*(generate_chunk(index, clauses) for index, clauses in enumerate(chunks)), return_exceptions=True)
+        return merge_responses(responses)
+
+    async def _generate_chunk(self, prompt: str, compliance_clauses: list[dict], project_compliance: list, project_custom_rules: list) -> dict:
+        compliance_prompt = build_compliance_messages(prompt, compliance_clauses, project_compliance, project_custom_rules)
+        messages = compliance_prompt.messages
+        span = current_span()
+        if span is not None:
+            span.set(
+                estimated_input_tokens=compliance_prompt.estimated_tokens,
+                clauses_with_text=compliance_prompt.clauses_with_text,
+                clauses_dropped=compliance_prompt.clauses_dropped
+            )
+
+        system_instruction = assets.text(COMPLIANCE_TEST_CASES_INSTRUCTION)
+        schema = ComplianceTestCaseResponseSchema.get_compliance_schema()
+
+        async def generate() -> dict:
+            final_msg = await self.gen_ai.generate(
+                messages=messages,
+                system_instruction=system_instruction,
+                schema=schema
+            )
+            with tracer.span("json.parse", stage="compliance"):
+                return decode_response(final_msg.text, COMPLIANCE_TYPES)
+
+        # messages carry the clauses, project compliance list and custom rules.
+        return await response_cache.get_or_generate(
+            "compliance",
+            (self.gen_ai.profile, messages, system_instruction, schema_fingerprint(schema)),
+            generate,
+            cache_if=lambda response: response.get("success")
         )
 
-        return json.loads(final_msg.text)
+def partition_clauses(clauses: list[dict], mode: str = None, chunk_size: int = None) -> list[list[dict]]:
+    """Splits the clauses into the groups that are generated concurrently.
+
+    "source" groups by clause source, "chunk" into runs of `chunk_size`, and
+    "none" keeps one group. In "source" mode, groups larger than `chunk_size`
+    are split further. Always returns at least one (possibly empty) group.
+    """
+    mode = mode or COMPLIANCE_PARTITION
+    chunk_size = chunk_size or COMPLIANCE_CHUNK_SIZE
+
+    if mode == "none" or not clauses:
+        return [clauses]
+    if mode == "chunk":
+        return [clauses[i:i + chunk_size] for i in range(0, len(clauses), chunk_size)]
+    if mode == "source":
+        groups: dict[str, list[dict]] = {}
+        for clause in clauses:
+            groups.setdefault(clause["source"], []).append(clause)
+        return [group[i:i + chunk_size] for group in groups.values() for i in range(0, len(group), chunk_size)]
+    raise ValueError(f"Unknown COMPLIANCE_PARTITION: {mode}")
+
+def merge_responses(responses: list) -> dict:
+    """Merges per-chunk responses, dropping test cases for a compliance rule an earlier chunk already covered.
+
+    Failed or raising chunks are skipped as long as one chunk succeeded.
+    """
+    succeeded = [response for response in responses if isinstance(response, dict) and response.get("success")]
+
+    if not succeeded:
+        for response in responses:
+            if isinstance(response, BaseException):
+                raise response
+        return responses[0]
+
+    for response in responses:
+        if isinstance(response, BaseException):
+            logger.error("Compliance chunk failed: %r", response)
+        elif not response.get("success"):
+            logger.warning("Compliance chunk failed: %s", response.get("issue"))
+
+    seen_rules = set()
+    data = []
+    for response in succeeded:
+        chunk_rules = set()
+        for test_case in response.get("data", []):
+            rule = " ".join(str(test_case.get("description", {}).get("compliance_rule", "")).lower().split())
+            if rule and rule in seen_rules:
+                continue
+            chunk_rules.add(rule)
+            data.append(test_case)
+        seen_rules |= chunk_rules
+
+    return {"success": True, "issue": "", "data": data}
@@ -0,0 +1,128 @@
+"""Gemini cached contents for the static system instructions.
+
+With CONTEXT_CACHE_TTL_SECONDS set, an instruction of at least
+CONTEXT_CACHE_MIN_CHARS characters is uploaded once as cached content and
+referenced by name, instead of being resent as input on every call. Entries
+are keyed by model and a hash of the instruction text, so editing an
+instruction file creates a new cache. Entries are renewed shortly before they
+expire. Any failure falls back to sending the instruction inline, and
+creation is not retried for that instruction until the backoff has passed.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "0"))
+# The service rejects cached contents below a minimum token count (1024 for gemini-2.5-flash).
+CONTEXT_CACHE_MIN_CHARS = int(os.getenv("CONTEXT_CACHE_MIN_CHARS", "4096"))
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedInstruction:
+    name: str
+    expires_at: float
+
+class InstructionCache:
+
+    def __init__(self, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS, min_chars: int = CONTEXT_CACHE_MIN_CHARS,
+                 renew_margin: float = 300, failure_backoff: float = 600, clock: Callable[[], float] = time.time):
+        self._ttl_seconds = ttl_seconds
+        self._min_chars = min_chars
+        self._renew_margin = min(renew_margin, ttl_seconds / 2)
+        self._failure_backoff = failure_backoff
+        self._clock = clock
+        self._entries: dict[tuple[str, str], CachedInstruction] = {}
+        self._failed_until: dict[tuple[str, str], float] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "created": 0, "renewed": 0, "failed": 0, "invalidated": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl_seconds > 0
+
+    def _key(self, model: str, system_instruction: str) -> tuple[str, str]:
+        return model, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+
+    def _key_lock(self, key: tuple[str, str]) -> asyncio.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, asyncio.Lock())
+
+    async def get(self, client, model: str, system_instruction: str) -> str | None:
+        """Returns the cached content name for the instruction, or None to send it inline.
+
+        `client` is the async client (genai.Client().aio).
+        """
+        if not self.enabled or len(system_instruction) < self._min_chars:
+            return None
+
+        key = self._key(model, system_instruction)
+        entry = self._fresh_entry(key)
+        if entry:
+            return entry.name
+
+        async with self._key_lock(key):
+            entry = self._fresh_entry(key)
+            if entry:
+                return entry.name
+            if self._failed_until.get(key, 0) > self._clock():
+                return None
+            return await self._create_or_renew(client, key, system_instruction)
+
+    def _fresh_entry(self, key: tuple[str, str]) -> CachedInstruction | None:
+        entry = self._entries.get(key)
+        if entry and entry.expires_at - self._clock() > self._renew_margin:
+            self._stats["hits"] += 1
+            return entry
+        return None
+
+    async def _create_or_renew(self, client, key: tuple[str, str], system_instruction: str) -> str | None:
+        from google.genai import types
+
+        model, digest = key
+        entry = self._entries.get(key)
+        ttl = f"{self._ttl_seconds}s"
+
+        try:
+            if entry and entry.expires_at > self._clock():
+                await client.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(ttl=ttl))
+                name = entry.name
+                self._stats["renewed"] += 1
+            else:
+                cached_content = await client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"test-case-gen-{digest[:16]}",
+                        system_instruction=system_instruction,
+                        ttl=ttl
+                    )
+                )
+                name = cached_content.name
+                self._stats["created"] += 1
+        except Exception as e:
+            logger.warning("Context cache unavailable for %s, sending the instruction inline: %r", model, e)
+            self._entries.pop(key, None)
+            self._failed_until[key] = self._clock() + self._failure_backoff
+            self._stats["failed"] += 1
+            return None
+
+        self._entries[key] = CachedInstruction(name=name, expires_at=self._clock() + self._ttl_seconds)
+        return name
+
+    def invalidate(self, name: str):
+        """Forgets a cached content the service no longer accepts, e.g. after it expired remotely."""
+        for key, entry in list(self._entries.items()):
+            if entry.name == name:
+                del self._entries[key]
+                self._stats["invalidated"] += 1
+
+    def stats(self) -> dict:
+        return {**self._stats, "entries": len(self._entries)}
+
+instruction_cache = InstructionCache()
@@ -1,19 +1,151 @@
-import libsql
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def _libsql_connect(*args, **kwargs):
+    import libsql
+    return libsql.connect(*args, **kwargs)
+
+class ConnectionManager:
+    """Keeps libsql connections open across warm invocations of the function.
+
+    Connections are keyed by (database, auth_token, replica_path) and are
+    health-checked with a cheap query before being handed out again. With a
+    replica_path the connection is a libsql embedded replica: a local file
+    kept in sync with `database`, so reads run locally while writes are
+    forwarded to the primary. Local reads can be up to sync_interval stale,
+    so anything that must see other instances' writes is done as a write:
+    claiming issues (which also returns their generation inputs) and
+    checking which are held. What still reads locally are the stage
+    checkpoints, where a stale read only costs a regenerated stage.
+    """
+
+    def __init__(self, connect=None, health_check_interval: float = 30.0, sync_interval: float = 5.0):
+        self._connect = connect or _libsql_connect
+        self._health_check_interval = health_check_interval
+        self._sync_interval = sync_interval
+        self._connections: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "reconnected": 0, "synced": 0}
+
+    def _open(self, database: str, auth_token: str, replica_path: str | None):
+        if replica_path:
+            return self._connect(replica_path, sync_url=database, auth_token=auth_token)
+        return self._connect(database=database, auth_token=auth_token)
+
+    def _is_healthy(self, entry: dict) -> bool:
+        if time.monotonic() - entry["checked_at"] < self._health_check_interval:
+            return True
+        try:
+            entry["conn"].execute("SELECT 1").fetchone()
+        except Exception:
+            return False
+        entry["checked_at"] = time.monotonic()
+        return True
+
+    def _sync(self, entry: dict, force: bool = False):
+        if not force and time.monotonic() - entry["synced_at"] < self._sync_interval:
+            return
+        entry["conn"].sync()
+        entry["synced_at"] = time.monotonic()
+        self._stats["synced"] += 1
+
+    def acquire(self, database: str, auth_token: str, replica_path: str | None = None):
+        key = (database, auth_token, replica_path)
+
+        with self._lock:
+            entry = self._connections.get(key)
+            if entry and self._is_healthy(entry):
+                self._stats["reused"] += 1
+            else:
+                if entry:
+                    self._close(entry["conn"])
+                    self._stats["reconnected"] += 1
+                entry = {
+                    "conn": self._open(database, auth_token, replica_path),
+                    "checked_at": time.monotonic(),
+                    "synced_at": 0.0,
+                }
+                self._connections[key] = entry
+                self._stats["opened"] += 1
+
+            if replica_path:
+                self._sync(entry)
+            return entry["conn"]
+
+    def discard(self, database: str, auth_token: str, replica_path: str | None = None):
+        with self._lock:
+            entry = self._connections.pop((database, auth_token, replica_path), None)
+        if entry:
+            self._close(entry["conn"])
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._connections.values())
+            self._connections.clear()
+        for entry in entries:
+            self._close(entry["conn"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "open": len(self._connections)}
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+connections = ConnectionManager()
+
+# Every database call of the request path runs on this one thread: the calls block
+# (a Turso round trip, a replica sync), and on the event loop they would stall every
+# other generation in flight on the instance. The pooled connections are opened and
+# used only here, so a connection is never shared between threads.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+
+async def run_db(func, *args, **kwargs):
+    """Awaits func(*args, **kwargs) run on the database thread.
+
+    The call sees the caller's context variables (the current trace and span,
+    the request deadline). Cancelling the caller does not stop a call that has
+    already started; calls run one at a time, in submission order.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
 
 class Database:
 
-    def __init__(self, database, auth_token):
+    def __init__(self, database, auth_token, replica_path=None, manager: ConnectionManager = connections):
         self._database = database
         self.auth_token = auth_token
+        self._replica_path = replica_path
+        self._manager = manager
         self._conn = None
 
     def __enter__(self):
-        self._conn = libsql.connect(
-            database=self._database,
-            auth_token=self.auth_token
-        )
+        self._conn = self._manager.acquire(self._database, self.auth_token, self._replica_path)
         return self._conn
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self._conn:
-            self._conn.close()
+        if self._conn and exc_type is not None:
+            # Leave no transaction open on a connection that will be reused;
+            # if even that fails the connection is dropped from the pool.
+            try:
+                self._conn.rollback()
+            except Exception:
+                self._manager.discard(self._database, self.auth_token, self._replica_path)
+        self._conn = None
+
+    async def __aenter__(self):
+        """Acquires the connection on the database thread; use it only through run_db."""
+        return await run_db(self.__enter__)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await run_db(self.__exit__, exc_type, exc_val, exc_tb)
@@ -1,60 +1,131 @@
 from dataclasses import dataclass
 
+# Upper bound on ids bound into a single IN (...) list; older SQLite builds cap
+# host parameters at 999 per statement.
+MAX_IN_PARAMETERS = 500
+
+def with_placeholders(query: str, count: int) -> str:
+    """Expands the {placeholders} marker of an IN (...) query to `count` parameters."""
+    return query.format(placeholders=", ".join("?" * count))
+
+def chunked(values: list, size: int = MAX_IN_PARAMETERS):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
 @dataclass(frozen=True)
 class JiraQueries:
-    FETCH_ISSUE_DATA = """SELECT
-                        jpc.frameworks as compliance_frameworks,
-                        JSON_GROUP_ARRAY(
-                            JSON_OBJECT(
-                                'title', pcr.title,
-                                'description', pcr.description,
-                                'severity', pcr.severity
+    UPDATE_ISSUES_STATUS_WITH_REASON = """UPDATE scheduled_job_issue
+                              SET status = ?, reason = ?
+                              WHERE id IN ({placeholders});"""
+    
+    # Also reclaims issues whose claim is older than the lease (the `?` after the
+    # ids, a datetime modifier such as '-300 seconds'): the invocation holding it
+    # timed out or crashed, and the Pub/Sub redelivery resumes it.
+    CLAIM_ISSUE = """UPDATE scheduled_job_issue
+                     SET status = 'in_progress', updated_at = current_timestamp
+                     WHERE id IN ({placeholders})
+                     AND (status = 'pending' OR (status = 'in_progress' AND updated_at < datetime('now', ?)))
+                     RETURNING
+                        id,
+                        (
+                            SELECT jpc.frameworks
+                            FROM scheduled_job sj
+                            JOIN jira_project_compliance jpc ON sj.project_id = jpc.project_id
+                            WHERE sj.id = scheduled_job_issue.job_id
+                        ) as compliance_frameworks,
+                        (
+                            SELECT JSON_GROUP_ARRAY(
+                                JSON_OBJECT(
+                                    'title', pcr.title,
+                                    'description', pcr.description,
+                                    'severity', pcr.severity
+                                )
                             )
+                            FROM scheduled_job sj
+                            LEFT JOIN project_custom_rule pcr ON sj.project_id = pcr.project_id
+                            WHERE sj.id = scheduled_job_issue.job_id
                         ) as custom_rules,
-                        sji.summary,
-                        sji.description
-                    FROM scheduled_job_issue sji
-                    JOIN scheduled_job sj ON sji.job_id = sj.id
-                    LEFT JOIN jira_project_compliance jpc ON sj.project_id = jpc.project_id
-                    LEFT JOIN project_custom_rule pcr ON sj.project_id = pcr.project_id
-                    WHERE sji.id = ? AND sji.status = 'pending'
-                    GROUP BY sji.id;"""
-    
-    UPDATE_ISSUE_STATUS = """UPDATE scheduled_job_issue
-                     SET status = ?
-                     WHERE id = ?;"""
-    
-    UPDATE_ISSUE_STATUS_WITH_REASON = """UPDATE scheduled_job_issue
-                              SET status = ?, reason = ?
-                              WHERE id = ?;"""
+                        summary,
+                        description;"""
+    
+    # Issues another invocation still holds; a delivery of them is retried rather than acknowledged.
+    # A no-op write rather than a SELECT: on an embedded replica it runs on the primary
+    # like CLAIM_ISSUE, instead of reading a local copy that may predate another claim.
+    HELD_IN_PROGRESS = """UPDATE scheduled_job_issue
+                     SET status = status
+                     WHERE id IN ({placeholders}) AND status = 'in_progress'
+                     RETURNING id;"""
+    
+    # Test cases streamed by the attempt that lost its claim; same parameters as CLAIM_ISSUE.
+    DELETE_RECLAIMED_TEST_CASES = """DELETE FROM scheduled_job_issue_test_case
+                     WHERE issue_id IN (
+                        SELECT id FROM scheduled_job_issue
+                        WHERE id IN ({placeholders}) AND status = 'in_progress' AND updated_at < datetime('now', ?)
+                     );"""
     
     INSERT_ISSUE_TEST_CASES = """INSERT INTO scheduled_job_issue_test_case (id, issue_id, summary, description) VALUES (?, ?, ?, ?);"""
 
 @dataclass(frozen=True)
 class ManualUploadQueries:
-    FETCH_ISSUE_DATA = """SELECT
-                        spc.frameworks as compliance_frameworks,
-                        JSON_GROUP_ARRAY(
-                            JSON_OBJECT(
-                                'title', pcr.title,
-                                'description', pcr.description,
-                                'severity', pcr.severity
+    UPDATE_ISSUES_STATUS_WITH_REASON = """UPDATE standalone_scheduled_job_requirement
+                              SET status = ?, reason = ?
+                              WHERE id IN ({placeholders});"""
+    
+    # Also reclaims issues whose claim is older than the lease (the `?` after the
+    # ids, a datetime modifier such as '-300 seconds'): the invocation holding it
+    # timed out or crashed, and the Pub/Sub redelivery resumes it.
+    CLAIM_ISSUE = """UPDATE standalone_scheduled_job_requirement
+                     SET status = 'in_progress', updated_at = current_timestamp
+                     WHERE id IN ({placeholders})
+                     AND (status = 'pending' OR (status = 'in_progress' AND updated_at < datetime('now', ?)))
+                     RETURNING
+                        id,
+                        (
+                            SELECT spc.frameworks
+                            FROM standalone_scheduled_job ssj
+                            JOIN standalone_project_compliance spc ON ssj.project_id = spc.project_id
+                            WHERE ssj.id = standalone_scheduled_job_requirement.job_id
+                        ) as compliance_frameworks,
+                        (
+                            SELECT JSON_GROUP_ARRAY(
+                                JSON_OBJECT(
+                                    'title', pcr.title,
+                                    'description', pcr.description,
+                                    'severity', pcr.severity
+                                )
                             )
+                            FROM standalone_scheduled_job ssj
+                            LEFT JOIN project_custom_rule pcr ON ssj.project_id = pcr.project_id
+                            WHERE ssj.id = standalone_scheduled_job_requirement.job_id
                         ) as custom_rules,
-                        sjr.name,
-                        sjr.content
-                    FROM standalone_scheduled_job_requirement sjr
-                    JOIN standalone_scheduled_job ssj ON sjr.job_id = ssj.id
-                    LEFT JOIN standalone_project_compliance spc ON ssj.project_id = spc.project_id
-                    LEFT JOIN project_custom_rule pcr ON ssj.project_id = pcr.project_id
-                    WHERE sjr.id = ? AND sjr.status = 'pending';"""
-    
-    UPDATE_ISSUE_STATUS = """UPDATE standalone_scheduled_job_requirement
-                     SET status = ?
-                     WHERE id = ?;"""
-    
-    UPDATE_ISSUE_STATUS_WITH_REASON = """UPDATE standalone_scheduled_job_requirement
-                              SET status = ?, reason = ?
-                              WHERE id = ?;"""
+                        name,
+                        content;"""
+    
+    # Issues another invocation still holds; a delivery of them is retried rather than acknowledged.
+    # A no-op write rather than a SELECT: on an embedded replica it runs on the primary
+    # like CLAIM_ISSUE, instead of reading a local copy that may predate another claim.
+    HELD_IN_PROGRESS = """UPDATE standalone_scheduled_job_requirement
+                     SET status = status
+                     WHERE id IN ({placeholders}) AND status = 'in_progress'
+                     RETURNING id;"""
+    
+    # Test cases streamed by the attempt that lost its claim; same parameters as CLAIM_ISSUE.
+    DELETE_RECLAIMED_TEST_CASES = """DELETE FROM standalone_scheduled_job_requirement_test_case
+                     WHERE requirement_id IN (
+                        SELECT id FROM standalone_scheduled_job_requirement
+                        WHERE id IN ({placeholders}) AND status = 'in_progress' AND updated_at < datetime('now', ?)
+                     );"""
     
-    INSERT_ISSUE_TEST_CASES = """INSERT INTO standalone_scheduled_job_requirement_test_case (id, requirement_id, summary, description) VALUES (?, ?, ?, ?);"""
\ No newline at end of file
+    INSERT_ISSUE_TEST_CASES = """INSERT INTO standalone_scheduled_job_requirement_test_case (id, requirement_id, summary, description) VALUES (?, ?, ?, ?);"""
+
+@dataclass(frozen=True)
+class CheckpointQueries:
+    SELECT_CHECKPOINTS = """SELECT issue_id, stage, prompt_hash, value
+                     FROM issue_generation_checkpoint
+                     WHERE issue_id IN ({placeholders});"""
+
+    UPSERT_CHECKPOINT = """INSERT OR REPLACE INTO issue_generation_checkpoint (issue_id, stage, prompt_hash, value, created_at)
+                     VALUES (?, ?, ?, ?, ?);"""
+
+    DELETE_CHECKPOINTS = """DELETE FROM issue_generation_checkpoint
+                     WHERE issue_id IN ({placeholders});"""
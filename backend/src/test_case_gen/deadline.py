@@ -0,0 +1,95 @@
+"""Request deadline shared by every stage of an invocation.
+
+The function is killed at its timeout (240s in backend/infra/cloud_functions.tf),
+which leaves the issue in_progress. async_handler opens a deadline of
+REQUEST_TIMEOUT_SECONDS less DEADLINE_SAFETY_MARGIN_SECONDS; stages run within
+what is left of it and are cancelled when it passes, so the margin is always
+left to write the terminal status and any partial results. STAGE_TIMEOUT_SECONDS
+optionally caps single stages, e.g. '{"compliance": 120}'.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, TypeVar
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "240"))
+DEADLINE_SAFETY_MARGIN_SECONDS = float(os.getenv("DEADLINE_SAFETY_MARGIN_SECONDS", "20"))
+STAGE_TIMEOUT_SECONDS: dict[str, float] = json.loads(os.getenv("STAGE_TIMEOUT_SECONDS", "{}"))
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+clock = time.monotonic
+
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+_stats: dict = {"timeouts": {}, "cancelled": 0}
+
+class DeadlineExceeded(TimeoutError):
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} did not finish before the request deadline")
+        self.stage = stage
+
+@contextmanager
+def deadline(seconds: float):
+    """Bounds the enclosed work to `seconds` from now; a tighter enclosing deadline wins."""
+    at = clock() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> float | None:
+    """Seconds left before the current deadline, or None outside of one."""
+    at = _deadline.get()
+    return None if at is None else at - clock()
+
+def check(stage: str):
+    """Raises DeadlineExceeded if the current deadline has already passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        _count_timeout(stage)
+        raise DeadlineExceeded(stage)
+
+def record_cancelled():
+    _stats["cancelled"] += 1
+
+def _count_timeout(stage: str):
+    _stats["timeouts"][stage] = _stats["timeouts"].get(stage, 0) + 1
+
+async def run_stage(stage: str, awaitable: Awaitable[T], timeout: float = None) -> T:
+    """Awaits `awaitable` until the deadline or the stage's own timeout, whichever is sooner.
+
+    On expiry the awaitable is cancelled, along with everything it is awaiting,
+    and DeadlineExceeded is raised.
+    """
+    limits = [limit for limit in (remaining(), timeout or STAGE_TIMEOUT_SECONDS.get(stage)) if limit is not None]
+    if not limits:
+        return await awaitable
+
+    limit = min(limits)
+    if limit <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        _count_timeout(stage)
+        raise DeadlineExceeded(stage)
+
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except DeadlineExceeded:
+        raise
+    except TimeoutError:
+        _count_timeout(stage)
+        logger.warning("Stage %s timed out after %.1fs", stage, limit)
+        raise DeadlineExceeded(stage) from None
+
+def stats() -> dict:
+    return {"timeouts": dict(_stats["timeouts"]), "cancelled": _stats["cancelled"]}
@@ -0,0 +1,205 @@
+"""Decoding and validation of model responses, and encoding of stored descriptions.
+
+The JSON backend is chosen with JSON_CODEC: "orjson" or "msgspec" when they
+are installed, falling back to the standard library ("auto", the default,
+picks the fastest available). Test cases are validated against the shapes
+declared in schema.py; repairable items are normalized and the rest are
+dropped, so one malformed test case does not fail the whole issue.
+"""
+import json
+import logging
+import os
+from typing import Any, Callable, Literal, NamedTuple, TypedDict
+
+from .json_stream import IncrementalArrayParser
+from .tracing import current_span
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+
+logger = logging.getLogger(__name__)
+
+class Codec(NamedTuple):
+    name: str
+    loads: Callable[[str | bytes], Any]
+    # Returns str: descriptions are stored in TEXT columns the frontend JSON.parses.
+    dumps: Callable[[Any], str]
+
+def _json_codec() -> Codec:
+    return Codec("json", json.loads, lambda value: json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+
+def _orjson_codec() -> Codec:
+    import orjson
+    return Codec("orjson", orjson.loads, lambda value: orjson.dumps(value).decode("utf-8"))
+
+def _msgspec_codec() -> Codec:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def loads(text):
+        try:
+            return decoder.decode(text)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    return Codec("msgspec", loads, lambda value: encoder.encode(value).decode("utf-8"))
+
+CODECS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "json": _json_codec}
+
+def get_codec(name: str = JSON_CODEC) -> Codec:
+    if name != "auto":
+        return CODECS[name]()
+    for factory in CODECS.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _json_codec()
+
+codec = get_codec()
+
+def loads(text: str | bytes):
+    return codec.loads(text)
+
+def dumps(value) -> str:
+    return codec.dumps(value)
+
+#########################################################################################
+
+class FunctionalDescription(TypedDict):
+    type: Literal["functional"]
+    purpose: str
+    preconditions: str
+    testing_procedure: list[str]
+    expected_result: str
+    requirement_coverage: str
+
+class NonFunctionalDescription(TypedDict):
+    type: Literal["non_functional"]
+    test_category: str
+    preconditions: str
+    testing_procedure: list[str]
+    expected_result: str
+    acceptance_criteria: str
+
+class ComplianceDescription(TypedDict):
+    type: Literal["compliance"]
+    compliance_rule: str
+    preconditions: str
+    testing_procedure: list[str]
+    expected_result: str
+    compliance_impact: str
+
+class TestCase(TypedDict):
+    summary: str
+    description: FunctionalDescription | NonFunctionalDescription | ComplianceDescription
+
+DESCRIPTIONS: dict[str, type] = {
+    "functional": FunctionalDescription,
+    "non_functional": NonFunctionalDescription,
+    "compliance": ComplianceDescription,
+}
+
+FNF_TYPES = frozenset({"functional", "non_functional"})
+COMPLIANCE_TYPES = frozenset({"compliance"})
+
+# Fields without which a test case is not worth keeping; missing optional text becomes "".
+ESSENTIAL_FIELDS = frozenset({"purpose", "test_category", "compliance_rule", "testing_procedure", "expected_result"})
+
+def _text(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return str(value)
+
+def _steps(value) -> list[str] | None:
+    if isinstance(value, list):
+        steps = [str(step).strip() for step in value if str(step).strip()]
+    elif isinstance(value, str):
+        steps = [line.strip() for line in value.splitlines() if line.strip()]
+    else:
+        return None
+    return steps or None
+
+def validate_test_case(item, allowed_types: frozenset[str]) -> TestCase | None:
+    """Returns the test case normalized to its declared shape, or None if it cannot be repaired."""
+    if not isinstance(item, dict):
+        return None
+
+    summary = _text(item.get("summary"))
+    description = item.get("description")
+    if isinstance(description, str):
+        try:
+            description = loads(description)
+        except ValueError:
+            return None
+    if not summary or not isinstance(description, dict):
+        return None
+
+    kind = description.get("type")
+    if kind is None and len(allowed_types) == 1:
+        kind = next(iter(allowed_types))
+    if kind not in allowed_types:
+        return None
+
+    normalized = {"type": kind}
+    for field in DESCRIPTIONS[kind].__annotations__:
+        if field == "type":
+            continue
+        value = _steps(description.get(field)) if field == "testing_procedure" else _text(description.get(field))
+        if not value:
+            if field in ESSENTIAL_FIELDS:
+                return None
+            value = ""
+        normalized[field] = value
+
+    return {"summary": summary, "description": normalized}
+
+def validate_test_cases(items, allowed_types: frozenset[str]) -> list[TestCase]:
+    if not isinstance(items, list):
+        return []
+    test_cases = [test_case for test_case in (validate_test_case(item, allowed_types) for item in items) if test_case is not None]
+    if len(test_cases) != len(items):
+        logger.warning("Dropped %d malformed test case(s) of %d", len(items) - len(test_cases), len(items))
+        span = current_span()
+        if span is not None:
+            span.set(dropped_test_cases=span.attributes.get("dropped_test_cases", 0) + len(items) - len(test_cases))
+    return test_cases
+
+def decode_response(text: str, allowed_types: frozenset[str]) -> dict:
+    """Decodes a {"success", "issue", "data"} response and validates its test cases.
+
+    A response cut off mid-array (e.g. at the output token limit) keeps the
+    test cases that were complete.
+    """
+    try:
+        response = loads(text)
+    except ValueError:
+        items = IncrementalArrayParser("data").feed(text)
+        if not items:
+            raise
+        logger.warning("Response was truncated, keeping %d complete test case(s)", len(items))
+        response = {"success": True, "issue": "", "data": items}
+
+    if not isinstance(response, dict):
+        raise ValueError(f"Expected a JSON object, got {type(response).__name__}")
+
+    items = response.get("data")
+    test_cases = validate_test_cases(items, allowed_types)
+    if response.get("success") and items and not test_cases:
+        return {"success": False, "issue": "Every generated test case was malformed.", "data": []}
+
+    return {
+        "success": bool(response.get("success")),
+        "issue": _text(response.get("issue")) or "",
+        "data": test_cases,
+    }
+
+def decode_tags(text: str) -> list[str]:
+    response = loads(text)
+    tags = response.get("tags") if isinstance(response, dict) else None
+    return [tag for tag in tags if isinstance(tag, str)] if isinstance(tags, list) else []
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Coroutine
+
+
+class BackgroundLoop:
+    """A long-lived event loop running on a daemon thread.
+
+    The functions framework serves requests from worker threads; each one
+    submits its coroutine here instead of calling asyncio.run, so async
+    clients and their connection pools outlive a single request and several
+    pushes can be in flight on the same instance at once.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self._name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: list[Callable[[], Awaitable[Any]]] = []
+
+    def _ensure_running(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self._name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def on_shutdown(self, hook: Callable[[], Awaitable[Any]]):
+        """Registers a coroutine function to await on the loop before it stops."""
+        self._shutdown_hooks.append(hook)
+
+    def submit(self, coro: Coroutine):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_running())
+
+    def run(self, coro: Coroutine, timeout: float | None = None):
+        """Runs a coroutine on the loop and blocks the calling thread for its result."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout: float = 10):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is None or not thread.is_alive():
+            return
+
+        async def _shutdown():
+            for hook in self._shutdown_hooks:
+                try:
+                    await hook()
+                except Exception:
+                    pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
@@ -1,33 +1,81 @@
 from .google_gen_ai import GoogleGenAI
-import json
+import logging
+import time
+from typing import Awaitable, Callable
 
-from .schema import FNFTestCaseGenResponseSchema
+from .assets import assets, SYSTEM_INSTRUCTION
+from .decoding import FNF_TYPES, decode_response, validate_test_case
+from .json_stream import IncrementalArrayParser
+from .profiles import FNF, profiles
+from .response_cache import response_cache
+from .schema import FNFTestCaseGenResponseSchema, schema_fingerprint
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 
 class FNFTestCaseGeneration:
 
     def __init__(self, api_key: str, db_client=None):
         self.api_key = api_key
-        self.gen_ai = GoogleGenAI(self.api_key)
+        self.gen_ai = GoogleGenAI(self.api_key, profiles[FNF])
         self.db = db_client
 
 
-    def __get_functional_test_cases_instruction(self) -> str:
-
-        with open("./system_instruction.md", "r", encoding='utf-8') as f:
-            instruction = f.read()
-        return instruction
+    async def generate(self, prompt: str, on_test_case: Callable[[dict], Awaitable[None]] = None) -> list:
+        """Generates functional and non-functional test cases.
 
-    async def generate(self, prompt: str) -> list:
+        With `on_test_case`, the response is streamed and the callback is awaited
+        with each test case as soon as it is complete; the full response is still
+        returned at the end.
+        """
 
         messages = [("user", prompt)]
+        system_instruction = assets.text(SYSTEM_INSTRUCTION)
+        schema = FNFTestCaseGenResponseSchema.get_schema()
+
+        async def generate() -> dict:
+            response = await self.gen_ai.generate(
+                messages=messages,
+                system_instruction=system_instruction,
+                schema=schema
+            )
+            with tracer.span("json.parse", stage="fnf"):
+                return decode_response(response.text, FNF_TYPES)
+
+        async def generate_streaming() -> dict:
+            parser = IncrementalArrayParser("data")
+            started = time.perf_counter()
+            first_test_case_at = None
 
-        response = await self.gen_ai.generate(
-            messages=messages,
-            system_instruction=self.__get_functional_test_cases_instruction(),
-            schema=FNFTestCaseGenResponseSchema.get_schema()
-        )
+            async for chunk in self.gen_ai.generate_stream(
+                messages=messages,
+                system_instruction=system_instruction,
+                schema=schema
+            ):
+                for item in parser.feed(chunk):
+                    test_case = validate_test_case(item, FNF_TYPES)
+                    if test_case is None:
+                        continue
+                    if first_test_case_at is None:
+                        first_test_case_at = time.perf_counter()
+                        time_to_first_test_case_ms = (first_test_case_at - started) * 1000
+                        logger.info("time_to_first_test_case_ms=%.0f", time_to_first_test_case_ms)
+                        if span:
+                            span.set(time_to_first_test_case_ms=round(time_to_first_test_case_ms, 1))
+                    await on_test_case(test_case)
 
-        response = json.loads(response.text)
+            # Validation is deterministic, so the streamed test cases are exactly the head of `data`.
+            with tracer.span("json.parse", stage="fnf"):
+                return decode_response(parser.text, FNF_TYPES)
 
-        return response
+        with tracer.span("fnf.generate", streaming=on_test_case is not None) as span:
+            response = await response_cache.get_or_generate(
+                "fnf",
+                (self.gen_ai.profile, messages, system_instruction, schema_fingerprint(schema)),
+                generate_streaming if on_test_case else generate,
+                cache_if=lambda response: response.get("success")
+            )
+            if span:
+                span.set(success=response.get("success"), test_case_count=len(response.get("data", [])))
+            return response
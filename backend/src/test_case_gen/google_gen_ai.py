@@ -1,16 +1,191 @@
-from google import genai
-from google.genai import types
+from __future__ import annotations
+
+import asyncio
+import atexit
+import functools
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from . import deadline
+from .context_cache import instruction_cache
+from .profiles import GenerationProfile
+from .rate_limiter import genai_limiter
+from .tracing import current_span, record_usage, tracer
+
+# google.genai is imported on first use rather than with this module: it is most
+# of the function's import time, and requests that never reach the model (skipped
+# redeliveries, cache and checkpoint hits) do not need it. See warmup.py.
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# Status codes returned when a referenced cached content is missing, expired or inaccessible.
+CACHED_CONTENT_ERROR_CODES = (400, 403, 404)
+
+class ClientRegistry:
+    """Process-wide pool of google-genai clients keyed by API key and model.
+
+    Each client owns an HTTP connection pool, so sharing it keeps connections
+    (and their TLS sessions) alive across generations and requests. Async
+    transports are bound to the event loop that first used them; a client
+    created on a loop that has since gone away is replaced transparently.
+    """
+
+    def __init__(self, factory=None):
+        self._factory = factory or _genai_client
+        self._clients: dict[tuple[str, str], tuple[genai.Client, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "replaced": 0, "closed": 0}
+
+    def get(self, api_key: str, model: str):
+        loop = asyncio.get_running_loop()
+        key = (api_key, model)
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and entry[1] is loop:
+                self._stats["reused"] += 1
+                return entry[0].aio
+
+            if entry:
+                self._stats["replaced"] += 1
+                self._retire(*entry)
+
+            client = self._factory(api_key)
+            self._clients[key] = (client, loop)
+            self._stats["created"] += 1
+            return client.aio
+
+    @staticmethod
+    def _retire(client, loop: asyncio.AbstractEventLoop):
+        """Closes a replaced client.
+
+        Its async transport can only be closed on the loop it is bound to: when
+        that loop is still running (another thread's loop) the close is scheduled
+        there. A transport whose loop has stopped or closed cannot be closed
+        anymore and is discarded; its sockets are released when it is collected.
+        The sync transport is closed either way.
+        """
+        try:
+            if loop.is_closed() or not loop.is_running():
+                _close_sync(client)
+                return
+            future = asyncio.run_coroutine_threadsafe(_close_async(client), loop)
+        except RuntimeError:
+            # The loop closed between the check and the call.
+            _close_sync(client)
+            return
+        except Exception:
+            logger.exception("Closing a replaced google-genai client failed")
+            return
+        future.add_done_callback(lambda _: _close_sync(client))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "open": len(self._clients)}
+
+    async def aclose(self):
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for client, loop in entries:
+            try:
+                if loop is asyncio.get_running_loop():
+                    await _close_async(client)
+                _close_sync(client)
+            except Exception:
+                logger.exception("Closing a google-genai client failed")
+            self._stats["closed"] += 1
+
+    def close(self):
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for client, _ in entries:
+            try:
+                _close_sync(client)
+            except Exception:
+                logger.exception("Closing a google-genai client failed")
+            self._stats["closed"] += 1
+
+
+# google-genai only gained Client.close() and AsyncClient.aclose() after the pinned
+# 1.38.0; until then the HTTP transports are closed on the client's _api_client.
+def _close_sync(client):
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
+        return
+    httpx_client = getattr(getattr(client, "_api_client", None), "_httpx_client", None)
+    if httpx_client is not None:
+        httpx_client.close()
+
+async def _close_async(client):
+    aclose = getattr(client.aio, "aclose", None)
+    if aclose is not None:
+        await aclose()
+        return
+    api_client = getattr(client, "_api_client", None)
+    httpx_client = getattr(api_client, "_async_httpx_client", None)
+    if httpx_client is not None:
+        await httpx_client.aclose()
+    session = getattr(api_client, "_aiohttp_session", None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def _genai_client(api_key: str) -> genai.Client:
+    from google import genai
+    return genai.Client(vertexai=True, api_key=api_key)
+
+clients = ClientRegistry()
+atexit.register(clients.close)
+
+
+SAFETY_CATEGORIES = (
+    "HARM_CATEGORY_HATE_SPEECH",
+    "HARM_CATEGORY_DANGEROUS_CONTENT",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    "HARM_CATEGORY_HARASSMENT",
+)
+
+@functools.cache
+def base_config(profile: GenerationProfile) -> types.GenerateContentConfig:
+    """The validated config shared by every call with this profile; never mutate it."""
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        temperature=profile.temperature,
+        top_p=profile.top_p,
+        max_output_tokens=profile.max_output_tokens,
+        safety_settings=[types.SafetySetting(category=category, threshold="OFF") for category in SAFETY_CATEGORIES],
+        response_mime_type="application/json",
+        thinking_config=types.ThinkingConfig(thinking_budget=profile.thinking_budget)
+    )
+
+@functools.lru_cache(maxsize=64)
+def instruction_parts(system_instruction: str) -> list[types.Part]:
+    from google.genai import types
+    return [types.Part.from_text(text=system_instruction)]
+
 
 class GoogleGenAI:
 
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: str, profile: GenerationProfile = None):
         self.api_key = api_key
-        self.model = model
+        self.profile = profile or GenerationProfile("default")
+        self.model = self.profile.model
 
     def _client(self):
-        return genai.Client(vertexai=True, api_key=self.api_key).aio
+        return clients.get(self.api_key, self.model)
 
     def _build_contents(self, texts: list[tuple[str, str|types.Part]]) -> list[types.Content]:
+        from google.genai import types
         return [
             types.Content(
                 role=role,
@@ -18,44 +193,108 @@ class GoogleGenAI:
             ) for role, text in texts
         ]
 
+    def _build_config(self, system_instruction: str, schema: types.Schema=None, tools=None, cached_content: str=None) -> types.GenerateContentConfig:
+        from google.genai import types
+
+        # Shallow copy of the shared base config; the overridden fields are the only per-call state.
+        left = deadline.remaining()
+        return base_config(self.profile).model_copy(update={
+            "system_instruction": None if cached_content else instruction_parts(system_instruction),
+            "cached_content": cached_content,
+            "tools": tools if tools else None,
+            "response_schema": schema if schema else None,
+            # The HTTP request gives up at the request deadline too, in milliseconds.
+            "http_options": types.HttpOptions(timeout=max(1, int(left * 1000))) if left is not None else None,
+        })
+
+    async def _cached_instruction(self, client, system_instruction: str, tools) -> str | None:
+        # Cached contents cannot be combined with per-request tools.
+        if tools:
+            return None
+        return await instruction_cache.get(client, self.model, system_instruction)
+
+    def _should_retry_inline(self, cached_content: str | None, error: Exception) -> bool:
+        if not cached_content or getattr(error, "code", None) not in CACHED_CONTENT_ERROR_CODES:
+            return False
+        logger.warning("Cached content %s rejected, retrying with the inline instruction: %r", cached_content, error)
+        instruction_cache.invalidate(cached_content)
+        return True
+
     async def generate(self, messages: list[tuple[str, str]], system_instruction: str, schema: types.Schema=None, tools=None):
         client = self._client()
         contents = self._build_contents(messages)
-        safety_settings = [
-            types.SafetySetting(
-                category="HARM_CATEGORY_HATE_SPEECH",
-                threshold="OFF"
-            ),
-            types.SafetySetting(
-                category="HARM_CATEGORY_DANGEROUS_CONTENT",
-                threshold="OFF"
-            ),
-            types.SafetySetting(
-                category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                threshold="OFF"
-            ),
-            types.SafetySetting(
-                category="HARM_CATEGORY_HARASSMENT",
-                threshold="OFF"
-            )
-        ]
+        cached_content = await self._cached_instruction(client, system_instruction, tools)
 
-        content_config = types.GenerateContentConfig(
-            temperature=1,
-            top_p=1,
-            max_output_tokens=65535,
-            safety_settings=safety_settings,
-            response_mime_type="application/json",
-            system_instruction=[types.Part.from_text(text=system_instruction)],
-            thinking_config=types.ThinkingConfig(thinking_budget=-1)
-        )
-
-        content_config.tools = tools if tools else None
-        content_config.response_schema = schema if schema else None
-
-        response = await client.models.generate_content(
-            model=self.model,
-            contents=contents,
-            config=content_config
-        )
+        async def call():
+            nonlocal cached_content
+            deadline.check("genai.generate")
+            try:
+                return await client.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=self._build_config(system_instruction, schema, tools, cached_content)
+                )
+            except Exception as e:
+                if not self._should_retry_inline(cached_content, e):
+                    raise
+                cached_content = None
+                return await client.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=self._build_config(system_instruction, schema, tools)
+                )
+
+        with tracer.span("genai.generate", cached_instruction=cached_content is not None, **self.profile.attributes()) as span:
+            try:
+                response = await genai_limiter.call(call)
+            except asyncio.CancelledError:
+                deadline.record_cancelled()
+                if span:
+                    span.set(cancelled=True)
+                raise
+            record_usage(response.usage_metadata)
         return response
+
+    async def generate_stream(self, messages: list[tuple[str, str]], system_instruction: str, schema: types.Schema=None, tools=None):
+        """Yields the response text chunk by chunk as the model produces it.
+
+        Token usage and the profile are recorded on the caller's span, since the
+        generator may be resumed from different contexts.
+        """
+        client = self._client()
+        contents = self._build_contents(messages)
+        cached_content = await self._cached_instruction(client, system_instruction, tools)
+
+        span = current_span()
+        if span is not None:
+            span.set(cached_instruction=cached_content is not None, **self.profile.attributes())
+
+        async def open_stream():
+            nonlocal cached_content
+            deadline.check("genai.generate_stream")
+            try:
+                return await client.models.generate_content_stream(
+                    model=self.model,
+                    contents=contents,
+                    config=self._build_config(system_instruction, schema, tools, cached_content)
+                )
+            except Exception as e:
+                if not self._should_retry_inline(cached_content, e):
+                    raise
+                cached_content = None
+                return await client.models.generate_content_stream(
+                    model=self.model,
+                    contents=contents,
+                    config=self._build_config(system_instruction, schema, tools)
+                )
+
+        # Only opening the stream is rate limited and retried; a stream that fails midway is not replayed.
+        try:
+            stream = await genai_limiter.call(open_stream)
+            async for chunk in stream:
+                record_usage(chunk.usage_metadata)
+                if chunk.text:
+                    yield chunk.text
+        except asyncio.CancelledError:
+            deadline.record_cancelled()
+            raise
@@ -1,90 +1,253 @@
-import json
-
+import asyncio
+import functools
+import os
+import time
 from abc import ABC, abstractmethod
 from uuid import uuid4
 
-from .database_queries import JiraQueries, ManualUploadQueries
+from . import deadline
+from .database import run_db
+from .decoding import dumps
+from .database_queries import CheckpointQueries, JiraQueries, ManualUploadQueries, chunked, with_placeholders
+from .tracing import traced
+
+# An in_progress claim older than this is taken over by the next delivery. Keep it
+# above the function timeout so a live invocation never loses its issue.
+CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", "300"))
 
 class IssueRepository(ABC):
 
     @abstractmethod
-    def fetch_issue_data(self, issue_id: str) -> tuple[str, str, str]:
+    def claim_issue(self, issue_id: str) -> tuple[str, str, str, str] | None:
+        pass
+
+    @abstractmethod
+    def claim_issues(self, issue_ids: list[str]) -> list[tuple]:
         pass
 
     @abstractmethod
-    def update_issue_status(self, status: str, issue_id: str):
+    def in_progress_issues(self, issue_ids: list[str]) -> list[str]:
         pass
 
     @abstractmethod
-    def update_issue_status_with_reason(self, status: str, reason: str, issue_id: str):
+    def update_statuses_with_reason(self, updates: list[tuple[str, str, str | None]]):
         pass
 
     @abstractmethod
     def insert_issue_test_cases(self, issue_id: str, testcases: list):
         pass
 
-class JIRAIssueRepository(IssueRepository):
+    @abstractmethod
+    def complete_issue(self, issue_id: str, testcases: list, reason: str | None = None):
+        pass
+
+    @abstractmethod
+    def save_issue_results(self, results: list[tuple[str, str, str | None, list]]):
+        pass
 
-    def __init__(self, conn):
-        self._conn = conn
+    @abstractmethod
+    def load_checkpoints(self, issue_ids: list[str]) -> list[tuple[str, str, str, str]]:
+        pass
 
-    def fetch_issue_data(self, issue_id: str) -> tuple[str, str, str]:
-        return self._conn.execute(
-            JiraQueries.FETCH_ISSUE_DATA,
-            (issue_id,)
-        ).fetchone()
+    @abstractmethod
+    def save_checkpoint(self, issue_id: str, stage: str, prompt_hash: str, value: str):
+        pass
 
-    def update_issue_status(self, status: str, issue_id: str):
-        self._conn.execute(
-            JiraQueries.UPDATE_ISSUE_STATUS,
-            (status, issue_id)
-        )
-        self._conn.commit()
+class SQLIssueRepository(IssueRepository):
 
-    def update_issue_status_with_reason(self, status: str, reason: str, issue_id: str):
-        self._conn.execute(
-            JiraQueries.UPDATE_ISSUE_STATUS_WITH_REASON,
-            (status, reason, issue_id)
-        )
-        self._conn.commit()
+    queries = None
 
+    def __init__(self, conn, claim_lease_seconds: int = CLAIM_LEASE_SECONDS):
+        self._conn = conn
+        self._lease = f"-{claim_lease_seconds} seconds"
+
+    @traced("db.claim_issue")
+    def claim_issue(self, issue_id: str) -> tuple[str, str, str, str] | None:
+        """Atomically moves a pending issue to in_progress and returns its
+        (compliance_frameworks, custom_rules, summary, description) row.
+
+        Returns None when the issue is not pending, e.g. on a Pub/Sub redelivery
+        of an issue another invocation already claimed.
+        """
+        rows = self.claim_issues([issue_id])
+        return rows[0][1:] if rows else None
+
+    @traced("db.claim_issues")
+    def claim_issues(self, issue_ids: list[str]) -> list[tuple]:
+        """Claims every pending issue, and every in_progress issue whose claim
+        has outlived the lease; rows are (issue_id, compliance_frameworks, custom_rules, summary, description).
+
+        Test cases a reclaimed issue streamed before its invocation died are
+        deleted, so the resumed attempt writes a complete set once.
+        """
+        deadline.check("db.claim_issues")
+        rows = []
+        with self._conn:
+            for ids in chunked(issue_ids):
+                self._conn.execute(
+                    with_placeholders(self.queries.DELETE_RECLAIMED_TEST_CASES, len(ids)),
+                    (*ids, self._lease)
+                )
+                rows.extend(self._conn.execute(
+                    with_placeholders(self.queries.CLAIM_ISSUE, len(ids)),
+                    (*ids, self._lease)
+                ).fetchall())
+        return rows
+
+    @traced("db.in_progress_issues")
+    def in_progress_issues(self, issue_ids: list[str]) -> list[str]:
+        """Returns the ids that are in_progress, i.e. claimed by an invocation that may still be running.
+
+        Called with the ids claim_issues did not return, to tell a claim held
+        by someone else (redeliver later) from a final status (acknowledge).
+        Answered by the primary even on an embedded replica: a stale local
+        copy could still show another instance's fresh claim as pending, and
+        acknowledging it then would leave nothing to redeliver the issue.
+        """
+        ids_in_progress = []
+        with self._conn:
+            for ids in chunked(issue_ids):
+                ids_in_progress.extend(row[0] for row in self._conn.execute(
+                    with_placeholders(self.queries.HELD_IN_PROGRESS, len(ids)),
+                    tuple(ids)
+                ).fetchall())
+        return ids_in_progress
+
+    @traced("db.update_statuses_with_reason")
+    def update_statuses_with_reason(self, updates: list[tuple[str, str, str | None]]):
+        """Applies (issue_id, status, reason) updates in one transaction."""
+        with self._conn:
+            self._execute_status_updates(updates)
+
+    def _execute_status_updates(self, updates: list[tuple[str, str, str | None]]):
+        # One IN (...) statement per distinct (status, reason), so a batch where
+        # every issue completes costs a single statement regardless of its size.
+        groups: dict[tuple[str, str | None], list[str]] = {}
+        for issue_id, status, reason in updates:
+            groups.setdefault((status, reason), []).append(issue_id)
+
+        for (status, reason), issue_ids in groups.items():
+            for ids in chunked(issue_ids):
+                self._conn.execute(
+                    with_placeholders(self.queries.UPDATE_ISSUES_STATUS_WITH_REASON, len(ids)),
+                    (status, reason, *ids)
+                )
+
+    @traced("db.insert_issue_test_cases")
     def insert_issue_test_cases(self, issue_id: str, testcases: list):
-        _testcases = [(str(uuid4()), issue_id, tc['summary'], json.dumps(tc['description'])) for tc in testcases]
+        deadline.check("db.insert_issue_test_cases")
+        _testcases = [(str(uuid4()), issue_id, tc['summary'], dumps(tc['description'])) for tc in testcases]
         with self._conn:
             self._conn.executemany(
-                JiraQueries.INSERT_ISSUE_TEST_CASES,
+                self.queries.INSERT_ISSUE_TEST_CASES,
                 _testcases
             )
 
-class ManualUploadIssueRepository(IssueRepository):
-
-    def __init__(self, conn):
-        self._conn = conn
-
-    def fetch_issue_data(self, issue_id: str) -> tuple[str, str, str]:
-        return self._conn.execute(
-            ManualUploadQueries.FETCH_ISSUE_DATA,
-            (issue_id,)
-        ).fetchone()
-
-    def update_issue_status(self, status: str, issue_id: str):
+    @traced("db.complete_issue")
+    def complete_issue(self, issue_id: str, testcases: list, reason: str | None = None):
+        """Inserts the test cases and marks the issue completed in one transaction.
+
+        `reason` notes a partial result, e.g. functional test cases without compliance ones.
+        """
+        self.save_issue_results([(issue_id, "completed", reason, testcases)])
+
+    @traced("db.save_issue_results")
+    def save_issue_results(self, results: list[tuple[str, str, str | None, list]]):
+        """Writes the test cases and final status of many issues in one transaction.
+
+        `results` holds (issue_id, status, reason, testcases) tuples. Stage
+        checkpoints of the issues are dropped, as a final status ends their use;
+        issues put back to 'pending' keep them for the next attempt.
+
+        Unlike the reads and writes made while generating, this is not bounded
+        by the request deadline: it runs in the margin the deadline leaves.
+        """
+        _testcases = [
+            (str(uuid4()), issue_id, tc['summary'], dumps(tc['description']))
+            for issue_id, _, _, testcases in results
+            for tc in testcases
+        ]
+        with self._conn:
+            if _testcases:
+                self._conn.executemany(
+                    self.queries.INSERT_ISSUE_TEST_CASES,
+                    _testcases
+                )
+            self._execute_status_updates([(issue_id, status, reason) for issue_id, status, reason, _ in results])
+            for ids in chunked([issue_id for issue_id, status, _, _ in results if status != "pending"]):
+                self._conn.execute(
+                    with_placeholders(CheckpointQueries.DELETE_CHECKPOINTS, len(ids)),
+                    tuple(ids)
+                )
+
+    @traced("db.load_checkpoints")
+    def load_checkpoints(self, issue_ids: list[str]) -> list[tuple[str, str, str, str]]:
+        """Returns the (issue_id, stage, prompt_hash, value) checkpoints of the issues."""
+        deadline.check("db.load_checkpoints")
+        rows = []
+        for ids in chunked(issue_ids):
+            rows.extend(self._conn.execute(
+                with_placeholders(CheckpointQueries.SELECT_CHECKPOINTS, len(ids)),
+                tuple(ids)
+            ).fetchall())
+        return rows
+
+    @traced("db.save_checkpoint")
+    def save_checkpoint(self, issue_id: str, stage: str, prompt_hash: str, value: str):
+        deadline.check("db.save_checkpoint")
         self._conn.execute(
-            ManualUploadQueries.UPDATE_ISSUE_STATUS,
-            (status, issue_id)
+            CheckpointQueries.UPSERT_CHECKPOINT,
+            (issue_id, stage, prompt_hash, value, time.time())
         )
         self._conn.commit()
 
-    def update_issue_status_with_reason(self, status: str, reason: str, issue_id: str):
-        self._conn.execute(
-            ManualUploadQueries.UPDATE_ISSUE_STATUS_WITH_REASON,
-            (status, reason, issue_id)
-        )
-        self._conn.commit()
+class JIRAIssueRepository(SQLIssueRepository):
 
-    def insert_issue_test_cases(self, issue_id: str, testcases: list):
-        _testcases = [(str(uuid4()), issue_id, tc['summary'], json.dumps(tc['description'])) for tc in testcases]
-        with self._conn:
-            self._conn.executemany(
-                ManualUploadQueries.INSERT_ISSUE_TEST_CASES,
-                _testcases
-            )
\ No newline at end of file
+    queries = JiraQueries
+
+class ManualUploadIssueRepository(SQLIssueRepository):
+
+    queries = ManualUploadQueries
+
+
+class IncrementalTestCaseWriter:
+    """Persists streamed test cases in small batches as they arrive."""
+
+    def __init__(self, repo: IssueRepository, issue_id: str, batch_size: int = 5):
+        self._repo = repo
+        self._issue_id = issue_id
+        self._batch_size = batch_size
+        self._pending: list = []
+        self._flushing: asyncio.Future | None = None
+        self.written = 0
+
+    async def add(self, testcase: dict):
+        self._pending.append(testcase)
+        if len(self._pending) >= self._batch_size:
+            await self.flush()
+
+    async def take_pending(self) -> list:
+        """Returns the test cases not written yet, leaving them to the caller.
+
+        Waits for a write still in progress first, e.g. one whose stage was
+        cancelled, so its test cases are counted exactly once.
+        """
+        if self._flushing is not None:
+            await asyncio.wait([self._flushing])
+        pending, self._pending = self._pending, []
+        return pending
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._flushing = asyncio.ensure_future(run_db(self._repo.insert_issue_test_cases, self._issue_id, batch))
+        self._flushing.add_done_callback(functools.partial(self._flushed, batch))
+        # Shielded: the write outlives a cancelled stage, and take_pending waits for it.
+        await asyncio.shield(self._flushing)
+
+    def _flushed(self, batch: list, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self._pending[:0] = batch
+        else:
+            self.written += len(batch)
@@ -0,0 +1,75 @@
+import json
+
+
+class IncrementalArrayParser:
+    """Extracts the items of one top-level array from a JSON object streamed in chunks.
+
+    For a response shaped like {"success": ..., "data": [{...}, {...}]}, feed()
+    returns each element of "data" as soon as its closing brace arrives, long
+    before the rest of the document is complete.
+    """
+
+    def __init__(self, key: str = "data"):
+        self._key = key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._current_key = None
+        self._array_depth = None
+        self._item_start = None
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> list:
+        self._text += chunk
+        items = []
+        text = self._text
+
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1:pos]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if self._array_depth is None:
+                    if char == "[" and self._depth == 1 and self._current_key == self._key:
+                        self._array_depth = self._depth + 1
+                elif not self._done and char == "{" and self._depth == self._array_depth:
+                    self._item_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._array_depth is not None and not self._done:
+                    if char == "}" and self._depth == self._array_depth and self._item_start is not None:
+                        items.append(json.loads(text[self._item_start:pos + 1]))
+                        self._item_start = None
+                    elif char == "]" and self._depth == self._array_depth - 1:
+                        self._done = True
+
+        self._pos = len(text)
+        return items
+
+    def result(self):
+        """Parses the complete document once the stream has ended."""
+        return json.loads(self._text)
@@ -1,76 +1,279 @@
 """TestCaseGen: Cloud Run Function to Generate test cases."""
 import os
+import atexit
 import base64
 import json
 import traceback
 import asyncio
+import logging
 from typing import Any, Dict, Tuple
 
 from functions_framework import http
 from flask import Request
 
-from .database import Database
-from .issue_repository import IssueRepository, JIRAIssueRepository, ManualUploadIssueRepository
+from .checkpoints import COMPLIANCE, FNF, NO_CHECKPOINTS, StageCheckpoints, load_stage_checkpoints, prompt_hash
+from .checkpoints import stats as checkpoint_stats
+from .database import Database, connections, run_db
+from .deadline import DEADLINE_SAFETY_MARGIN_SECONDS, REQUEST_TIMEOUT_SECONDS, DeadlineExceeded, deadline, remaining, run_stage
+from .deadline import stats as deadline_stats
+from .issue_repository import IssueRepository, IncrementalTestCaseWriter, JIRAIssueRepository, ManualUploadIssueRepository
 from .compliance_gen_ai import ComplianceTestCaseGeneration
 from .functional_gen_ai import FNFTestCaseGeneration
+from .google_gen_ai import clients
+from .context_cache import instruction_cache
+from .rate_limiter import genai_limiter
+from .planner import plan_execution
+from .event_loop import BackgroundLoop
+from .tracing import tracer
+from .warmup import warm_up, warm_up_in_background
 
 TURSO_DATABASE_URL = os.getenv("TURSO_DATABASE_URL")
 TURSO_AUTH_TOKEN = os.getenv("TURSO_AUTH_TOKEN")
+# Optional local file for a libsql embedded replica of TURSO_DATABASE_URL. The claim and
+# the held check are writes, so they run on the primary; checkpoints are read locally.
+TURSO_REPLICA_PATH = os.getenv("TURSO_REPLICA_PATH")
 GOOGLE_CLOUD_API_KEY = os.getenv("GOOGLE_CLOUD_API_KEY")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Stream the functional generation and persist test cases as they complete (single-issue messages only).
+STREAM_GENERATION = os.getenv("STREAM_GENERATION", "false").lower() in ("1", "true")
+STREAM_WRITE_BATCH_SIZE = int(os.getenv("STREAM_WRITE_BATCH_SIZE", "5"))
+# A batch issue is only started with at least this much of the request deadline left;
+# later ones are put back to pending and the message is redelivered.
+BATCH_ISSUE_MIN_SECONDS = float(os.getenv("BATCH_ISSUE_MIN_SECONDS", "60"))
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+background_loop = BackgroundLoop(name="test-case-gen")
+background_loop.on_shutdown(clients.aclose)
+atexit.register(background_loop.stop)
+atexit.register(connections.close_all)
+# functions-framework imports this module in the gunicorn master and forks the worker
+# from it; threads do not survive the fork, so the warm-up starts in the child.
+os.register_at_fork(after_in_child=warm_up_in_background)
 
 @http
 def handler(request: Request) -> Tuple[Dict[str, Any], int]:
-    return asyncio.run(async_handler(request))
+    return background_loop.run(async_handler(request))
 
 async def async_handler(request: Request) -> Tuple[Dict[str, Any], int]:
     """HTTP Cloud Run Function to generate test cases."""
 
     data: Dict[str, Any] | None = request.get_json(silent=True)
+    if request.args.get("warmup") or (data or {}).get("warmup"):
+        return {"success": True, "warmup": await asyncio.to_thread(warm_up)}, 200
+    if not data or "message" not in data:
+        return {"success": False, "error": "Expected a Pub/Sub push message"}, 400
+
     pubsub_message = base64.b64decode(data["message"]["data"]).decode()
     message_data = json.loads(pubsub_message)
 
     issue_id: str = message_data.get("issueId")
+    issue_ids: list[str] | None = message_data.get("issueIds")
     source: str = message_data.get("source")
 
-    with Database(TURSO_DATABASE_URL, TURSO_AUTH_TOKEN) as conn:
+    # Generation stops DEADLINE_SAFETY_MARGIN_SECONDS before the function timeout, which
+    # leaves that margin for writing the final status and any partial results. Repository
+    # calls block, so they run on the database thread (run_db), never on the event loop.
+    with deadline(REQUEST_TIMEOUT_SECONDS - DEADLINE_SAFETY_MARGIN_SECONDS):
+        async with Database(TURSO_DATABASE_URL, TURSO_AUTH_TOKEN, TURSO_REPLICA_PATH) as conn:
+
+            if source == "jira":
+                repo: IssueRepository = JIRAIssueRepository(conn)
+            else:
+                repo: IssueRepository = ManualUploadIssueRepository(conn)
 
-        if source == "jira":
-            repo: IssueRepository = JIRAIssueRepository(conn)
-        else:
-            repo: IssueRepository = ManualUploadIssueRepository(conn)
+            if issue_ids:
+                with tracer.trace("batch", source=source, issue_count=len(issue_ids)) as trace:
+                    unfinished = await process_issue_batch(repo, issue_ids)
+                    if unfinished:
+                        trace.set(unfinished=unfinished)
+                log_stats()
+                if unfinished:
+                    return retry_later(unfinished)
+                return {"success": True}, 200
 
-        try:
-            compliance_list_string, custom_rules, summary, description = repo.fetch_issue_data(issue_id)
+            with tracer.trace("issue", issue_id=issue_id, source=source) as trace:
+                writer = None
+                try:
+                    issue_data = await run_db(repo.claim_issue, issue_id)
 
-            compliance_list = json.loads(compliance_list_string) if compliance_list_string else []
+                    if issue_data is None:
+                        if await run_db(repo.in_progress_issues, [issue_id]):
+                            # Claimed by an invocation that may still be running, or that died
+                            # without a final status; retried until that claim's lease expires.
+                            trace.set(status="held")
+                            return retry_later([issue_id])
+                        logger.info("Issue %s is already done, skipping", issue_id)
+                        trace.set(status="skipped")
+                        return {"success": True}, 200
 
-            repo.update_issue_status("in_progress", issue_id)
+                    compliance_list_string, custom_rules, summary, description = issue_data
+                    checkpoints = (await load_stage_checkpoints(repo, {issue_id: prompt_hash(*issue_data)}))[issue_id]
 
-            prompt = generate_markdown_format(summary, description)
+                    writer = IncrementalTestCaseWriter(repo, issue_id, STREAM_WRITE_BATCH_SIZE) if STREAM_GENERATION else None
 
-            # Run both test case generations concurrently
-            fnf_response, compliance_response = await asyncio.gather(
-                FNFTestCaseGeneration(GOOGLE_CLOUD_API_KEY).generate(prompt),
-                ComplianceTestCaseGeneration(GOOGLE_CLOUD_API_KEY).generate(prompt, project_compliance=compliance_list, project_custom_rules=custom_rules)
-            )
+                    success, reason, test_cases = await generate_test_cases(
+                        compliance_list_string, custom_rules, summary, description,
+                        on_fnf_test_case=writer.add if writer else None,
+                        checkpoints=checkpoints
+                    )
+                    if checkpoints.resumed:
+                        trace.set(resumed_stages=checkpoints.resumed)
 
-            if not fnf_response.get("success"):
-                reason = fnf_response.get("issue", "Unknown error")
-                repo.update_issue_status_with_reason("failed", reason, issue_id)
-                return {"success": True}, 200
+                    if not success:
+                        await finish_unsuccessful(repo, issue_id, writer, reason, trace)
+                        return {"success": True}, 200
 
-            test_cases = fnf_response.get("data", []) + compliance_response.get("data", [])
+                    # Streamed functional test cases lead the list; only the rest still needs writing.
+                    await run_db(repo.complete_issue, issue_id, test_cases[writer.written:] if writer else test_cases, reason)
+                    trace.set(status="completed", test_case_count=len(test_cases))
 
-            repo.insert_issue_test_cases(issue_id, test_cases)
-            repo.update_issue_status("completed", issue_id)
+                except DeadlineExceeded as e:
+                    await finish_unsuccessful(repo, issue_id, writer, str(e), trace)
 
-        except Exception as e:
-            traceback.print_exc()
-            repo.update_issue_status_with_reason("failed", str(e), issue_id)
+                except Exception as e:
+                    traceback.print_exc()
+                    await finish_unsuccessful(repo, issue_id, writer, str(e), trace)
 
+    log_stats()
     return {"success": True}, 200
 
 
+def log_stats():
+    """Logs the process-wide counters of the shared clients, caches and pools."""
+    logger.info("genai client registry: %s, context cache: %s, rate limiter: %s, db connections: %s, checkpoints: %s, deadlines: %s",
+                clients.stats(), instruction_cache.stats(), genai_limiter.stats(), connections.stats(), checkpoint_stats(), deadline_stats())
+
+
+async def finish_unsuccessful(repo: IssueRepository, issue_id: str, writer: IncrementalTestCaseWriter | None, reason: str, trace):
+    """Writes the final status of an issue whose generation did not succeed.
+
+    Functional test cases already streamed to the database are kept as a partial
+    result, with those not yet flushed written in the same transaction as the
+    status, so a failed issue never has test cases of its own. Without any, the
+    issue fails.
+    """
+    unflushed = await writer.take_pending() if writer else []
+    kept = (writer.written if writer else 0) + len(unflushed)
+    if kept:
+        reason = f"{reason}; kept the {kept} functional test cases generated before it"
+        await run_db(repo.complete_issue, issue_id, unflushed, reason)
+        trace.set(status="completed", reason=reason, test_case_count=kept)
+    else:
+        await run_db(repo.save_issue_results, [(issue_id, "failed", reason, [])])
+        trace.set(status="failed", reason=reason)
+
+def retry_later(issue_ids: list[str]) -> Tuple[Dict[str, Any], int]:
+    """A non-2xx response, so Pub/Sub redelivers the message with backoff instead of dropping it."""
+    logger.info("Issues %s are not finished, asking for redelivery", issue_ids)
+    return {"success": False, "error": "Issues are not finished, redeliver the message", "unfinished": issue_ids}, 409
+
+async def process_issue_batch(repo: IssueRepository, issue_ids: list[str]) -> list[str]:
+    """Processes a multi-issue message with one claim, bounded fan-out and one grouped write.
+
+    Issues with a final status are skipped. Returns the issues the message must
+    be redelivered for: those claimed by another invocation, until that claim
+    completes or outlives its lease (an expired claim is taken over and resumes
+    from its checkpoints), and those put back to pending because less than
+    BATCH_ISSUE_MIN_SECONDS of the deadline was left when their turn came.
+    """
+    rows = await run_db(repo.claim_issues, issue_ids)
+    claimed = {row[0] for row in rows}
+    unclaimed = [issue_id for issue_id in issue_ids if issue_id not in claimed]
+    held = await run_db(repo.in_progress_issues, unclaimed) if unclaimed else []
+    checkpoints = await load_stage_checkpoints(repo, {row[0]: prompt_hash(*row[1:]) for row in rows})
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def process(issue_id: str, compliance_list_string: str, custom_rules: str, summary: str, description: str):
+        async with semaphore:
+            with tracer.trace("issue", issue_id=issue_id, batch=True) as trace:
+                left = remaining()
+                if left is not None and left < BATCH_ISSUE_MIN_SECONDS:
+                    # Not started, so nothing is lost: the redelivery claims it again
+                    # and reuses whatever checkpoints an earlier attempt left.
+                    trace.set(status="pending", reason=f"only {left:.0f}s of the deadline left")
+                    return issue_id, "pending", None, []
+                try:
+                    success, reason, test_cases = await generate_test_cases(
+                        compliance_list_string, custom_rules, summary, description,
+                        checkpoints=checkpoints[issue_id]
+                    )
+                except Exception as e:
+                    traceback.print_exc()
+                    trace.set(status="failed", reason=str(e))
+                    return issue_id, "failed", str(e), []
+
+                if not success:
+                    trace.set(status="failed", reason=reason)
+                    return issue_id, "failed", reason, []
+                trace.set(status="completed", test_case_count=len(test_cases))
+                return issue_id, "completed", reason, test_cases
+
+    results = await asyncio.gather(*(process(*row) for row in rows))
+
+    try:
+        await run_db(repo.save_issue_results, results)
+    except Exception as e:
+        traceback.print_exc()
+        await run_db(repo.update_statuses_with_reason, [(issue_id, "failed", str(e)) for issue_id, status, _, _ in results if status != "pending"])
+
+    return held + [issue_id for issue_id, status, _, _ in results if status == "pending"]
+
+
+async def generate_test_cases(compliance_list_string: str | None, custom_rules: str, summary: str, description: str, on_fnf_test_case=None,
+                              checkpoints: StageCheckpoints = NO_CHECKPOINTS) -> tuple[bool, str | None, list]:
+    """Runs functional and compliance generation for one issue and returns (success, reason, test_cases).
+
+    Stages found in `checkpoints` are not generated again. When only the compliance
+    generation fails, the functional test cases are still returned, with the
+    failure as the reason.
+    """
+
+    plan = plan_execution(compliance_list_string, custom_rules)
+
+    prompt = generate_markdown_format(summary, description)
+
+    async def fnf() -> dict:
+        return await FNFTestCaseGeneration(GOOGLE_CLOUD_API_KEY).generate(prompt, on_test_case=on_fnf_test_case)
+
+    async def compliance() -> dict:
+        if not plan.run_compliance:
+            return {"success": False, "issue": "Project has no compliance frameworks or custom rules.", "data": []}
+        return await ComplianceTestCaseGeneration(GOOGLE_CLOUD_API_KEY).generate(
+            prompt,
+            project_compliance=list(plan.frameworks),
+            project_custom_rules=list(plan.custom_rules),
+            clause_sources=plan.clause_sources,
+            checkpoints=checkpoints
+        )
+
+    # Run both test case generations concurrently. Each stage is checkpointed as soon as it
+    # finishes, and cancelled at its own timeout or the request deadline.
+    fnf_task = asyncio.ensure_future(run_stage(FNF, checkpoints.run(FNF, fnf, keep_if=lambda response: response.get("success"))))
+    compliance_task = asyncio.ensure_future(run_stage(COMPLIANCE, checkpoints.run(COMPLIANCE, compliance, keep_if=lambda response: response.get("success"))))
+
+    try:
+        fnf_response = await fnf_task
+    except BaseException:
+        compliance_task.cancel()
+        raise
+
+    if not fnf_response.get("success"):
+        # The issue fails without functional test cases, so the compliance call is not worth finishing.
+        compliance_task.cancel()
+        return False, fnf_response.get("issue", "Unknown error"), []
+
+    try:
+        compliance_response = await compliance_task
+    except Exception as e:
+        logger.error("Compliance generation failed, keeping the functional test cases", exc_info=e)
+        return True, f"Compliance test cases could not be generated: {e}", fnf_response.get("data", [])
+
+    return True, None, fnf_response.get("data", []) + compliance_response.get("data", [])
+
+
 def generate_markdown_format(summary: str, description: str) -> str:
     template = """**Requirement Title**
 - {summary}
@@ -0,0 +1,38 @@
+import json
+from dataclasses import dataclass
+
+# Project framework names (COMPLIANCE_FRAMEWORKS in constants/shared-constants.ts)
+# mapped to the `source` of the clauses shipped in compliance_index.json.
+FRAMEWORK_SOURCES = {
+    "FDA": "FDA (21 CFR Part 11)",
+    "HIPPA": "HIPAA Privacy and Security Rules (45 CFR Part 164)",
+    "HIPAA": "HIPAA Privacy and Security Rules (45 CFR Part 164)",
+    "ISO 27001": "ISO/IEC 27001:2022",
+}
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    run_compliance: bool
+    frameworks: tuple[str, ...]
+    clause_sources: frozenset[str]
+    custom_rules: tuple[dict, ...]
+
+def normalize_custom_rules(custom_rules: str | list | None) -> list[dict]:
+    """Parses the JSON_GROUP_ARRAY custom rules column and drops the all-null
+    row the LEFT JOIN produces for projects without rules."""
+    if not custom_rules:
+        return []
+    rules = json.loads(custom_rules) if isinstance(custom_rules, str) else custom_rules
+    return [rule for rule in rules if rule and any(value is not None for value in rule.values())]
+
+def plan_execution(compliance_list_string: str | None, custom_rules: str | list | None) -> ExecutionPlan:
+    """Decides which generation stages an issue needs from its project configuration."""
+    frameworks = tuple(json.loads(compliance_list_string)) if compliance_list_string else ()
+    rules = tuple(normalize_custom_rules(custom_rules))
+
+    return ExecutionPlan(
+        run_compliance=bool(frameworks or rules),
+        frameworks=frameworks,
+        clause_sources=frozenset(FRAMEWORK_SOURCES[f] for f in frameworks if f in FRAMEWORK_SOURCES),
+        custom_rules=rules,
+    )
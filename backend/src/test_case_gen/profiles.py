@@ -0,0 +1,62 @@
+"""Generation settings for each model call in the pipeline.
+
+Every stage has its own profile so the cheap tag classification does not pay
+for the thinking and output budget of full test case generation. Defaults
+can be overridden per stage and per field with GENERATION_PROFILES, either
+inline JSON or the path to a JSON file:
+
+    GENERATION_PROFILES='{"tags": {"model": "gemini-2.5-flash-lite"}, "fnf": {"thinking_budget": 4096}}'
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, fields, replace
+
+GENERATION_PROFILES = os.getenv("GENERATION_PROFILES", "")
+
+TAGS = "tags"
+COMPLIANCE = "compliance"
+FNF = "fnf"
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    model: str = "gemini-2.5-flash"
+    temperature: float = 1
+    top_p: float = 1
+    max_output_tokens: int = 65535
+    # -1 lets the model decide; 0 disables thinking where the model allows it.
+    thinking_budget: int = -1
+
+    def attributes(self) -> dict:
+        return {f"profile.{key}": value for key, value in asdict(self).items()}
+
+DEFAULT_PROFILES = {
+    # A short list of tag names; thinking adds latency without improving it.
+    TAGS: GenerationProfile(TAGS, thinking_budget=0, max_output_tokens=2048),
+    COMPLIANCE: GenerationProfile(COMPLIANCE),
+    FNF: GenerationProfile(FNF),
+}
+
+def load_profiles(config: str = GENERATION_PROFILES) -> dict[str, GenerationProfile]:
+    """Returns the default profiles with the overrides from `config` applied."""
+    if not config.strip():
+        return dict(DEFAULT_PROFILES)
+
+    if config.lstrip().startswith("{"):
+        overrides = json.loads(config)
+    else:
+        with open(config, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+
+    allowed = {field.name for field in fields(GenerationProfile)} - {"name"}
+    profiles = dict(DEFAULT_PROFILES)
+    for stage, values in overrides.items():
+        if stage not in profiles:
+            raise ValueError(f"Unknown generation stage in GENERATION_PROFILES: {stage}")
+        unknown = set(values) - allowed
+        if unknown:
+            raise ValueError(f"Unknown settings for {stage} in GENERATION_PROFILES: {sorted(unknown)}")
+        profiles[stage] = replace(profiles[stage], **values)
+    return profiles
+
+profiles = load_profiles()
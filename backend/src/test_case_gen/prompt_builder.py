@@ -0,0 +1,114 @@
+"""Assembles the compliance generation messages within an input token ceiling.
+
+Clauses are written compactly, grouped under their source: id, title and
+summary always, full text only while the budget allows. Clauses are expected
+in relevance order. When even the short forms do not fit, the least relevant
+clauses are dropped. COMPLIANCE_PROMPT_FORMAT=json restores the previous
+json.dumps messages.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+COMPLIANCE_PROMPT_FORMAT = os.getenv("COMPLIANCE_PROMPT_FORMAT", "compact")
+COMPLIANCE_PROMPT_TOKEN_CEILING = int(os.getenv("COMPLIANCE_PROMPT_TOKEN_CEILING", "4000"))
+
+CLAUSES_HEADER = "The relevant compliance clauses are:"
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+@dataclass(frozen=True)
+class CompliancePrompt:
+    messages: list[tuple[str, str]]
+    estimated_tokens: int
+    clauses_included: int
+    clauses_with_text: int
+    clauses_dropped: int
+
+def _standards_message(project_compliance: list | None) -> str:
+    if not project_compliance:
+        return "No specific project compliance requirements provided."
+    return "Project compliance standards to consider: " + ", ".join(project_compliance)
+
+def _custom_rules_message(project_custom_rules: list | None) -> str:
+    if not project_custom_rules:
+        return "No specific project custom rules provided."
+    lines = []
+    for rule in project_custom_rules:
+        title = (rule.get("title") or "").strip()
+        description = (rule.get("description") or "").strip()
+        extra = "; ".join(f"{key}: {value}" for key, value in rule.items() if key not in ("title", "description") and value is not None)
+        lines.append("- " + ": ".join(part for part in (title, description, extra) if part))
+    return "Project custom rules to ensure:\n" + "\n".join(lines)
+
+def _clause_line(clause: dict) -> str:
+    title = (clause.get("title") or "").strip()
+    summary = (clause.get("summary") or "").strip()
+    return f"- {clause['clause_id']} {title}" + (f": {summary}" if summary else "")
+
+def _clause_text(clause: dict) -> str:
+    return f"\n  Text: {' '.join((clause.get('text') or '').split())}" if clause.get("text") else ""
+
+def _render_clauses(clauses: list[dict], with_text: set[int]) -> str:
+    if not clauses:
+        return CLAUSES_HEADER + " none."
+    groups: dict[str, list[str]] = {}
+    for index, clause in enumerate(clauses):
+        line = _clause_line(clause) + (_clause_text(clause) if index in with_text else "")
+        groups.setdefault(clause["source"], []).append(line)
+    return CLAUSES_HEADER + "".join(f"\n[{source}]\n" + "\n".join(lines) for source, lines in groups.items())
+
+def build_compliance_messages(prompt: str, clauses: list[dict], project_compliance: list | None, project_custom_rules: list | None,
+                              ceiling: int = None, prompt_format: str = None) -> CompliancePrompt:
+    ceiling = COMPLIANCE_PROMPT_TOKEN_CEILING if ceiling is None else ceiling
+    prompt_format = prompt_format or COMPLIANCE_PROMPT_FORMAT
+
+    if prompt_format == "json":
+        messages = [
+            ("user", prompt),
+            ("user", "The relevant compliance clauses are: " + json.dumps(clauses)),
+            ("user", "Project compliance standards to consider: " + json.dumps(project_compliance) if project_compliance else "No specific project compliance requirements provided."),
+            ("user", "Project custom rules to ensure: " + json.dumps(project_custom_rules) if project_custom_rules else "No specific project custom rules provided."),
+        ]
+        return CompliancePrompt(messages, sum(estimate_tokens(text) for _, text in messages), len(clauses), len(clauses), 0)
+
+    standards = _standards_message(project_compliance)
+    custom_rules = _custom_rules_message(project_custom_rules)
+    # The requirement, standards and custom rules are never cut; clauses share what is left.
+    remaining = ceiling - estimate_tokens(prompt) - estimate_tokens(standards) - estimate_tokens(custom_rules) - estimate_tokens(CLAUSES_HEADER) if ceiling else None
+
+    included = []
+    for clause in clauses:
+        # Each new source adds a header line to the rendered group.
+        cost = estimate_tokens(_clause_line(clause)) + (0 if any(c["source"] == clause["source"] for c in included) else estimate_tokens(clause["source"]) + 1)
+        if remaining is not None and included and cost > remaining:
+            break
+        included.append(clause)
+        if remaining is not None:
+            remaining -= cost
+
+    with_text = set()
+    for index, clause in enumerate(included):
+        if not clause.get("text"):
+            continue
+        cost = estimate_tokens(_clause_text(clause))
+        if remaining is None or cost <= remaining:
+            with_text.add(index)
+            if remaining is not None:
+                remaining -= cost
+
+    messages = [
+        ("user", prompt),
+        ("user", _render_clauses(included, with_text)),
+        ("user", standards),
+        ("user", custom_rules),
+    ]
+    return CompliancePrompt(
+        messages=messages,
+        estimated_tokens=sum(estimate_tokens(text) for _, text in messages),
+        clauses_included=len(included),
+        clauses_with_text=len(with_text),
+        clauses_dropped=len(clauses) - len(included),
+    )
@@ -0,0 +1,181 @@
+"""Client-side flow control for model calls.
+
+Every call takes a slot (at most GENAI_MAX_CONCURRENCY in flight per instance)
+and a token from a bucket refilled at an adaptive rate: each success raises the
+rate additively, each quota error cuts it by 30% (AIMD), so an instance backs off
+when Vertex starts throttling and recovers when it stops. Retryable errors are
+retried with full-jitter exponential backoff.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from . import deadline
+from .tracing import current_span
+
+GENAI_MAX_CONCURRENCY = int(os.getenv("GENAI_MAX_CONCURRENCY", "8"))
+GENAI_RATE_PER_SECOND = float(os.getenv("GENAI_RATE_PER_SECOND", "10"))
+GENAI_MAX_RATE_PER_SECOND = float(os.getenv("GENAI_MAX_RATE_PER_SECOND", "40"))
+GENAI_MAX_ATTEMPTS = int(os.getenv("GENAI_MAX_ATTEMPTS", "4"))
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+THROTTLE_STATUS_CODES = frozenset({429})
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def status_code(error: BaseException) -> int | None:
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+def is_retryable(error: BaseException) -> bool:
+    if status_code(error) in RETRYABLE_STATUS_CODES:
+        return True
+    # Transport failures from httpx (the google-genai HTTP client) carry no status code.
+    return any(cls.__module__.startswith("httpx") and cls.__name__ in ("TransportError", "TimeoutException") for cls in type(error).__mro__)
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = GENAI_MAX_ATTEMPTS
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class AdaptiveRateLimiter:
+
+    def __init__(self, max_concurrency: int = GENAI_MAX_CONCURRENCY, rate: float = GENAI_RATE_PER_SECOND,
+                 min_rate: float = 0.5, max_rate: float = GENAI_MAX_RATE_PER_SECOND, burst: float = None,
+                 additive_increase: float = 5.0, multiplicative_decrease: float = 0.7, decrease_cooldown: float = 1.0,
+                 retry_policy: RetryPolicy = RetryPolicy(), clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self._max_concurrency = max_concurrency
+        self._rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._burst = burst or max(1.0, rate)
+        self._additive_increase = additive_increase
+        self._multiplicative_decrease = multiplicative_decrease
+        self._decrease_cooldown = decrease_cooldown
+        self._retry_policy = retry_policy
+        self._clock = clock
+        self._sleep = sleep
+
+        self._tokens = self._burst
+        self._refilled_at = clock()
+        self._decreased_at = float("-inf")
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stats = {
+            "calls": 0, "in_flight": 0, "retries": 0, "throttled": 0, "gave_up": 0,
+            "queue_wait_ms_total": 0.0, "queue_wait_ms_max": 0.0,
+        }
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+    async def _take_token(self):
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await self._sleep((1 - self._tokens) / self._rate)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Waits for a concurrency slot and a rate token; records the queue wait."""
+        started = self._clock()
+        async with self._get_semaphore():
+            await self._take_token()
+            wait_ms = (self._clock() - started) * 1000
+            self._stats["queue_wait_ms_total"] += wait_ms
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], wait_ms)
+            self._stats["in_flight"] += 1
+
+            span = current_span()
+            if span is not None:
+                span.set(queue_wait_ms=round(span.attributes.get("queue_wait_ms", 0) + wait_ms, 1))
+            try:
+                yield
+            finally:
+                self._stats["in_flight"] -= 1
+
+    def on_success(self):
+        # Additive increase of about `additive_increase` per second of successful calls.
+        self._rate = min(self._max_rate, self._rate + self._additive_increase / self._rate)
+
+    def on_throttle(self):
+        now = self._clock()
+        self._stats["throttled"] += 1
+        # Concurrent calls tend to be throttled together; decrease once per cooldown.
+        if now - self._decreased_at >= self._decrease_cooldown:
+            self._rate = max(self._min_rate, self._rate * self._multiplicative_decrease)
+            self._tokens = min(self._tokens, 0.0)
+            self._decreased_at = now
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Runs fn() under the limiter, retrying retryable errors with backoff."""
+        attempt = 1
+        while True:
+            self._stats["calls"] += 1
+            try:
+                async with self.slot():
+                    result = await fn()
+            except Exception as e:
+                if status_code(e) in THROTTLE_STATUS_CODES:
+                    self.on_throttle()
+                if not is_retryable(e) or attempt >= self._retry_policy.max_attempts:
+                    if is_retryable(e):
+                        self._stats["gave_up"] += 1
+                    raise
+
+                delay = self._retry_policy.delay(attempt)
+                left = deadline.remaining()
+                if left is not None and left <= delay:
+                    # The retry could not finish before the request deadline.
+                    self._stats["gave_up"] += 1
+                    raise
+                self._stats["retries"] += 1
+                span = current_span()
+                if span is not None:
+                    span.set(retries=attempt)
+                logger.warning("Model call failed (attempt %d/%d), retrying in %.2fs: %r",
+                               attempt, self._retry_policy.max_attempts, delay, e)
+                attempt += 1
+                await self._sleep(delay)
+                continue
+
+            self.on_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queue_wait_ms_total": round(self._stats["queue_wait_ms_total"], 1),
+            "queue_wait_ms_max": round(self._stats["queue_wait_ms_max"], 1),
+            "rate": round(self._rate, 2),
+        }
+
+genai_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,209 @@
+"""Content-addressed cache for parsed model responses.
+
+Keys are SHA-256 hashes of everything that determines a response (model,
+prompt, system instruction, schema, project context), so an issue that is
+re-synced or rescheduled with unchanged text is answered without a model
+call. The backend is chosen with LLM_CACHE_BACKEND:
+
+    off       no caching
+    memory    in-process LRU (default), bounded by LLM_CACHE_MEMORY_MAX_BYTES
+    sqlite    local SQLite file at LLM_CACHE_PATH
+    database  llm_response_cache table in the Turso database
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from .database import connections, run_db
+from .tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+# A functional response can run to a few hundred KB of JSON and the function runs on
+# 256 MB instances, so the in-process cache is bounded by size as well as by count.
+LLM_CACHE_MEMORY_MAX_BYTES = int(os.getenv("LLM_CACHE_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/tmp/llm_response_cache.db")
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+class MemoryCacheBackend:
+    """LRU of serialized responses, evicted past max_entries or max_bytes of values.
+
+    Values are the JSON the cache stores, which is ASCII, so their length is
+    their size; one larger than max_bytes is not kept at all.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MEMORY_MAX_BYTES):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._remove(key)
+            if len(value) > self._max_bytes:
+                return
+            self._entries[key] = (time.time() + self._ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+class SQLCacheBackend:
+    """Cache table in any sqlite3-compatible connection.
+
+    With touch_on_read, hits refresh accessed_at so eviction is LRU; remote
+    databases leave it off to keep reads free of write round trips, which
+    makes eviction oldest-first instead. Reads and writes block, so the cache
+    runs them on the database thread.
+    """
+
+    blocking = True
+
+    CREATE_TABLE = """CREATE TABLE IF NOT EXISTS llm_response_cache (
+                        key TEXT PRIMARY KEY NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    );"""
+    SELECT = "SELECT value FROM llm_response_cache WHERE key = ? AND expires_at > ?;"
+    TOUCH = "UPDATE llm_response_cache SET accessed_at = ? WHERE key = ?;"
+    UPSERT = "INSERT OR REPLACE INTO llm_response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?);"
+    EVICT = """DELETE FROM llm_response_cache
+               WHERE expires_at <= ?
+               OR key NOT IN (SELECT key FROM llm_response_cache ORDER BY accessed_at DESC LIMIT ?);"""
+
+    def __init__(self, connect: Callable[[], Any], max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 touch_on_read: bool = True, create_table: bool = True, evict_every: int = 50):
+        self._connect = connect
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._touch_on_read = touch_on_read
+        self._evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        if create_table:
+            conn = self._connect()
+            conn.execute(self.CREATE_TABLE)
+            conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(self.SELECT, (key, now)).fetchone()
+            if row and self._touch_on_read:
+                conn.execute(self.TOUCH, (now, key))
+                conn.commit()
+            return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            with conn:
+                conn.execute(self.UPSERT, (key, value, now + self._ttl, now))
+                self._writes += 1
+                if self._writes % self._evict_every == 0:
+                    conn.execute(self.EVICT, (now, self._max_entries))
+
+class ResponseCache:
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _count(self, namespace: str, outcome: str):
+        counters = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "errors": 0})
+        counters[outcome] += 1
+
+    async def get_or_generate(self, namespace: str, key_parts: tuple, generate: Callable[[], Awaitable[Any]],
+                              cache_if: Callable[[Any], bool] = lambda value: True):
+        """Returns the cached JSON value for key_parts, or awaits generate() and stores its result."""
+        if self._backend is None:
+            return await generate()
+
+        key = cache_key(namespace, *key_parts)
+        try:
+            cached = await self._call(self._backend.get, key)
+        except Exception:
+            logger.exception("LLM cache read failed for %s", namespace)
+            self._count(namespace, "errors")
+            cached = None
+
+        span = current_span()
+        if span is not None:
+            span.set(cache="hit" if cached is not None else "miss")
+
+        if cached is not None:
+            self._count(namespace, "hits")
+            logger.info("LLM cache hit for %s (%s)", namespace, self._stats[namespace])
+            return json.loads(cached)
+
+        self._count(namespace, "misses")
+        logger.info("LLM cache miss for %s (%s)", namespace, self._stats[namespace])
+        value = await generate()
+
+        if cache_if(value):
+            try:
+                await self._call(self._backend.set, key, json.dumps(value))
+            except Exception:
+                logger.exception("LLM cache write failed for %s", namespace)
+                self._count(namespace, "errors")
+        return value
+
+    async def _call(self, method, *args):
+        if getattr(self._backend, "blocking", False):
+            return await run_db(method, *args)
+        return method(*args)
+
+    def stats(self) -> dict:
+        return {namespace: dict(counters) for namespace, counters in self._stats.items()}
+
+def create_backend(kind: str = LLM_CACHE_BACKEND):
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return MemoryCacheBackend()
+    if kind == "sqlite":
+        conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        return SQLCacheBackend(lambda: conn)
+    if kind == "database":
+        return SQLCacheBackend(
+            lambda: connections.acquire(os.getenv("TURSO_DATABASE_URL"), os.getenv("TURSO_AUTH_TOKEN")),
+            touch_on_read=False,
+            create_table=False
+        )
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {kind}")
+
+response_cache = ResponseCache(create_backend())
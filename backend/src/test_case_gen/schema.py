@@ -1,9 +1,20 @@
-from google.genai import types
+from __future__ import annotations
+
+import functools
+from typing import TYPE_CHECKING
+
+# google.genai.types is about half of the function's import time; it is imported
+# when a schema is first built (see warmup.py).
+if TYPE_CHECKING:
+    from google.genai import types
 
 class FNFTestCaseGenResponseSchema:
 
     @staticmethod
+    @functools.cache
     def get_schema() -> types.Schema:
+        from google.genai import types
+
         return types.Schema(
             type=types.Type.OBJECT,
             properties={
@@ -32,6 +43,8 @@ class FNFTestCaseGenResponseSchema:
 
     @staticmethod
     def __get_functional_test_case_schema() -> types.Schema:
+        from google.genai import types
+
         return types.Schema(
             type=types.Type.OBJECT,
             properties={
@@ -54,6 +67,8 @@ class FNFTestCaseGenResponseSchema:
 
     @staticmethod
     def __get_non_functional_test_case_schema() -> types.Schema:
+        from google.genai import types
+
         return types.Schema(
             type=types.Type.OBJECT,
             properties={
@@ -79,7 +94,10 @@ class FNFTestCaseGenResponseSchema:
 class ComplianceTestCaseResponseSchema:
 
     @staticmethod
+    @functools.cache
     def get_compliance_schema() -> types.Schema:
+        from google.genai import types
+
         return types.Schema(
             type=types.Type.OBJECT,
             properties={
@@ -119,7 +137,10 @@ class ComplianceTestCaseResponseSchema:
         )
 
     @staticmethod
+    @functools.cache
     def get_compliance_tags_schema() -> types.Schema:
+        from google.genai import types
+
         return types.Schema(
             type=types.Type.OBJECT,
             properties={
@@ -131,3 +152,17 @@ class ComplianceTestCaseResponseSchema:
             },
             required=["tags"]
         )
+
+
+#########################################################################################
+
+# Schemas are built once and shared by every call; callers must not mutate them.
+_fingerprints: dict[int, tuple[types.Schema, str]] = {}
+
+def schema_fingerprint(schema: types.Schema) -> str:
+    """Returns the schema serialized once, for use in cache keys."""
+    entry = _fingerprints.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        entry = (schema, schema.model_dump_json(exclude_none=True))
+        _fingerprints[id(schema)] = entry
+    return entry[1]
@@ -0,0 +1,165 @@
+"""Keyword index and clause vectors over the compliance clause corpus.
+
+Both are built offline by compliance_index_script.py and queried at request
+time, so the tokenizer here must stay identical on both sides.
+"""
+import math
+import re
+import zlib
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been by can could do does for from has have if in into is it its
+may must not of on or shall should such that the their them then there these this those
+to was were which while will with within without all any each other only be been being
+system systems ensure ensures user users data information we need make sure
+requirement title description
+""".split())
+
+SUFFIXES = ("ations", "ation", "ions", "ion", "ing", "ies", "ied", "ed", "es", "ly", "s")
+
+# Tag names carry more signal than clause prose, so their tokens are repeated.
+TAG_NAME_WEIGHT = 3
+
+def stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text: str) -> list[str]:
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+def clause_text(clause: dict) -> str:
+    return " ".join((clause.get("title", ""), clause.get("summary", ""), clause.get("text", "")))
+
+def build_tag_index(clauses: list[dict]) -> dict:
+    """Builds a TF-IDF inverted index from token to (tag, weight) postings.
+
+    Each tag is represented by its own name plus the title, summary and text
+    of every clause carrying it; tag vectors are L2-normalised so query
+    scores are cosine similarities.
+    """
+    documents: dict[str, Counter] = defaultdict(Counter)
+    for clause in clauses:
+        tokens = tokenize(clause_text(clause))
+        for tag in clause["tags"]:
+            documents[tag].update(tokens)
+            documents[tag].update(tokenize(tag.replace("-", " ")) * TAG_NAME_WEIGHT)
+
+    document_frequency = Counter(token for counts in documents.values() for token in counts)
+    idf = {token: math.log((len(documents) + 1) / (df + 1)) + 1 for token, df in document_frequency.items()}
+
+    postings: dict[str, list] = defaultdict(list)
+    for tag, counts in documents.items():
+        weights = {token: (1 + math.log(tf)) * idf[token] for token, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        for token, weight in weights.items():
+            postings[token].append([tag, round(weight / norm, 4)])
+
+    return {
+        "idf": {token: round(value, 4) for token, value in sorted(idf.items())},
+        "postings": dict(sorted(postings.items())),
+    }
+
+class TagMatcher:
+    """Ranks compliance tags for free text against a prebuilt tag index."""
+
+    def __init__(self, index: dict):
+        self._idf = index["idf"]
+        self._postings = index["postings"]
+
+    def rank(self, text: str) -> list[tuple[str, float]]:
+        counts = Counter(token for token in tokenize(text) if token in self._idf)
+        if not counts:
+            return []
+
+        query = {token: (1 + math.log(tf)) * self._idf[token] for token, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in query.values()))
+
+        scores: dict[str, float] = defaultdict(float)
+        for token, weight in query.items():
+            for tag, tag_weight in self._postings[token]:
+                scores[tag] += weight / norm * tag_weight
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def candidates(self, text: str, limit: int = 20) -> list[str]:
+        """The `limit` best ranked tags, most likely first."""
+        return [tag for tag, _ in self.rank(text)[:limit]]
+
+# Hashed feature space for clause vectors; collisions are rare at this corpus size.
+VECTOR_DIM = 2048
+
+def clause_key(clause: dict) -> str:
+    """The compliance_index.json key of a clause."""
+    return clause["source"] + " " + clause["clause_id"]
+
+def _bucket(token: str, dim: int) -> int:
+    return zlib.crc32(token.encode("utf-8")) % dim
+
+def build_clause_vectors(clauses: dict[str, dict], dim: int = VECTOR_DIM):
+    """Builds L2-normalised hashed TF-IDF vectors, one row per clause.
+
+    Returns (vectors, meta). A clause only fills a few dozen of the `dim`
+    buckets, so `vectors` holds the rows in CSR form: numpy arrays "indptr"
+    (row i is entries indptr[i]:indptr[i + 1]), "indices" (the buckets) and
+    "data" (the weights), as saved to the .npz. `meta` is a JSON-serialisable
+    dict with the row keys and bucket IDF weights. Needs numpy.
+    """
+    import numpy as np
+
+    keys = list(clauses)
+    counts = [Counter(_bucket(token, dim) for token in tokenize(clause_text(clauses[key]))) for key in keys]
+
+    document_frequency = np.zeros(dim, dtype=np.float32)
+    for bucket_counts in counts:
+        document_frequency[list(bucket_counts)] += 1
+    idf = np.log((len(keys) + 1) / (document_frequency + 1)) + 1
+
+    indptr, indices, data = [0], [], []
+    for bucket_counts in counts:
+        buckets = sorted(bucket_counts)
+        weights = np.array([(1 + math.log(bucket_counts[bucket])) * idf[bucket] for bucket in buckets], dtype=np.float32)
+        norm = np.linalg.norm(weights)
+        indices.extend(buckets)
+        data.extend((weights / norm if norm else weights).tolist())
+        indptr.append(len(indices))
+
+    vectors = {
+        "indptr": np.array(indptr, dtype=np.int32),
+        "indices": np.array(indices, dtype=np.uint16 if dim <= 1 << 16 else np.int32),
+        "data": np.array(data, dtype=np.float32),
+    }
+    meta = {"dim": dim, "keys": keys, "idf": [round(float(value), 4) for value in idf]}
+    return vectors, meta
+
+class ClauseRanker:
+    """Scores clauses against free text with the prebuilt clause vectors."""
+
+    def __init__(self, vectors: dict, meta: dict):
+        import numpy as np
+
+        self._np = np
+        self._indices = vectors["indices"]
+        self._data = vectors["data"]
+        # The row of every stored weight, for summing the products per clause.
+        self._entry_rows = np.repeat(np.arange(len(meta["keys"])), np.diff(vectors["indptr"]))
+        self._dim = meta["dim"]
+        self._idf = np.asarray(meta["idf"], dtype=np.float32)
+        self._rows = {key: row for row, key in enumerate(meta["keys"])}
+
+    def query_vector(self, text: str):
+        query = self._np.zeros(self._dim, dtype=self._np.float32)
+        for bucket, tf in Counter(_bucket(token, self._dim) for token in tokenize(text)).items():
+            query[bucket] = (1 + math.log(tf)) * self._idf[bucket]
+        norm = self._np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def scores(self, text: str, clauses: list[dict]) -> list[float]:
+        """Cosine similarity of each clause to the text; clauses without a vector score 0."""
+        products = self._data * self.query_vector(text)[self._indices]
+        similarities = self._np.bincount(self._entry_rows, weights=products, minlength=len(self._rows)).tolist()
+        return [similarities[row] if row is not None else 0.0 for row in (self._rows.get(clause_key(clause)) for clause in clauses)]
@@ -0,0 +1,300 @@
+"""Lightweight per-issue tracing for the generation pipeline.
+
+A trace covers one issue (or one batch message) and collects timed spans for
+repository calls, model calls and response parsing. When the trace ends it is
+handed to every configured exporter, chosen with TRACE_EXPORTERS (comma
+separated):
+
+    log     one structured JSON line per trace on stdout, aggregated by Cloud Logging (default)
+    otel    OpenTelemetry spans through the globally configured tracer provider
+    off     no tracing
+
+Spans opened outside a trace are not recorded, so instrumented code stays
+usable from scripts and benchmarks.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+TRACE_EXPORTERS = os.getenv("TRACE_EXPORTERS", "log")
+
+# Gemini usage_metadata fields copied onto model call spans.
+USAGE_FIELDS = (
+    "prompt_token_count",
+    "cached_content_token_count",
+    "thoughts_token_count",
+    "candidates_token_count",
+    "total_token_count",
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: str | None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start_time_ns: int = 0
+    end_time_ns: int = 0
+    duration_ms: float = 0.0
+    error: str | None = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+@dataclass
+class Trace:
+    name: str
+    trace_id: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+    spans: list[Span] = field(default_factory=list)
+    duration_ms: float = 0.0
+    error: str | None = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def stages(self) -> dict[str, dict[str, float]]:
+        """Total time and call count per span name."""
+        stages: dict[str, dict[str, float]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] = round(stage["total_ms"] + span.duration_ms, 1)
+        return stages
+
+    def tokens(self) -> dict[str, int]:
+        """Token usage summed over every model call in the trace."""
+        tokens: dict[str, int] = {}
+        for span in self.spans:
+            for name in USAGE_FIELDS:
+                if span.attributes.get(name):
+                    tokens[name] = tokens.get(name, 0) + span.attributes[name]
+        return tokens
+
+    def summary(self) -> dict:
+        return {
+            "message": f"trace {self.name}",
+            "trace": self.name,
+            "trace_id": self.trace_id,
+            **self.attributes,
+            "duration_ms": round(self.duration_ms, 1),
+            "error": self.error,
+            "stages": self.stages(),
+            "tokens": self.tokens(),
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "duration_ms": round(span.duration_ms, 1),
+                    **({"error": span.error} if span.error else {}),
+                    **span.attributes,
+                }
+                for span in self.spans
+            ],
+        }
+
+class InMemoryExporter:
+    """Keeps finished traces in a list; meant for tests and benchmarks."""
+
+    def __init__(self):
+        self.traces: list[Trace] = []
+
+    def export(self, trace: Trace):
+        self.traces.append(trace)
+
+    def spans(self, name: str = None) -> list[Span]:
+        return [span for trace in self.traces for span in trace.spans if name is None or span.name == name]
+
+    def clear(self):
+        self.traces.clear()
+
+class LogExporter:
+    """Writes each trace summary as one JSON line, which Cloud Logging parses into jsonPayload."""
+
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    def export(self, trace: Trace):
+        stream = self._stream or sys.stdout
+        stream.write(json.dumps({"severity": "ERROR" if trace.error else "INFO", **trace.summary()}, default=str) + "\n")
+        stream.flush()
+
+class OpenTelemetryExporter:
+    """Replays finished traces as OpenTelemetry spans.
+
+    Requires the opentelemetry-api package and uses whatever tracer provider
+    the deployment configured; without one, spans are dropped by the API's
+    no-op provider.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace as otel_trace
+            tracer = otel_trace.get_tracer("test_case_gen")
+        self._tracer = tracer
+
+    def export(self, trace: Trace):
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.trace import Status, StatusCode
+
+        start = min((span.start_time_ns for span in trace.spans), default=time.time_ns())
+        root = self._tracer.start_span(trace.name, start_time=start, attributes=_otel_attributes(trace.attributes))
+        otel_spans = {None: root}
+
+        # trace.spans is in finish order, so a child comes before its parent; replay
+        # them in start order instead. Reversed first so that a parent still comes
+        # before a child that started within the same nanosecond.
+        for span in sorted(reversed(trace.spans), key=lambda span: span.start_time_ns):
+            parent = otel_spans.get(span.parent_id, root)
+            otel_span = self._tracer.start_span(
+                span.name,
+                context=otel_trace.set_span_in_context(parent),
+                start_time=span.start_time_ns,
+                attributes=_otel_attributes(span.attributes)
+            )
+            if span.error:
+                otel_span.set_status(Status(StatusCode.ERROR, span.error))
+            otel_span.end(end_time=span.end_time_ns)
+            otel_spans[span.span_id] = otel_span
+
+        if trace.error:
+            root.set_status(Status(StatusCode.ERROR, trace.error))
+        root.end(end_time=start + int(trace.duration_ms * 1_000_000))
+
+def _otel_attributes(attributes: dict) -> dict:
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else json.dumps(value, default=str)
+        for key, value in attributes.items() if value is not None
+    }
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+
+    def __init__(self, exporters: list = None):
+        self.exporters = list(exporters or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Collects every span opened inside the block and exports them when it exits.
+
+        With no exporters the yielded trace only accepts attributes and records nothing.
+        """
+        trace = Trace(name=name, trace_id=uuid.uuid4().hex, attributes=attributes)
+        if not self.enabled:
+            yield trace
+            return
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        started = time.perf_counter()
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = repr(e)
+            raise
+        finally:
+            trace.duration_ms = (time.perf_counter() - started) * 1000
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self._export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Times the block as a child of the current span; yields None outside a trace."""
+        trace = _current_trace.get()
+        if trace is None:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+            start_time_ns=time.time_ns()
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            span.end_time_ns = span.start_time_ns + int(span.duration_ms * 1_000_000)
+            _current_span.reset(token)
+            trace.spans.append(span)
+
+    def _export(self, trace: Trace):
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception:
+                logger.exception("Trace export failed in %s", type(exporter).__name__)
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def record_usage(usage_metadata):
+    """Copies Gemini token counts onto the current span."""
+    span = _current_span.get()
+    if span is None or usage_metadata is None:
+        return
+    span.set(**{name: getattr(usage_metadata, name, None) for name in USAGE_FIELDS if getattr(usage_metadata, name, None) is not None})
+
+def traced(name: str):
+    """Decorator that runs a sync or async function inside a span."""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+def create_exporters(kinds: str = TRACE_EXPORTERS) -> list:
+    exporters = []
+    for kind in filter(None, (kind.strip() for kind in kinds.split(","))):
+        if kind == "off":
+            return []
+        if kind == "log":
+            exporters.append(LogExporter())
+        elif kind == "otel":
+            try:
+                exporters.append(OpenTelemetryExporter())
+            except ImportError:
+                logger.warning("TRACE_EXPORTERS includes otel but opentelemetry-api is not installed")
+        else:
+            raise ValueError(f"Unknown TRACE_EXPORTERS entry: {kind}")
+    return exporters
+
+tracer = Tracer(create_exporters())
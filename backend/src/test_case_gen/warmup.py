@@ -0,0 +1,100 @@
+"""Moves the first request's one-off costs off the request path.
+
+Importing the function is kept cheap (google.genai, libsql and numpy are
+imported on first use), so a new instance is ready to serve quickly. What the
+first generation would otherwise pay on top of its model calls - importing
+google.genai, validating the generation configs and response schemas, reading
+the instructions and compliance indexes, mapping the clause vectors - is done
+here instead: in the background right after the worker starts
+(WARM_UP=background, the default) and on an explicit warm-up request, which
+WARM_UP=request leaves as the only trigger.
+"""
+import logging
+import os
+import threading
+import time
+
+from .assets import (
+    assets, SYSTEM_INSTRUCTION, COMPLIANCE_TAGS_INSTRUCTION, COMPLIANCE_TEST_CASES_INSTRUCTION, COMPLIANCE_TAG_INDEX,
+)
+
+WARM_UP = os.getenv("WARM_UP", "background").lower()
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_timings: dict[str, float] | None = None
+
+def _import_genai():
+    from google import genai  # noqa: F401
+    from google.genai import types  # noqa: F401
+
+def _configs():
+    from .google_gen_ai import base_config, instruction_parts
+    from .profiles import profiles
+
+    for profile in profiles.values():
+        base_config(profile)
+    for name in (SYSTEM_INSTRUCTION, COMPLIANCE_TAGS_INSTRUCTION, COMPLIANCE_TEST_CASES_INSTRUCTION):
+        instruction_parts(assets.text(name))
+
+def _schemas():
+    from .schema import ComplianceTestCaseResponseSchema, FNFTestCaseGenResponseSchema, schema_fingerprint
+
+    for schema in (FNFTestCaseGenResponseSchema.get_schema(), ComplianceTestCaseResponseSchema.get_compliance_schema(),
+                   ComplianceTestCaseResponseSchema.get_compliance_tags_schema()):
+        schema_fingerprint(schema)
+
+def _compliance_index():
+    from .compliance_gen_ai import TAG_MATCHER_MODE, get_tag_matcher
+
+    assets.tag_clause_lookup()
+    # The keyword tag index is only read on the request path by the prefilter mode.
+    if TAG_MATCHER_MODE == "prefilter":
+        assets.json(COMPLIANCE_TAG_INDEX)
+        get_tag_matcher()
+
+def _clause_ranker():
+    from .compliance_gen_ai import get_clause_ranker
+
+    get_clause_ranker()
+
+STEPS = {
+    "import_genai": _import_genai,
+    "configs": _configs,
+    "schemas": _schemas,
+    "compliance_index": _compliance_index,
+    "clause_ranker": _clause_ranker,
+}
+
+def warm_up() -> dict[str, float]:
+    """Runs every step once per process and returns how long each took, in milliseconds.
+
+    Later calls return the first run's timings without doing anything. A failing
+    step is logged and skipped; the request that needs it will fail as it would
+    have without the warm-up.
+    """
+    global _timings
+    with _lock:
+        if _timings is not None:
+            return _timings
+
+        timings = {}
+        for name, step in STEPS.items():
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception("Warm-up step %s failed", name)
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        timings["total"] = round(sum(timings.values()), 1)
+        _timings = timings
+
+    logger.info("Warm-up finished: %s", timings)
+    return timings
+
+def warm_up_in_background():
+    """Starts warm_up() on a daemon thread when WARM_UP=background, unless it has already run."""
+    if WARM_UP != "background" or _timings is not None:
+        return
+    threading.Thread(target=warm_up, name="test-case-gen-warmup", daemon=True).start()
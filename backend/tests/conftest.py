@@ -0,0 +1,32 @@
+"""Shared setup for the backend tests.
+
+The functions import as top-level packages from backend/src, as they do when
+deployed. Settings read at import are pinned so the tests run offline: no
+trace output, no response cache and no background warm-up.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(BACKEND_DIR, "src"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+os.environ.setdefault("TRACE_EXPORTERS", "off")
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+os.environ.setdefault("WARM_UP", "request")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A local database with every migration applied; yields (path, connection)."""
+    import local_db
+    from test_case_gen.database import connections
+
+    path = str(tmp_path / "app.db")
+    conn = local_db.create_database(path)
+    yield path, conn
+    conn.close()
+    connections.close_all()
@@ -0,0 +1,58 @@
+"""Clause vectors and ranked clause selection."""
+import numpy as np
+import pytest
+
+from test_case_gen import compliance_gen_ai
+from test_case_gen.assets import COMPLIANCE_INDEX, assets
+from test_case_gen.compliance_gen_ai import get_clause_ranker, select_clauses
+from test_case_gen.text_index import ClauseRanker, build_clause_vectors, clause_key
+
+REQUIREMENT = "Ensure that all user passwords expire every 90 days and cannot be reused."
+
+
+def dense(vectors: dict, rows: int, dim: int) -> np.ndarray:
+    matrix = np.zeros((rows, dim), dtype=np.float32)
+    for row in range(rows):
+        entries = slice(vectors["indptr"][row], vectors["indptr"][row + 1])
+        matrix[row, vectors["indices"][entries]] = vectors["data"][entries]
+    return matrix
+
+
+def test_sparse_scores_match_the_dense_cosine():
+    clauses = assets.json(COMPLIANCE_INDEX)
+    vectors, meta = build_clause_vectors(clauses, dim=256)
+    ranker = ClauseRanker(vectors, meta)
+    matrix = dense(vectors, len(clauses), 256)
+
+    scores = ranker.scores(REQUIREMENT, list(clauses.values()) + [{"source": "Unknown", "clause_id": "1"}])
+
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0, atol=1e-5)
+    assert np.allclose(scores[:-1], matrix @ ranker.query_vector(REQUIREMENT), atol=1e-6)
+    assert scores[-1] == 0.0
+
+
+def test_the_shipped_vectors_cover_the_index():
+    ranker = get_clause_ranker()
+    clauses = list(assets.json(COMPLIANCE_INDEX).values())
+
+    assert ranker is not None
+    assert all(score >= 0 for score in ranker.scores(REQUIREMENT, clauses))
+    assert max(ranker.scores(REQUIREMENT, clauses)) > 0
+
+
+def test_clauses_are_not_capped_by_default():
+    clauses = assets.clauses_for_tags(["password-policy", "authentication", "access-control"])
+
+    assert compliance_gen_ai.COMPLIANCE_CLAUSE_TOP_K == 0
+    assert len(select_clauses(REQUIREMENT, clauses)) == len(clauses)
+
+
+@pytest.mark.parametrize("top_k", [1, 3])
+def test_top_k_keeps_the_best_ranked_clauses(top_k):
+    clauses = assets.clauses_for_tags(["password-policy", "authentication", "access-control"])
+    scores = dict(zip(map(clause_key, clauses), get_clause_ranker().scores(REQUIREMENT, clauses)))
+
+    selected = select_clauses(REQUIREMENT, clauses, top_k=top_k)
+
+    assert len(selected) == top_k
+    assert min(scores[clause_key(clause)] for clause in selected) == sorted(scores.values(), reverse=True)[top_k - 1]
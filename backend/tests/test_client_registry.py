@@ -0,0 +1,130 @@
+"""Pooled google-genai clients and how replaced ones are closed."""
+import asyncio
+import threading
+
+from test_case_gen.google_gen_ai import ClientRegistry
+
+API_KEY = "key"
+MODEL = "gemini-2.5-flash"
+
+
+class FakeAio:
+
+    def __init__(self, client):
+        self._client = client
+
+    async def aclose(self):
+        self._client.aclosed_on = asyncio.get_running_loop()
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.aio = FakeAio(self)
+        self.aclosed_on = None
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def registry():
+    created = []
+
+    def factory(api_key):
+        created.append(FakeClient())
+        return created[-1]
+
+    return ClientRegistry(factory), created
+
+
+async def get(clients):
+    return clients.get(API_KEY, MODEL)
+
+
+def test_reuses_the_client_on_the_same_loop():
+    clients, created = registry()
+
+    async def twice():
+        return clients.get(API_KEY, MODEL), clients.get(API_KEY, MODEL)
+
+    first, second = asyncio.run(twice())
+
+    assert first is second
+    assert len(created) == 1
+    assert clients.stats()["reused"] == 1
+
+
+def test_client_of_a_closed_loop_is_closed_and_replaced():
+    clients, created = registry()
+
+    asyncio.run(get(clients))
+    asyncio.run(get(clients))
+
+    assert len(created) == 2
+    assert created[0].closed.is_set()
+    assert created[0].aclosed_on is None
+    assert not created[1].closed.is_set()
+    assert clients.stats() == {"created": 2, "reused": 0, "replaced": 1, "closed": 0, "open": 1}
+
+
+def test_client_of_a_running_loop_is_closed_on_that_loop():
+    clients, created = registry()
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(get(clients), other).result(timeout=1)
+        asyncio.run(get(clients))
+
+        assert created[0].closed.wait(timeout=1)
+        assert created[0].aclosed_on is other
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(timeout=1)
+        other.close()
+
+
+def test_real_client_of_a_closed_loop_is_replaced():
+    # google-genai 1.38 has neither Client.close() nor AsyncClient.aclose().
+    clients = ClientRegistry()
+
+    first = asyncio.run(get(clients))
+    second = asyncio.run(get(clients))
+
+    assert second is not first
+    assert first._api_client._httpx_client.is_closed
+    assert clients.stats()["replaced"] == 1
+
+
+def test_real_client_of_a_running_loop_is_closed_on_that_loop():
+    clients = ClientRegistry()
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        first = asyncio.run_coroutine_threadsafe(get(clients), other).result(timeout=1)
+        asyncio.run(get(clients))
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), other).result(timeout=1)
+
+        assert first._api_client._async_httpx_client.is_closed
+        assert first._api_client._httpx_client.is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(timeout=1)
+        other.close()
+
+
+def test_closing_the_registry_closes_real_clients():
+    clients = ClientRegistry()
+
+    async def open_and_close():
+        aio = await get(clients)
+        await clients.aclose()
+        return aio
+
+    aio = asyncio.run(open_and_close())
+
+    assert aio._api_client._async_httpx_client.is_closed
+    assert aio._api_client._httpx_client.is_closed
+    assert clients.stats() == {"created": 1, "reused": 0, "replaced": 0, "closed": 1, "open": 0}
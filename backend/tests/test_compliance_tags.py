@@ -0,0 +1,74 @@
+"""Compliance tag classification, over the full tag list or the keyword candidates."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from test_case_gen import compliance_gen_ai, google_gen_ai, tracing
+from test_case_gen.compliance_gen_ai import ComplianceTestCaseGeneration, get_tag_matcher, tags_instruction
+from test_case_gen.tracing import InMemoryExporter
+
+REQUIREMENT = "Ensure that all user passwords expire every 90 days and cannot be reused."
+MODEL_TAGS = ["password-policy", "credential-management", "authentication"]
+FULL_LIST_TAG = "operational-security"
+
+
+class TagModels:
+
+    def __init__(self):
+        self.contents = []
+        self.instructions = []
+
+    async def generate_content(self, model, contents, config):
+        self.contents.append([content.parts[0].text for content in contents])
+        self.instructions.append(config.system_instruction[0].text)
+        return SimpleNamespace(text=json.dumps({"tags": MODEL_TAGS}), usage_metadata=None)
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = TagModels()
+    client = SimpleNamespace(aio=SimpleNamespace(models=models), close=lambda: None)
+    monkeypatch.setattr(google_gen_ai, "clients", google_gen_ai.ClientRegistry(lambda api_key: client))
+    return models
+
+
+def classify(mode: str) -> list[str]:
+    return asyncio.run(ComplianceTestCaseGeneration("key").classify_tags(REQUIREMENT, mode=mode))
+
+
+def test_llm_mode_sends_the_full_tag_list(models):
+    assert classify("llm") == MODEL_TAGS
+    assert models.contents == [[REQUIREMENT]]
+    [instruction] = models.instructions
+    assert instruction == tags_instruction()
+    assert f'"{FULL_LIST_TAG}"' in instruction
+
+
+def test_prefilter_sends_only_the_ranked_candidates(models, monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracing.tracer, "exporters", [exporter])
+    monkeypatch.setattr(compliance_gen_ai, "TAG_CANDIDATES", 5)
+    candidates = get_tag_matcher().candidates(REQUIREMENT, 5)
+
+    with tracing.tracer.trace("issue"):
+        tags = classify("prefilter")
+
+    # The model's tags outside the candidates are dropped.
+    assert tags == [tag for tag in MODEL_TAGS if tag in candidates] and "password-policy" in tags
+    assert models.contents == [[REQUIREMENT]]
+    [instruction] = models.instructions
+    assert json.dumps(candidates) in instruction
+    assert f'"{FULL_LIST_TAG}"' not in instruction
+    assert len(instruction) < len(tags_instruction())
+    [span] = exporter.spans("compliance.tags")
+    assert span.attributes["candidate_count"] == 5
+
+
+def test_candidates_are_ranked_tags_of_the_index():
+    candidates = get_tag_matcher().candidates(REQUIREMENT, 5)
+
+    assert len(candidates) == 5
+    assert "password-policy" in candidates
+    assert get_tag_matcher().candidates("", 5) == []
@@ -0,0 +1,129 @@
+"""Cached system instructions and their fallback to sending the instruction inline."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from test_case_gen import google_gen_ai
+from test_case_gen.context_cache import InstructionCache
+
+MODEL = "gemini-2.5-flash"
+INSTRUCTION = "You are a test case generator. " * 10
+
+
+class APIError(Exception):
+
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeCaches:
+    """The client.aio.caches of google-genai; fails with `error` when one is set."""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.created = []
+        self.updated = []
+
+    async def create(self, model, config):
+        if self.error:
+            raise self.error
+        self.created.append(config.system_instruction)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def update(self, name, config):
+        if self.error:
+            raise self.error
+        self.updated.append(name)
+
+
+class FakeModels:
+    """Rejects every cached content, as the service does once one has expired remotely."""
+
+    def __init__(self, code: int):
+        self.code = code
+        self.configs = []
+
+    async def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        if config.cached_content:
+            raise APIError(self.code)
+        return SimpleNamespace(text='{"tags": []}', usage_metadata=None)
+
+
+def cache_with(clock: Clock, **kwargs) -> InstructionCache:
+    return InstructionCache(**{"ttl_seconds": 3600, "min_chars": 100, "renew_margin": 300, "failure_backoff": 600, "clock": clock, **kwargs})
+
+
+def test_disabled_or_short_instructions_are_sent_inline():
+    caches = FakeCaches()
+
+    assert asyncio.run(cache_with(Clock(), ttl_seconds=0).get(SimpleNamespace(caches=caches), MODEL, INSTRUCTION)) is None
+    assert asyncio.run(cache_with(Clock()).get(SimpleNamespace(caches=caches), MODEL, "Too short")) is None
+    assert caches.created == []
+
+
+def test_an_instruction_is_created_once_and_renewed_before_it_expires():
+    clock = Clock()
+    caches = FakeCaches()
+    client = SimpleNamespace(caches=caches)
+    cache = cache_with(clock)
+
+    async def get():
+        return await cache.get(client, MODEL, INSTRUCTION)
+
+    assert asyncio.run(get()) == "cachedContents/1"
+    assert asyncio.run(get()) == "cachedContents/1"
+    clock.now += 3600 - 200
+    assert asyncio.run(get()) == "cachedContents/1"
+
+    assert caches.created == [INSTRUCTION]
+    assert caches.updated == ["cachedContents/1"]
+    assert cache.stats() == {"hits": 1, "created": 1, "renewed": 1, "failed": 0, "invalidated": 0, "entries": 1}
+
+
+def test_a_failed_creation_falls_back_inline_until_the_backoff_passes():
+    clock = Clock()
+    caches = FakeCaches(error=APIError(400))
+    client = SimpleNamespace(caches=caches)
+    cache = cache_with(clock)
+
+    async def get():
+        return await cache.get(client, MODEL, INSTRUCTION)
+
+    assert asyncio.run(get()) is None
+    caches.error = None
+    assert asyncio.run(get()) is None, "creation is not retried within the backoff"
+    clock.now += 600
+    assert asyncio.run(get()) == "cachedContents/1"
+    assert cache.stats()["failed"] == 1
+
+
+@pytest.mark.parametrize("code", google_gen_ai.CACHED_CONTENT_ERROR_CODES)
+def test_a_rejected_cached_content_is_retried_inline_and_forgotten(monkeypatch, code):
+    cache = cache_with(Clock())
+    models = FakeModels(code)
+    client = SimpleNamespace(aio=SimpleNamespace(caches=FakeCaches(), models=models), close=lambda: None)
+    monkeypatch.setattr(google_gen_ai, "instruction_cache", cache)
+    monkeypatch.setattr(google_gen_ai, "clients", google_gen_ai.ClientRegistry(lambda api_key: client))
+
+    async def generate():
+        return await google_gen_ai.GoogleGenAI("key").generate([("user", "Audit trail")], INSTRUCTION)
+
+    assert asyncio.run(generate()).text == '{"tags": []}'
+
+    cached, inline = models.configs
+    assert cached.cached_content == "cachedContents/1" and cached.system_instruction is None
+    assert inline.cached_content is None and inline.system_instruction[0].text == INSTRUCTION
+    assert cache.stats()["invalidated"] == 1
+    assert cache.stats()["entries"] == 0
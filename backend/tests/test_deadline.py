@@ -0,0 +1,138 @@
+"""Request deadline: stage cancellation, partial results and unstarted batch issues."""
+import asyncio
+import base64
+import json
+
+import pytest
+
+import local_db
+from simulate_deadline import SlowClient
+from test_case_gen import deadline, google_gen_ai, main
+
+FAST = {"fnf": 0.05, "tags": 0.02, "compliance": 0.05}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def genai_imported():
+    """google.genai is imported on first use; importing it here keeps that out of the deadlines."""
+    from test_case_gen.warmup import warm_up
+    warm_up()
+
+
+@pytest.fixture
+def model_latency(monkeypatch):
+    """Replaces the google-genai client with one answering after the given latency per call kind."""
+    def use(**latency):
+        monkeypatch.setattr(google_gen_ai, "clients", google_gen_ai.ClientRegistry(lambda api_key: SlowClient({**FAST, **latency})))
+    return use
+
+
+class PushRequest:
+    args = {}
+
+    def __init__(self, message: dict):
+        self._data = {"message": {"data": base64.b64encode(json.dumps(message).encode()).decode()}}
+
+    def get_json(self, silent=False):
+        return self._data
+
+
+def test_run_stage_cancels_the_stage_at_the_deadline():
+    cancelled = asyncio.Event()
+
+    async def stage():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def run():
+        with deadline.deadline(0.1):
+            await deadline.run_stage("slow", stage())
+
+    with pytest.raises(deadline.DeadlineExceeded) as e:
+        asyncio.run(run())
+
+    assert e.value.stage == "slow"
+    assert cancelled.is_set()
+
+
+def test_run_stage_honours_a_tighter_stage_timeout():
+    async def run():
+        with deadline.deadline(10):
+            await deadline.run_stage("slow", asyncio.sleep(10), timeout=0.05)
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(run())
+
+
+def test_run_stage_without_time_left_does_not_start_the_stage():
+    started = []
+
+    async def stage():
+        started.append(True)
+
+    async def run():
+        with deadline.deadline(0):
+            await deadline.run_stage("late", stage())
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(run())
+    assert not started
+
+
+def test_slow_compliance_keeps_the_functional_test_cases(model_latency):
+    model_latency(compliance=30)
+
+    async def run():
+        with deadline.deadline(0.5):
+            return await main.generate_test_cases('["HIPPA"]', "[]", "Audit trail", "Every change is logged.")
+
+    success, reason, test_cases = asyncio.run(run())
+
+    assert success
+    assert "compliance" in reason
+    assert [case["description"]["type"] for case in test_cases] == ["functional"]
+
+
+def test_slow_functional_generation_fails_the_issue(model_latency):
+    model_latency(fnf=30)
+
+    async def run():
+        with deadline.deadline(0.3):
+            return await main.generate_test_cases('["HIPPA"]', "[]", "Audit trail", "Every change is logged.")
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(run())
+
+
+def test_batch_issues_without_time_to_start_are_redelivered(database, model_latency, monkeypatch):
+    path, conn = database
+    issue_ids = local_db.seed_jira_issues(conn, 4)
+    model_latency(fnf=0.2, compliance=0.2)
+    monkeypatch.setattr(main, "TURSO_DATABASE_URL", path)
+    monkeypatch.setattr(main, "TURSO_AUTH_TOKEN", "")
+    monkeypatch.setattr(main, "REQUEST_TIMEOUT_SECONDS", 1.2)
+    monkeypatch.setattr(main, "DEADLINE_SAFETY_MARGIN_SECONDS", 0.2)
+    monkeypatch.setattr(main, "BATCH_CONCURRENCY", 1)
+    # Only the first issue starts with this much of the one second deadline left.
+    monkeypatch.setattr(main, "BATCH_ISSUE_MIN_SECONDS", 0.9)
+    request = PushRequest({"issueIds": issue_ids, "source": "jira"})
+
+    def statuses():
+        return dict(conn.execute("SELECT id, status FROM scheduled_job_issue").fetchall())
+
+    body, status = asyncio.run(main.async_handler(request))
+
+    assert status == 409
+    assert body["unfinished"] == issue_ids[1:]
+    assert statuses() == {issue_ids[0]: "completed", **{issue_id: "pending" for issue_id in issue_ids[1:]}}
+    assert conn.execute("SELECT count(*) FROM scheduled_job_issue_test_case WHERE issue_id = ?", (issue_ids[0],)).fetchone()[0] == 2
+
+    monkeypatch.setattr(main, "BATCH_ISSUE_MIN_SECONDS", 0)
+    monkeypatch.setattr(main, "REQUEST_TIMEOUT_SECONDS", 10)
+    body, status = asyncio.run(main.async_handler(request))
+
+    assert status == 200
+    assert set(statuses().values()) == {"completed"}
@@ -0,0 +1,133 @@
+"""Incremental parsing of streamed responses and validation of decoded test cases."""
+import json
+
+import pytest
+
+from test_case_gen.decoding import COMPLIANCE_TYPES, FNF_TYPES, decode_response, decode_tags, get_codec
+from test_case_gen.json_stream import IncrementalArrayParser
+
+FUNCTIONAL = {"summary": "Change is logged", "description": {
+    "type": "functional", "purpose": "Verify audit logging", "preconditions": "A record exists",
+    "testing_procedure": ["Open the record", "Save"], "expected_result": "An entry is written",
+    "requirement_coverage": "Audit trail"}}
+NON_FUNCTIONAL = {"summary": "Logging is fast", "description": {
+    "type": "non_functional", "test_category": "performance", "preconditions": "",
+    "testing_procedure": ["Save 1000 records"], "expected_result": "Under 1s", "acceptance_criteria": "p95 < 1s"}}
+RESPONSE = {"success": True, "issue": "", "data": [FUNCTIONAL, NON_FUNCTIONAL]}
+
+
+def chunks(text: str, size: int) -> list[str]:
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 10_000])
+def test_parser_yields_each_item_once_whatever_the_chunking(size):
+    text = json.dumps(RESPONSE)
+    parser = IncrementalArrayParser()
+
+    items = [item for chunk in chunks(text, size) for item in parser.feed(chunk)]
+
+    assert items == [FUNCTIONAL, NON_FUNCTIONAL]
+    assert parser.result() == RESPONSE
+
+
+def test_parser_yields_an_item_as_soon_as_it_closes():
+    text = json.dumps(RESPONSE)
+    first_end = text.index(json.dumps(FUNCTIONAL)) + len(json.dumps(FUNCTIONAL))
+    parser = IncrementalArrayParser()
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [FUNCTIONAL]
+
+
+def test_parser_ignores_brackets_in_strings_and_other_keys():
+    tricky = {"summary": "Braces } and ] in \"quotes\"", "description": {"type": "functional", "purpose": "{[x]}"}}
+    text = json.dumps({"issue": "[{\"data\": []}]", "meta": {"data": [{"a": 1}]}, "data": [tricky], "after": [{"b": 2}]})
+
+    parser = IncrementalArrayParser()
+
+    assert [item for chunk in chunks(text, 3) for item in parser.feed(chunk)] == [tricky]
+
+
+def test_parser_follows_the_configured_key():
+    text = json.dumps({"data": [{"a": 1}], "tags": [{"b": 2}]})
+
+    assert IncrementalArrayParser("tags").feed(text) == [{"b": 2}]
+
+
+def test_decode_keeps_the_complete_items_of_a_truncated_response():
+    text = json.dumps(RESPONSE)
+    truncated = text[:text.index("Save 1000")]
+
+    assert decode_response(truncated, FNF_TYPES) == {"success": True, "issue": "", "data": [FUNCTIONAL]}
+
+
+def test_decode_raises_when_nothing_complete_was_received():
+    with pytest.raises(ValueError):
+        decode_response('{"success": true, "data": [{"summary": "cut', FNF_TYPES)
+
+
+def test_decode_repairs_what_it_can():
+    repaired = {"summary": "  Change is logged ", "description": json.dumps({
+        "type": "functional", "purpose": "Verify audit logging", "testing_procedure": "Open the record\n\nSave",
+        "expected_result": ["An entry", "is written"]})}
+
+    [test_case] = decode_response(json.dumps({"success": True, "data": [repaired]}), FNF_TYPES)["data"]
+
+    assert test_case == {"summary": "Change is logged", "description": {
+        "type": "functional", "purpose": "Verify audit logging", "preconditions": "",
+        "testing_procedure": ["Open the record", "Save"], "expected_result": "An entry\nis written",
+        "requirement_coverage": ""}}
+
+
+def test_decode_infers_the_only_allowed_type():
+    compliance = {"summary": "Trail retained", "description": {
+        "compliance_rule": "HIPAA 164.312(b)", "testing_procedure": ["Check"], "expected_result": "Retained"}}
+
+    [test_case] = decode_response(json.dumps({"success": True, "data": [compliance]}), COMPLIANCE_TYPES)["data"]
+
+    assert test_case["description"]["type"] == "compliance"
+
+
+@pytest.mark.parametrize("malformed", [
+    "not an object",
+    {"summary": "", "description": FUNCTIONAL["description"]},
+    {"summary": "No description"},
+    {"summary": "Wrong type", "description": {**FUNCTIONAL["description"], "type": "compliance"}},
+    {"summary": "No steps", "description": {**FUNCTIONAL["description"], "testing_procedure": []}},
+    {"summary": "Bad description", "description": "{not json"},
+])
+def test_decode_drops_what_it_cannot_repair(malformed):
+    response = decode_response(json.dumps({"success": True, "data": [malformed, FUNCTIONAL]}), FNF_TYPES)
+
+    assert response["data"] == [FUNCTIONAL]
+
+
+def test_a_response_with_only_malformed_items_fails():
+    response = decode_response(json.dumps({"success": True, "data": [{"summary": "No description"}]}), FNF_TYPES)
+
+    assert response == {"success": False, "issue": "Every generated test case was malformed.", "data": []}
+
+
+def test_decode_rejects_a_non_object():
+    with pytest.raises(ValueError):
+        decode_response("[]", FNF_TYPES)
+
+
+def test_decode_tags_keeps_only_strings():
+    assert decode_tags('{"tags": ["audit-logging", 3, null, "encryption"]}') == ["audit-logging", "encryption"]
+    assert decode_tags('{"tags": "audit-logging"}') == []
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_codecs_agree(name):
+    try:
+        codec = get_codec(name)
+    except ImportError:
+        pytest.skip(f"{name} is not installed")
+
+    text = codec.dumps(RESPONSE)
+    assert isinstance(text, str)
+    assert codec.loads(text) == RESPONSE
+    with pytest.raises(ValueError):
+        codec.loads("{not json")
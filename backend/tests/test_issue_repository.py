@@ -0,0 +1,283 @@
+"""Issue repositories and pooled connections against a local migrated database."""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import local_db
+from test_case_gen import deadline
+from test_case_gen.database import ConnectionManager, Database, run_db
+from test_case_gen.issue_repository import IncrementalTestCaseWriter, JIRAIssueRepository, ManualUploadIssueRepository
+
+FNF_CASE = {"summary": "Change is logged", "description": {"type": "functional", "purpose": "Audit"}}
+COMPLIANCE_CASE = {"summary": "Trail retained", "description": {"type": "compliance", "compliance_rule": "HIPAA"}}
+
+
+def statuses(conn, table="scheduled_job_issue") -> dict[str, tuple]:
+    return {row[0]: tuple(row[1:]) for row in conn.execute(f"SELECT id, status, reason FROM {table}").fetchall()}
+
+
+def saved_test_cases(conn, issue_id: str) -> list[str]:
+    return sorted(row[0] for row in conn.execute(
+        "SELECT summary FROM scheduled_job_issue_test_case WHERE issue_id = ?", (issue_id,)).fetchall())
+
+
+def expire_claim(conn, issue_id: str):
+    conn.execute("UPDATE scheduled_job_issue SET updated_at = datetime('now', '-1 hour') WHERE id = ?", (issue_id,))
+    conn.commit()
+
+
+def save_checkpoint(repo, issue_id: str):
+    repo.save_checkpoint(issue_id, "fnf", "hash", json.dumps({"success": True}))
+
+
+class StaleReplica:
+    """An embedded replica that has not synced yet: reads see `replica`, writes go to `primary`."""
+
+    def __init__(self, primary, replica):
+        self._primary = primary
+        self._replica = replica
+
+    def execute(self, sql, parameters=()):
+        conn = self._replica if sql.lstrip().upper().startswith("SELECT") else self._primary
+        return conn.execute(sql, parameters)
+
+    def commit(self):
+        self._primary.commit()
+
+    def rollback(self):
+        self._primary.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+def test_claim_returns_the_generation_inputs_once(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+
+    frameworks, custom_rules, summary, description = repo.claim_issue(issue_id)
+
+    assert json.loads(frameworks) == ["HIPPA"]
+    assert [rule["title"] for rule in json.loads(custom_rules)] == ["Session timeout"]
+    assert (summary, description) == ("Audit trail 0", local_db.DESCRIPTION)
+    assert statuses(conn)[issue_id] == ("in_progress", None)
+    # A redelivery within the lease gets nothing, and sees the claim as held.
+    assert repo.claim_issue(issue_id) is None
+    assert repo.in_progress_issues([issue_id]) == [issue_id]
+
+
+def test_claim_issues_skips_issues_with_a_final_status(database):
+    _, conn = database
+    pending = local_db.seed_jira_issues(conn, 3)
+    done = local_db.seed_jira_issues(conn, 2, status="completed", prefix="done")
+    repo = JIRAIssueRepository(conn)
+
+    rows = repo.claim_issues(pending + done)
+
+    assert sorted(row[0] for row in rows) == pending
+    assert repo.in_progress_issues(done) == []
+
+
+def test_a_claim_not_yet_synced_to_the_replica_is_seen_as_held(database, tmp_path):
+    _, primary = database
+    replica = local_db.create_database(str(tmp_path / "replica.db"))
+    [issue_id] = local_db.seed_jira_issues(primary, 1)
+    local_db.seed_jira_issues(replica, 1)
+    JIRAIssueRepository(primary).claim_issue(issue_id)
+    repo = JIRAIssueRepository(StaleReplica(primary, replica))
+
+    assert repo.claim_issue(issue_id) is None
+    assert repo.in_progress_issues([issue_id]) == [issue_id]
+    replica.close()
+
+
+def test_an_expired_claim_is_reclaimed_without_its_streamed_test_cases(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+    repo.claim_issue(issue_id)
+    repo.insert_issue_test_cases(issue_id, [FNF_CASE])
+
+    assert repo.claim_issue(issue_id) is None
+    expire_claim(conn, issue_id)
+
+    assert repo.claim_issue(issue_id) is not None
+    assert saved_test_cases(conn, issue_id) == []
+
+
+def test_a_live_claim_keeps_its_streamed_test_cases(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+    repo.claim_issue(issue_id)
+    repo.insert_issue_test_cases(issue_id, [FNF_CASE])
+
+    assert repo.claim_issues([issue_id]) == []
+    assert saved_test_cases(conn, issue_id) == ["Change is logged"]
+
+
+def test_save_issue_results_writes_every_issue_in_one_transaction(database):
+    _, conn = database
+    completed, failed, pending = local_db.seed_jira_issues(conn, 3)
+    repo = JIRAIssueRepository(conn)
+    repo.claim_issues([completed, failed, pending])
+    for issue_id in (completed, failed, pending):
+        save_checkpoint(repo, issue_id)
+
+    repo.save_issue_results([
+        (completed, "completed", None, [FNF_CASE, COMPLIANCE_CASE]),
+        (failed, "failed", "Model returned no test cases", []),
+        (pending, "pending", None, []),
+    ])
+
+    assert statuses(conn) == {
+        completed: ("completed", None),
+        failed: ("failed", "Model returned no test cases"),
+        pending: ("pending", None),
+    }
+    assert saved_test_cases(conn, completed) == ["Change is logged", "Trail retained"]
+    # Only the issue left for another attempt keeps its checkpoints.
+    assert [row[0] for row in repo.load_checkpoints([completed, failed, pending])] == [pending]
+
+
+def test_a_failing_save_writes_nothing(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+    repo.claim_issue(issue_id)
+
+    # The second test case violates a NOT NULL constraint after the first one is inserted.
+    with pytest.raises(Exception):
+        repo.save_issue_results([(issue_id, "completed", None, [FNF_CASE, {**COMPLIANCE_CASE, "summary": None}])])
+
+    assert saved_test_cases(conn, issue_id) == []
+    assert statuses(conn)[issue_id] == ("in_progress", None)
+
+
+def test_manual_upload_repository_claims_requirements(database):
+    _, conn = database
+    [requirement_id] = local_db.seed_standalone_requirements(conn, 1)
+    repo = ManualUploadIssueRepository(conn)
+
+    frameworks, _, summary, _ = repo.claim_issue(requirement_id)
+    repo.complete_issue(requirement_id, [FNF_CASE], "Compliance test cases could not be generated")
+
+    assert json.loads(frameworks) == ["HIPPA"]
+    assert summary == "Audit trail 0"
+    assert statuses(conn, "standalone_scheduled_job_requirement")[requirement_id] == (
+        "completed", "Compliance test cases could not be generated")
+
+
+def test_incremental_writer_flushes_full_batches(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+    writer = IncrementalTestCaseWriter(repo, issue_id, batch_size=2)
+
+    async def stream():
+        for i in range(3):
+            await writer.add({**FNF_CASE, "summary": f"case {i}"})
+        return await writer.take_pending()
+
+    unflushed = asyncio.run(stream())
+
+    assert writer.written == 2
+    assert saved_test_cases(conn, issue_id) == ["case 0", "case 1"]
+    assert [case["summary"] for case in unflushed] == ["case 2"]
+
+
+class SlowRepository(JIRAIssueRepository):
+
+    def insert_issue_test_cases(self, issue_id: str, testcases: list):
+        time.sleep(0.1)
+        super().insert_issue_test_cases(issue_id, testcases)
+
+
+def test_a_write_outlives_its_cancelled_stage_and_is_counted_once(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    writer = IncrementalTestCaseWriter(SlowRepository(conn), issue_id, batch_size=2)
+
+    async def stream():
+        for i in range(2):
+            await writer.add({**FNF_CASE, "summary": f"case {i}"})
+
+    async def cancelled_mid_write():
+        stage = asyncio.ensure_future(stream())
+        await asyncio.sleep(0.02)
+        stage.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await stage
+        return await writer.take_pending()
+
+    assert asyncio.run(cancelled_mid_write()) == []
+    assert writer.written == 2
+    assert saved_test_cases(conn, issue_id) == ["case 0", "case 1"]
+
+
+def test_a_failed_write_leaves_its_test_cases_pending(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    writer = IncrementalTestCaseWriter(JIRAIssueRepository(conn), issue_id, batch_size=1)
+
+    async def add_invalid():
+        with pytest.raises(Exception):
+            await writer.add({"summary": None, "description": {}})
+        return await writer.take_pending()
+
+    assert asyncio.run(add_invalid()) == [{"summary": None, "description": {}}]
+    assert writer.written == 0
+
+
+def test_run_db_runs_off_the_event_loop_with_the_callers_context(database):
+    _, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    repo = JIRAIssueRepository(conn)
+
+    async def claim():
+        with deadline.deadline(0):
+            with pytest.raises(deadline.DeadlineExceeded):
+                await run_db(repo.claim_issue, issue_id)
+        return threading.get_ident(), await run_db(threading.get_ident)
+
+    loop_thread, database_thread = asyncio.run(claim())
+
+    assert database_thread != loop_thread
+    assert statuses(conn)[issue_id] == ("pending", None)
+
+
+def test_connections_are_reused_until_discarded(database):
+    path, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    manager = ConnectionManager()
+
+    with Database(path, "", manager=manager) as first:
+        pass
+    with Database(path, "", manager=manager) as second:
+        pass
+    assert second is first
+
+    # A failed invocation leaves no open transaction on the pooled connection.
+    with pytest.raises(RuntimeError):
+        with Database(path, "", manager=manager) as pooled:
+            pooled.execute("UPDATE scheduled_job_issue SET status = 'failed' WHERE id = ?", (issue_id,))
+            raise RuntimeError("generation failed")
+    with Database(path, "", manager=manager) as pooled:
+        assert pooled.execute("SELECT status FROM scheduled_job_issue WHERE id = ?", (issue_id,)).fetchone()[0] == "pending"
+
+    manager.discard(path, "")
+    with Database(path, "", manager=manager) as third:
+        pass
+    assert third is not first
+    assert manager.stats()["opened"] == 2
+    manager.close_all()
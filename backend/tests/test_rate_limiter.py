@@ -0,0 +1,121 @@
+"""Simulated 429s and 503s against AdaptiveRateLimiter."""
+import asyncio
+import time
+
+import pytest
+
+from test_case_gen import deadline
+from test_case_gen.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+
+FAST_RETRIES = RetryPolicy(max_attempts=8, base_delay=0.02, max_delay=0.2)
+
+
+class APIError(Exception):
+
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+class QuotaEndpoint:
+    """Serves `capacity` calls per second; calls above it get a 429."""
+
+    def __init__(self, capacity: float, latency: float = 0.005, fail_first: int = 0, code: int = 429):
+        self.capacity = capacity
+        self.latency = latency
+        self.fail_first = fail_first
+        self.code = code
+        self.tokens = capacity / 10
+        self.refilled_at = time.monotonic()
+        self.requests = 0
+        self.served = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate(self):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            now = time.monotonic()
+            self.tokens = min(self.capacity / 10, self.tokens + (now - self.refilled_at) * self.capacity)
+            self.refilled_at = now
+            await asyncio.sleep(self.latency)
+            if self.requests <= self.fail_first or self.tokens < 1:
+                raise APIError(self.code)
+            self.tokens -= 1
+            self.served += 1
+            return self.served
+        finally:
+            self.in_flight -= 1
+
+
+def test_a_burst_above_quota_loses_no_calls():
+    endpoint = QuotaEndpoint(capacity=200)
+    limiter = AdaptiveRateLimiter(max_concurrency=8, rate=400, max_rate=800, retry_policy=FAST_RETRIES)
+
+    async def burst():
+        return await asyncio.gather(*(limiter.call(endpoint.generate) for _ in range(60)))
+
+    results = asyncio.run(burst())
+
+    assert len(results) == 60
+    assert endpoint.served == 60
+    assert endpoint.requests > 60, "the burst should have been throttled at least once"
+    assert limiter.stats()["gave_up"] == 0
+    assert endpoint.max_in_flight <= 8
+
+
+def test_429s_cut_the_rate_and_successes_restore_it():
+    endpoint = QuotaEndpoint(capacity=1000, fail_first=5)
+    limiter = AdaptiveRateLimiter(max_concurrency=4, rate=20, max_rate=40, decrease_cooldown=0.0, retry_policy=FAST_RETRIES)
+
+    async def one_call():
+        return await limiter.call(endpoint.generate)
+
+    assert asyncio.run(one_call()) == 1
+    throttled_rate = 20 * 0.7 ** 5
+    stats = limiter.stats()
+    assert stats["throttled"] == 5
+    assert stats["retries"] == 5
+    # One success adds additive_increase / rate on top of the five decreases.
+    assert limiter.rate == pytest.approx(throttled_rate + 5.0 / throttled_rate)
+
+
+def test_throttles_within_the_cooldown_decrease_once():
+    limiter = AdaptiveRateLimiter(rate=20, decrease_cooldown=60.0)
+
+    for _ in range(5):
+        limiter.on_throttle()
+
+    assert limiter.rate == pytest.approx(14.0)
+    assert limiter.stats()["throttled"] == 5
+
+
+def test_retries_stop_at_the_request_deadline():
+    endpoint = QuotaEndpoint(capacity=1000, fail_first=10 ** 6, code=503)
+    limiter = AdaptiveRateLimiter(retry_policy=RetryPolicy(max_attempts=50, base_delay=0.05, max_delay=0.05))
+
+    async def call_under_deadline():
+        with deadline.deadline(0.3):
+            return await limiter.call(endpoint.generate)
+
+    started = time.monotonic()
+    with pytest.raises(APIError):
+        asyncio.run(call_under_deadline())
+
+    # No backoff sleeps past the deadline; only the last attempt itself may end after it.
+    assert time.monotonic() - started < 0.3 + 0.05
+    assert 1 < endpoint.requests < 50
+    assert limiter.stats()["gave_up"] == 1
+
+
+def test_non_retryable_errors_are_not_retried():
+    endpoint = QuotaEndpoint(capacity=1000, fail_first=1, code=400)
+    limiter = AdaptiveRateLimiter(retry_policy=FAST_RETRIES)
+
+    with pytest.raises(APIError):
+        asyncio.run(limiter.call(endpoint.generate))
+
+    assert endpoint.requests == 1
+    assert limiter.stats()["retries"] == 0
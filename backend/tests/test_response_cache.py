@@ -0,0 +1,34 @@
+"""The in-process response cache and its size bound."""
+from test_case_gen.response_cache import MemoryCacheBackend
+
+
+def test_memory_cache_evicts_least_recently_used_past_its_size():
+    cache = MemoryCacheBackend(max_entries=100, max_bytes=30)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    cache.get("a")
+
+    cache.set("c", "z" * 15)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 15
+
+
+def test_memory_cache_skips_values_larger_than_its_size():
+    cache = MemoryCacheBackend(max_entries=100, max_bytes=30)
+    cache.set("a", "x" * 10)
+
+    cache.set("a", "x" * 31)
+
+    assert cache.get("a") is None
+    cache.set("b", "y" * 30)
+    assert cache.get("b") == "y" * 30
+
+
+def test_memory_cache_evicts_past_its_entry_count():
+    cache = MemoryCacheBackend(max_entries=2, max_bytes=1000)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+
+    assert [cache.get(key) for key in ("a", "b", "c")] == [None, "b", "c"]
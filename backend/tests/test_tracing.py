@@ -0,0 +1,134 @@
+"""Trace contents, checked through InMemoryExporter."""
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import local_db
+from simulate_deadline import RESPONSES, call_kind
+from test_case_gen import google_gen_ai, main, tracing
+from test_case_gen.tracing import InMemoryExporter, OpenTelemetryExporter, Tracer, record_usage, traced
+
+USAGE = SimpleNamespace(prompt_token_count=1200, cached_content_token_count=None, thoughts_token_count=30,
+                        candidates_token_count=200, total_token_count=1430)
+
+
+class UsageModels:
+
+    async def generate_content(self, model, contents, config):
+        return SimpleNamespace(text=json.dumps(RESPONSES[call_kind(config)]), usage_metadata=USAGE)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracing.tracer, "exporters", [exporter])
+    return exporter
+
+
+def test_spans_nest_and_record_errors():
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+
+    with pytest.raises(ValueError):
+        with tracer.trace("issue", issue_id="issue-0") as trace:
+            with tracer.span("fnf.generate"):
+                with tracer.span("genai.generate"):
+                    record_usage(USAGE)
+            with tracer.span("json.parse", stage="fnf"):
+                raise ValueError("bad json")
+
+    [exported] = exporter.traces
+    assert exported is trace
+    genai, fnf, parse = trace.spans
+    assert genai.parent_id == fnf.span_id and fnf.parent_id is None
+    assert parse.error == "ValueError('bad json')"
+    assert trace.error == "ValueError('bad json')"
+    assert trace.tokens() == {"prompt_token_count": 1200, "thoughts_token_count": 30,
+                              "candidates_token_count": 200, "total_token_count": 1430}
+    summary = trace.summary()
+    assert summary["issue_id"] == "issue-0"
+    assert summary["stages"]["genai.generate"]["count"] == 1
+
+
+def test_opentelemetry_spans_keep_their_parents():
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    otel_exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(otel_exporter))
+    tracer = Tracer([OpenTelemetryExporter(provider.get_tracer("test"))])
+
+    with tracer.trace("issue", issue_id="issue-0"):
+        with tracer.span("fnf.generate"):
+            with tracer.span("genai.generate", attempt=1):
+                pass
+        with tracer.span("json.parse"):
+            pass
+
+    otel_spans = {span.name: span for span in otel_exporter.get_finished_spans()}
+    assert set(otel_spans) == {"issue", "fnf.generate", "genai.generate", "json.parse"}
+    root = otel_spans["issue"]
+    assert root.parent is None and root.attributes["issue_id"] == "issue-0"
+    assert otel_spans["fnf.generate"].parent.span_id == root.context.span_id
+    assert otel_spans["json.parse"].parent.span_id == root.context.span_id
+    assert otel_spans["genai.generate"].parent.span_id == otel_spans["fnf.generate"].context.span_id
+    assert otel_spans["genai.generate"].attributes["attempt"] == 1
+    assert {span.context.trace_id for span in otel_spans.values()} == {root.context.trace_id}
+
+
+def test_spans_outside_a_trace_are_not_recorded():
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+
+    with tracer.span("db.claim_issue") as span:
+        assert span is None
+    assert exporter.traces == []
+
+
+def test_traced_covers_sync_and_async_functions(exporter):
+    @traced("db.load")
+    def load():
+        return 1
+
+    @traced("genai.call")
+    async def call():
+        return 2
+
+    async def run():
+        with tracing.tracer.trace("issue"):
+            return load() + await call()
+
+    assert asyncio.run(run()) == 3
+    assert [span.name for span in exporter.spans()] == ["db.load", "genai.call"]
+
+
+def test_an_issue_trace_has_its_stages_and_token_usage(database, exporter, monkeypatch):
+    path, conn = database
+    [issue_id] = local_db.seed_jira_issues(conn, 1)
+    client = SimpleNamespace(aio=SimpleNamespace(models=UsageModels()), close=lambda: None)
+    monkeypatch.setattr(google_gen_ai, "clients", google_gen_ai.ClientRegistry(lambda api_key: client))
+    monkeypatch.setattr(main, "TURSO_DATABASE_URL", path)
+    monkeypatch.setattr(main, "TURSO_AUTH_TOKEN", "")
+    message = {"issueId": issue_id, "source": "jira"}
+    request = SimpleNamespace(args={}, get_json=lambda silent=False: {
+        "message": {"data": base64.b64encode(json.dumps(message).encode()).decode()}})
+
+    assert asyncio.run(main.async_handler(request)) == ({"success": True}, 200)
+
+    [trace] = exporter.traces
+    assert trace.name == "issue"
+    assert trace.attributes == {"issue_id": issue_id, "source": "jira", "status": "completed", "test_case_count": 2}
+    stages = trace.stages()
+    for name in ("db.claim_issue", "db.claim_issues", "db.load_checkpoints", "fnf.generate", "compliance.tags",
+                 "compliance.generate", "json.parse", "db.save_checkpoint", "db.complete_issue"):
+        assert name in stages, name
+    model_calls = exporter.spans("genai.generate")
+    assert model_calls and {span.attributes["profile.name"] for span in model_calls} == {"fnf", "tags", "compliance"}
+    assert trace.tokens()["prompt_token_count"] == 1200 * len(model_calls)
+    claim_issues = exporter.spans("db.claim_issues")[0]
+    assert claim_issues.parent_id == exporter.spans("db.claim_issue")[0].span_id
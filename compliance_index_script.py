@@ -1,8 +1,17 @@
 import json
+import os
+import sys
 
 from collections import defaultdict
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "src"))
+
+import numpy as np  # noqa: E402
+
+from test_case_gen.text_index import build_clause_vectors, build_tag_index  # noqa: E402
+
 base_path = "constants/"
+backend_path = "backend/src/test_case_gen/"
 list_of_compliance_files = ["FDA.json", "HIPAA.json", "ISO-IEC-27001-2022.json"]
 
 index = {}
@@ -27,3 +36,14 @@ with open(base_path + "compliance_reverse_index.json", "w", encoding="utf-8") as
 
 with open(base_path + "compliance_tags.json", "w", encoding="utf-8") as tags_file:
     json.dump(list(reverse_index.keys()), tags_file, indent=4)
+
+# Keyword index used by test_case_gen to classify requirement text into tags locally.
+with open(backend_path + "compliance_tag_index.json", "w", encoding="utf-8") as tag_index_file:
+    json.dump(build_tag_index(list(index.values())), tag_index_file, separators=(",", ":"))
+
+# Clause vectors used by test_case_gen to rank matched clauses against the requirement.
+clause_vectors, clause_vectors_meta = build_clause_vectors(index)
+np.savez_compressed(backend_path + "compliance_clause_vectors.npz", **clause_vectors)
+
+with open(backend_path + "compliance_clause_vectors.json", "w", encoding="utf-8") as clause_vectors_meta_file:
+    json.dump(clause_vectors_meta, clause_vectors_meta_file, separators=(",", ":"))
@@ -6,3 +6,5 @@ export * from './scheduled-jobs-schema';
 export * from './standalone-project-schema';
 export * from './standalone-scheduled-jobs-schema';
 export * from './project-custom-rules-schema';
+export * from './llm-response-cache-schema';
+export * from './issue-generation-checkpoint-schema';
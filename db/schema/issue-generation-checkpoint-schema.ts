@@ -0,0 +1,15 @@
+import { sqliteTable, text, real, primaryKey } from "drizzle-orm/sqlite-core";
+
+// Written and read only by the test-case-gen function (backend/src/test_case_gen/checkpoints.py).
+// issue_id is a scheduled_job_issue or standalone_scheduled_job_requirement id.
+export const issueGenerationCheckpoint = sqliteTable("issue_generation_checkpoint", {
+  issueId: text("issue_id").notNull(),
+  stage: text("stage").notNull(),
+  promptHash: text("prompt_hash").notNull(),
+  value: text("value").notNull(),
+  createdAt: real("created_at").notNull(),
+},
+  (table) => [
+    primaryKey({ columns: [table.issueId, table.stage] }),
+  ]
+);
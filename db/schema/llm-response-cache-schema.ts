@@ -0,0 +1,14 @@
+import { sqliteTable, text, real, index } from "drizzle-orm/sqlite-core";
+
+// Written and read only by the test-case-gen function (backend/src/test_case_gen/response_cache.py).
+export const llmResponseCache = sqliteTable("llm_response_cache", {
+  key: text("key").primaryKey(),
+  value: text("value").notNull(),
+  expiresAt: real("expires_at").notNull(),
+  accessedAt: real("accessed_at").notNull(),
+},
+  (table) => [
+    index("idx_llm_response_cache_expires_at").on(table.expiresAt),
+    index("idx_llm_response_cache_accessed_at").on(table.accessedAt),
+  ]
+);
@@ -0,0 +1,9 @@
+CREATE TABLE `llm_response_cache` (
+	`key` text PRIMARY KEY NOT NULL,
+	`value` text NOT NULL,
+	`expires_at` real NOT NULL,
+	`accessed_at` real NOT NULL
+);
+--> statement-breakpoint
+CREATE INDEX `idx_llm_response_cache_expires_at` ON `llm_response_cache` (`expires_at`);--> statement-breakpoint
+CREATE INDEX `idx_llm_response_cache_accessed_at` ON `llm_response_cache` (`accessed_at`);
\ No newline at end of file
@@ -0,0 +1,8 @@
+CREATE TABLE `issue_generation_checkpoint` (
+	`issue_id` text NOT NULL,
+	`stage` text NOT NULL,
+	`prompt_hash` text NOT NULL,
+	`value` text NOT NULL,
+	`created_at` real NOT NULL,
+	PRIMARY KEY(`issue_id`, `stage`)
+);